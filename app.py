@@ -1,9 +1,29 @@
+import io
+import os
+import uuid
+
 import streamlit as st
 import pandas as pd
 
+import bidsheet
+import export
+import fee_chain
+import profiling
+import rates
+import rate_sql
+import render
+from rate_store import RateStore
+
 # Page config
 st.set_page_config(page_title="Property Preservation Rate Lookup", page_icon="📋", layout="wide")
 
+# Stage timings for this rerun, on with RATE_PROFILE=1 or ?profile=1 (see profiling.py)
+if "profile_session" not in st.session_state:
+    st.session_state["profile_session"] = uuid.uuid4().hex[:8]
+st.session_state["profile_rerun"] = st.session_state.get("profile_rerun", 0) + 1
+profiler = profiling.RerunProfiler(st.session_state["profile_session"], st.session_state["profile_rerun"],
+                                   enabled=profiling.enabled_by(os.environ, st.query_params))
+
 # Custom CSS
 st.markdown("""
 <style>
@@ -48,81 +68,58 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Load Data
-@st.cache_data
-def load_data():
-    df = pd.read_csv("Property_Pricing_Master.csv")
-    
-    # Rename HUD to HUD / FHA for clarity
-    df['national'] = df['national'].replace({'HUD': 'HUD / FHA'})
-    
-    # Consolidation mapping for Grass Cuts
-    def categorize_lot(size_str):
-        if pd.isna(size_str) or str(size_str).strip() == "": return ""
-        s = str(size_str).lower().replace('sf', '').strip()
-        
-        # Standard: anything up to 10k
-        if any(x in s for x in ['1-10000', '1-5000', '5001-10000', '1-1000', '1001-5000', '5001-8000', '8001-10000']):
-            return "Standard Lot (<10,000 sf)"
-        # Medium: 10k to 25k (includes 1-15000 flat rates and 15001-25000 ranges)
-        elif any(x in s for x in ['10001-20000', '10001-15000', '15001-20000', '12001-15000', '15001-18000', '18001-20000', '10001-10890', '1-10890', '10891-12000', '1-15000', '15001-25000', '10001+']):
-            return "Medium Lot (10k-25k sf)"
-        # Oversized: 25k+
-        elif any(x in s for x in ['25001', '30001', '35001', '40001', '20001-30000', '20001-25000', '25001-35000', '35001-43560', '20001-21780', '21781-25000']):
-            return "Oversized Lot (25k+ sf)"
-        # Flag anything that doesn't match instead of silently defaulting
-        return f"Unrecognized ({size_str.strip()})"
-        
-    df['lot_size'] = df['lot_size'].apply(categorize_lot)
-    
-    # Group by the clean parameters and take the max price to deduplicate rows
-    df.fillna("N/A_TEMP", inplace=True)
-    group_cols = [c for c in df.columns if c != 'price']
-    df = df.groupby(group_cols, as_index=False)['price'].max()
-    df.replace("N/A_TEMP", "", inplace=True)
-    
-    # Merge the "Phantom Variable" (Lot Size) directly into the Work Type
-    df['display_work'] = df.apply(
-        lambda x: f"{x['work_type']} ({x['lot_size']})" if str(x['lot_size']).strip() != "" else x['work_type'],
-        axis=1
-    )
-    
-    # Build work type categories for the category filter
-    def categorize(wt):
-        wt_lower = str(wt).lower()
-        if 'grass' in wt_lower or 'lawn' in wt_lower or 'recut' in wt_lower or 'landscape' in wt_lower or 'shrub' in wt_lower or 'tree trim' in wt_lower:
-            return "🌿 Grass & Lawn"
-        elif 'winteriz' in wt_lower or 'dewint' in wt_lower or 'thaw' in wt_lower or 're-wint' in wt_lower or 'pressure test' in wt_lower:
-            return "❄️ Winterization"
-        elif 'lock' in wt_lower or 'padlock' in wt_lower or 'board' in wt_lower or 'secur' in wt_lower or 'slider' in wt_lower or 'slide bolt' in wt_lower or 'window lock' in wt_lower or 're-key' in wt_lower or 'rekey' in wt_lower or 'glaz' in wt_lower:
-            return "🔒 Securing & Boarding"
-        elif 'debris' in wt_lower or 'trash' in wt_lower or 'carpet' in wt_lower or 'removal' in wt_lower or 'vehicle' in wt_lower or 'tire' in wt_lower or 'appliance' in wt_lower or 'refriger' in wt_lower or 'hazard' in wt_lower or 'personal property' in wt_lower:
-            return "🗑️ Debris & Removal"
-        elif 'roof' in wt_lower or 'gutter' in wt_lower or 'chimney' in wt_lower or 'tarp' in wt_lower:
-            return "🏠 Roof & Gutters"
-        elif 'inspect' in wt_lower or 'occupancy' in wt_lower or 'verification' in wt_lower or 'photo' in wt_lower:
-            return "🔍 Inspections"
-        elif 'snow' in wt_lower:
-            return "🌨️ Snow Removal"
-        elif 'clean' in wt_lower or 'broom' in wt_lower or 'maid' in wt_lower or 'janitorial' in wt_lower or 'sales clean' in wt_lower:
-            return "🧹 Cleaning"
-        elif 'sump' in wt_lower or 'dehumid' in wt_lower or 'basement' in wt_lower or 'mold' in wt_lower or 'cap' in wt_lower or 'wire' in wt_lower or 'outlet' in wt_lower or 'electric' in wt_lower or 'well' in wt_lower or 'septic' in wt_lower:
-            return "🔧 Utilities & Mechanicals"
-        elif 'pool' in wt_lower or 'spa' in wt_lower or 'hot tub' in wt_lower:
-            return "🏊 Pools & Spas"
-        elif 'smoke' in wt_lower or 'co2' in wt_lower or 'co detector' in wt_lower or 'handrail' in wt_lower or 'step' in wt_lower or 'guard' in wt_lower or 'extermin' in wt_lower or 'pest' in wt_lower:
-            return "⚠️ Health & Safety"
-        elif 'door' in wt_lower or 'garage' in wt_lower or 'fence' in wt_lower or 'graffiti' in wt_lower or 'overhead' in wt_lower or 'pressure wash' in wt_lower or 'address' in wt_lower:
-            return "🔨 Repairs & Maintenance"
-        elif 'trip' in wt_lower or 'access' in wt_lower or 'eviction' in wt_lower or 'emergency' in wt_lower or 'allowance' in wt_lower or 'initial service' in wt_lower:
-            return "🚗 Service Calls & Admin"
-        else:
-            return "📦 Other Services"
+# Load Data: one live store per process, shared across sessions. Delta CSVs
+# dropped into rate_updates/ are applied in place on the next rerun.
+# With RATE_TABLE_FILE set, workers instead attach to the table published by
+# `python cli.py publish` and follow it as it is replaced. RATE_SOURCES may
+# point at a directory or glob of per-servicer sheets instead of the master CSV.
+UPDATES_DIR = "rate_updates"
+SHARED_TABLE = os.environ.get("RATE_TABLE_FILE")
+RATE_SOURCES = os.environ.get("RATE_SOURCES", "Property_Pricing_Master.csv")
+WORK_PICKER_LIMIT = 200  # work types sent to a picker before a search narrows them
 
-    df['category'] = df['display_work'].apply(categorize)
-    return df
+@st.cache_resource
+def load_store():
+    if SHARED_TABLE:
+        from shared_table import SharedRateTable
+        return SharedRateTable(SHARED_TABLE)
+    return RateStore(RATE_SOURCES)
 
-df = load_data()
+with profiler.stage("load_store"):
+    store = load_store()
+if not SHARED_TABLE:
+    with profiler.stage("sync_updates"):
+        synced = store.sync(UPDATES_DIR)
+    for name in synced:
+        if 'error' in store.applied[name]:
+            st.error(f"Rate update {name} was skipped: {store.applied[name]['error']}")
+# Table, filter index and comparison cube all from the same version
+with profiler.stage("snapshot"):
+    rate_version, df, rate_index, comparison_cube = store.snapshot()
+if st.session_state.get("rate_version", rate_version) != rate_version:
+    st.toast(f"Rates updated (version {rate_version})")
+st.session_state["rate_version"] = rate_version
+
+# SQLite copy of the table for the Query tab; built on first use, one per table version
+@st.cache_resource(max_entries=1)
+def load_sql(version, _df):
+    return rate_sql.RateSQL(_df)
+
+def parse_query_params(text):
+    """`name=value` lines into query parameters; numeric values become numbers."""
+    params = {}
+    for line in text.splitlines():
+        if "=" not in line:
+            continue
+        name, value = (part.strip() for part in line.split("=", 1))
+        try:
+            params[name] = int(value)
+        except ValueError:
+            try:
+                params[name] = float(value)
+            except ValueError:
+                params[name] = value
+    return params
 
 # Custom Sorting for Investors (Feds first, then alphabetical)
 def sort_investors(investors_list):
@@ -137,18 +134,18 @@ st.caption("Bidding & Allowable Calculator for Property Preservation Contractors
 st.markdown("")
 
 # Tabs
-tab1, tab2, tab3 = st.tabs(["🔎 Rate Lookup", "📊 National Comparison", "💰 Pricing Waterfall"])
+tab1, tab2, tab3, tab4, tab5 = st.tabs(["🔎 Rate Lookup", "📊 National Comparison", "💰 Pricing Waterfall", "📑 Bid Sheet", "🧮 Query"])
 
 # ========================
 # TAB 1: RATE LOOKUP
 # ========================
-with tab1:
+with tab1, profiler.stage("tab1"):
     
     # Row 1: Category + Investor
     col_cat, col_inv = st.columns(2)
     
-    all_inv = df['national'].unique()
-    all_categories = sorted(df['category'].unique())
+    all_inv = rate_index.all_values('national')
+    all_categories = rate_index.all_values('category')
     
     with col_cat:
         selected_categories = st.multiselect("Service Category", all_categories, placeholder="All categories")
@@ -157,49 +154,60 @@ with tab1:
         selected_investors = st.multiselect("Investor / National", sort_investors(all_inv), default=["HUD / FHA"])
     
     # Apply category filter first to narrow work types
-    cat_filtered = df.copy()
-    if selected_categories:
-        cat_filtered = cat_filtered[cat_filtered['category'].isin(selected_categories)]
-    if selected_investors:
-        cat_filtered = cat_filtered[cat_filtered['national'].isin(selected_investors)]
+    with profiler.stage("tab1.options"):
+        cat_mask = rate_index.mask(category=selected_categories, national=selected_investors)
+        valid_works = rate_index.options('display_work', cat_mask)
     
     # Row 2: Work Type + State
     col_work, col_state = st.columns(2)
     
-    valid_works = sorted(cat_filtered['display_work'].unique())
-    
     with col_work:
-        selected_works = st.multiselect("Work Type", valid_works, placeholder="Start typing to search...")
+        # The picker only gets the search's best matches (or the first WORK_PICKER_LIMIT),
+        # plus whatever is already picked so searching again doesn't drop it
+        work_query = st.text_input("Search work types", key="t1_work_search",
+                                   placeholder='e.g. "rekey", "lawn", "winterizaton"')
+        with profiler.stage("tab1.work_search"):
+            valid_set = set(valid_works)
+            picked = [w for w in st.session_state.get("t1_works", []) if w in valid_set]
+            if work_query.strip():
+                candidates = rate_index.search_works(work_query, cat_mask)
+            else:
+                candidates = valid_works[:WORK_PICKER_LIMIT]
+            picked_set = set(picked)
+            work_options = picked + [w for w in candidates if w not in picked_set]
+        selected_works = st.multiselect("Work Type", work_options, key="t1_works",
+                                        placeholder="Pick from the matches, or search above")
+        if work_query.strip() and not candidates:
+            st.caption(f"No work types match \"{work_query}\".")
+        elif not work_query.strip() and len(valid_works) > WORK_PICKER_LIMIT:
+            st.caption(f"Showing {WORK_PICKER_LIMIT} of {len(valid_works)} work types; search to find the rest.")
         # Ghost list: show what's unavailable based on current filters
-        all_works = sorted(df['display_work'].unique())
-        ghost_works = set(all_works) - set(valid_works)
+        ghost_works = rate_index.missing('display_work', cat_mask)
         if ghost_works and (selected_categories or selected_investors):
-            ghost_str = ', '.join(sorted(ghost_works)[:4])
+            ghost_str = ', '.join(ghost_works[:4])
             if len(ghost_works) > 4: ghost_str += f" ... +{len(ghost_works)-4} more"
             st.markdown(f"<div class='ghost-list'>Unavailable for this selection: {ghost_str}</div>", unsafe_allow_html=True)
     
     # Narrow states based on all selections so far
-    state_filtered = cat_filtered
-    if selected_works:
-        state_filtered = state_filtered[state_filtered['display_work'].isin(selected_works)]
-    valid_states = sorted(state_filtered['state'].unique())
+    with profiler.stage("tab1.options"):
+        state_mask = rate_index.mask(category=selected_categories, national=selected_investors, display_work=selected_works)
+        valid_states = rate_index.options('state', state_mask)
     
     with col_state:
         selected_states = st.multiselect("State", valid_states, placeholder="All States included by default")
         # Ghost list for states
-        all_states = sorted(df['state'].unique())
-        ghost_states = set(all_states) - set(valid_states)
+        ghost_states = rate_index.missing('state', state_mask)
         if ghost_states and (selected_categories or selected_investors or selected_works):
-            ghost_str = ', '.join(sorted(ghost_states)[:4])
+            ghost_str = ', '.join(ghost_states[:4])
             if len(ghost_states) > 4: ghost_str += f" ... +{len(ghost_states)-4} more"
             st.markdown(f"<div class='ghost-list'>Unavailable for this selection: {ghost_str}</div>", unsafe_allow_html=True)
 
     # Final filter
-    result = df.copy()
-    if selected_categories: result = result[result['category'].isin(selected_categories)]
-    if selected_investors: result = result[result['national'].isin(selected_investors)]
-    if selected_works: result = result[result['display_work'].isin(selected_works)]
-    if selected_states: result = result[result['state'].isin(selected_states)]
+    with profiler.stage("tab1.filter"):
+        result = rate_index.rows(rate_index.mask(
+            category=selected_categories, national=selected_investors,
+            display_work=selected_works, state=selected_states,
+        ))
 
     st.markdown("---")
     
@@ -214,10 +222,11 @@ with tab1:
         with res_col2:
             mobile_view = st.toggle("📱 Mobile View", key="t1")
         with res_col3:
-            # CSV download
-            csv_export = result[['national', 'display_work', 'state', 'price', 'unit', 'tier', 'last_updated', 'notes', 'region_override']].copy()
-            csv_export.rename(columns={'national':'Company','display_work':'Work Type','state':'State','price':'Rate','unit':'Unit','tier':'Tier','last_updated':'Date','notes':'Notes','region_override':'Zone'}, inplace=True)
-            st.download_button("⬇️ Export CSV", csv_export.to_csv(index=False), "property_research_results.csv", "text/csv", use_container_width=True)
+            # Export is only written when the button is clicked, in chunks
+            export_fmt = st.selectbox("Export format", list(export.EXPORT_FORMATS), key="t1_export_fmt", label_visibility="collapsed")
+            st.download_button(f"⬇️ Export {export_fmt}", lambda: export.export_file(result, export_fmt),
+                               export.export_filename("property_research_results", export_fmt),
+                               export.EXPORT_FORMATS[export_fmt][1], use_container_width=True)
         
         if mobile_view:
             # Paginated card view for performance
@@ -236,37 +245,30 @@ with tab1:
             if total_pages > 1:
                 st.caption(f"Showing {start_idx+1}-{min(end_idx, len(result))} of {len(result)}")
             
-            for _, row in page_result.iterrows():
-                status_icon = "✅ Active & Verified" if row['tier'] == 1 else "⚠️ Community Data"
-                zone_tag = f" · 📍 {row['region_override']}" if str(row.get('region_override', '')).strip() else ""
-                st.markdown(f"""
-                <div class='card'>
-                    <div style='color: #4b5563; font-size: 0.85em; text-transform: uppercase; font-weight: bold;'>{row['national']}{zone_tag}</div>
-                    <div style='font-size: 1.1em; font-weight: bold; margin-bottom: 5px;'>{row['display_work']} — {row['state']}</div>
-                    <div style='font-size: 1.4em; color: #059669; font-weight: bold; margin-bottom: 8px;'>${row['price']:,.2f} <span style='font-size: 0.7em; color: #6b7280;'>{row['unit']}</span></div>
-                    <div style='font-size: 0.85em; margin-bottom: 10px; color: #4b5563;'><i>{status_icon} · {row['last_updated']}</i></div>
-                    {"<div style='font-size: 0.9em; border-top: 1px solid #e5e7eb; padding-top: 8px;'>" + str(row['notes']) + "</div>" if str(row['notes']).strip() else ""}
-                </div>
-                """, unsafe_allow_html=True)
+            # All cards on the page go out as a single element
+            with profiler.stage("tab1.cards"):
+                st.markdown(render.result_cards_html(page_result), unsafe_allow_html=True)
         else:
             # Dataframe UI for desktop
-            display_res = result[['national', 'display_work', 'state', 'price', 'unit', 'tier', 'last_updated', 'notes', 'region_override']].copy()
-            display_res['price'] = display_res['price'].apply(lambda x: f"${x:,.2f}" if pd.notnull(x) and x != "" else "N/A")
-            display_res['Status'] = display_res.apply(
-                lambda r: f"✅ Verified ({r['last_updated']})" if r['tier'] == 1 else f"⚠️ Legacy ({r['last_updated']})", axis=1
-            )
-            # Add zone info for NRES etc
-            display_res['Zone'] = display_res['region_override'].apply(lambda x: str(x) if str(x).strip() else "—")
+            with profiler.stage("tab1.table_format"):
+                display_res = result[['national', 'display_work', 'state', 'price', 'unit', 'tier', 'last_updated', 'notes', 'region_override']].copy()
+                display_res['last_updated'] = display_res['last_updated'].dt.strftime('%Y-%m-%d')
+                display_res['price'] = display_res['price'].apply(lambda x: f"${x:,.2f}" if pd.notnull(x) and x != "" else "N/A")
+                display_res['Status'] = display_res.apply(
+                    lambda r: f"✅ Verified ({r['last_updated']})" if r['tier'] == 1 else f"⚠️ Legacy ({r['last_updated']})", axis=1
+                )
+                # Add zone info for NRES etc
+                display_res['Zone'] = display_res['region_override'].astype(object).fillna("—")
             
-            display_res = display_res[['national', 'display_work', 'state', 'Zone', 'price', 'unit', 'Status', 'notes']]
-            display_res.rename(columns={
-                'national': 'Company', 
-                'display_work': 'Work Type', 
-                'state': 'State', 
-                'price': 'Rate', 
-                'unit': 'Unit', 
-                'notes': 'Notes (Double-click to expand)'
-            }, inplace=True)
+                display_res = display_res[['national', 'display_work', 'state', 'Zone', 'price', 'unit', 'Status', 'notes']]
+                display_res.rename(columns={
+                    'national': 'Company', 
+                    'display_work': 'Work Type', 
+                    'state': 'State', 
+                    'price': 'Rate', 
+                    'unit': 'Unit', 
+                    'notes': 'Notes (Double-click to expand)'
+                }, inplace=True)
             
             st.dataframe(
                 display_res, 
@@ -282,73 +284,58 @@ with tab1:
 # ========================
 # TAB 2: NATIONAL COMPARISON
 # ========================
-with tab2:
+with tab2, profiler.stage("tab2"):
     st.markdown("### Side-by-Side Rate Comparison")
     st.caption("Compare what different companies pay for the same work in the same state.")
     
     comp_col1, comp_col2 = st.columns(2)
     
     with comp_col1:
-        comp_cat = st.selectbox("Filter by Category", ["All"] + sorted(df['category'].unique()), key="comp_cat")
+        comp_cat = st.selectbox("Filter by Category", ["All"] + rate_index.all_values('category'), key="comp_cat")
     
-    comp_df_base = df if comp_cat == "All" else df[df['category'] == comp_cat]
+    comp_mask = rate_index.mask(category=[] if comp_cat == "All" else [comp_cat])
     
     with comp_col2:
-        comp_work = st.selectbox("Select Work Type", [""] + sorted(comp_df_base['display_work'].unique()), key="comp_work")
+        comp_query = st.text_input("Search work types", key="comp_work_search", placeholder='e.g. "board windows"')
+        if comp_query.strip():
+            comp_works = rate_index.search_works(comp_query, comp_mask)
+        else:
+            comp_works = rate_index.options('display_work', comp_mask)[:WORK_PICKER_LIMIT]
+        # Keep the current pick selectable while a new search is typed
+        current_work = st.session_state.get("comp_work", "")
+        if current_work and current_work not in comp_works and current_work in rate_index.options('display_work', comp_mask):
+            comp_works = [current_work] + comp_works
+        comp_work = st.selectbox("Select Work Type", [""] + comp_works, key="comp_work")
     
     if comp_work:
-        work_df = comp_df_base[comp_df_base['display_work'] == comp_work]
-        
         # State picker - only show states with 2+ nationals for meaningful comparison
-        state_nat_counts = work_df.groupby('state')['national'].nunique()
-        multi_states = state_nat_counts[state_nat_counts >= 2].index.tolist()
+        multi_states = comparison_cube.states(comp_work)
         
         if not multi_states:
             st.warning("Only one company reports data for this work type. Not enough data to compare across nationals yet.")
         else:
             comp_state = st.selectbox(
                 "Select State", 
-                sorted(multi_states),
+                multi_states,
                 key="comp_state"
             )
             
             if comp_state:
-                comp_result = work_df[(work_df['state'] == comp_state) | (work_df['state'] == 'All States')]
-                
-                # Sort: Tier 1 first, then by price descending (highest payer on top)
-                comp_result = comp_result.copy()
-                comp_result['sort_key'] = comp_result['tier'].apply(lambda t: 0 if t == 1 else 1)
-                comp_result = comp_result.sort_values(['sort_key', 'price'], ascending=[True, False])
+                # Sorted tier 1 first, then by price descending (highest payer on top)
+                comp_result = comparison_cube.rows(comp_work, comp_state)
                 
                 if not comp_result.empty:
                     st.markdown(f"**{comp_work}** in **{comp_state}** — {len(comp_result)} companies reporting")
                     
                     # Visual bar comparison
-                    max_price = comp_result['price'].max()
-                    
-                    for _, row in comp_result.iterrows():
-                        bar_pct = (row['price'] / max_price * 100) if max_price > 0 else 0
-                        bar_color = "#059669" if row['tier'] == 1 else "#d97706"
-                        tier_tag = "✅" if row['tier'] == 1 else "⚠️"
-                        zone_note = f" ({row['region_override']})" if str(row.get('region_override', '')).strip() else ""
-                        date_note = str(row['last_updated'])
-                        
-                        st.markdown(f"""
-                        <div class='waterfall-row'>
-                            <div class='waterfall-label'>{tier_tag} {row['national']}{zone_note}</div>
-                            <div style='flex: 1;'>
-                                <div class='waterfall-bar' style='width: {max(bar_pct, 8)}%; background-color: {bar_color};'>${row['price']:,.2f}</div>
-                            </div>
-                            <div class='waterfall-amount'>{date_note}</div>
-                        </div>
-                        """, unsafe_allow_html=True)
+                    with profiler.stage("tab2.bars"):
+                        st.markdown(render.comparison_bars_html(comp_result), unsafe_allow_html=True)
                     
                     # Gap analysis
-                    if len(comp_result) >= 2:
-                        highest = comp_result.iloc[0]
-                        lowest = comp_result.iloc[-1]
-                        gap = highest['price'] - lowest['price']
-                        gap_pct = (gap / highest['price'] * 100) if highest['price'] > 0 else 0
+                    comp_spread = rates.spread(comp_result)
+                    if comp_spread:
+                        highest, lowest = comp_spread['highest'], comp_spread['lowest']
+                        gap, gap_pct = comp_spread['gap'], comp_spread['gap_pct']
                         
                         if gap_pct > 30:
                             st.markdown(f"""
@@ -367,18 +354,43 @@ with tab2:
                     # Table below the bars
                     with st.expander("View full data table"):
                         tbl = comp_result[['national', 'state', 'price', 'unit', 'tier', 'last_updated', 'notes', 'region_override']].copy()
+                        with profiler.stage("tab2.history"):
+                            # Each company's rate for this work and state over time, oldest first
+                            tbl['history'] = [comparison_cube.history.history(national, comp_work, state)['price'].tolist()
+                                              for national, state in zip(tbl['national'], tbl['state'])]
+                        tbl['last_updated'] = tbl['last_updated'].dt.strftime('%Y-%m-%d')
                         tbl['price'] = tbl['price'].apply(lambda x: f"${x:,.2f}")
                         tbl.rename(columns={'national':'Company','state':'State','price':'Rate','unit':'Unit','tier':'Tier','last_updated':'Date','notes':'Notes (Double-click to expand)','region_override':'Zone'}, inplace=True)
-                        st.dataframe(tbl, use_container_width=True, hide_index=True)
+                        st.dataframe(tbl, use_container_width=True, hide_index=True, column_config={
+                            'history': st.column_config.LineChartColumn("History", help="Reported rate at each date on record"),
+                        })
                 else:
                     st.info("No data for this combination.")
     else:
         st.info("Select a work type above to see how different companies compare.")
+    
+    # Leaderboard of the work/state pairs where nationals disagree the most
+    with st.expander("🏆 Biggest Spreads Between Companies"):
+        with profiler.stage("tab2.leaderboard"):
+            board = comparison_cube.leaderboard(n=25, category=None if comp_cat == "All" else comp_cat)
+        if board.empty:
+            st.info("No work type has two or more companies reporting in the same state yet.")
+        else:
+            board = board.assign(
+                low=board['low'].map("${:,.2f}".format),
+                high=board['high'].map("${:,.2f}".format),
+                spread=board['spread'].map("${:,.2f}".format),
+                spread_pct=board['spread_pct'].map("{:.0f}%".format),
+            )
+            board = board[['display_work', 'state', 'companies', 'low', 'high', 'spread', 'spread_pct', 'units']]
+            board.columns = ['Work Type', 'State', 'Companies', 'Low', 'High', 'Spread', 'Spread %', 'Units']
+            st.dataframe(board, use_container_width=True, hide_index=True)
+            st.caption("Rates include nationwide (All States) entries. Check the Units column: a spread across different billing units isn't apples to apples.")
 
 # ========================
 # TAB 3: PRICING WATERFALL
 # ========================
-with tab3:
+with tab3, profiler.stage("tab3"):
     st.markdown("### Where Does the Money Go?")
     st.caption("See how investor allowables get split before reaching you. Based on industry-standard fee structures shared by veteran contractors.")
     
@@ -405,10 +417,10 @@ with tab3:
             wf_state = st.selectbox("State", wf_states, key="wf_state")
             
             if wf_work and wf_state:
-                match = df[(df['tier'] == 1) & (df['display_work'] == wf_work) & (df['state'] == wf_state)]
-                if not match.empty:
-                    investor_rate = match.iloc[0]['price']
-                    investor_name = match.iloc[0]['national']
+                match = rates.investor_allowable(df, wf_work, wf_state)
+                if match is not None:
+                    investor_rate = match['price']
+                    investor_name = match['national']
                     st.success(f"**{investor_name} allowable: ${investor_rate:,.2f}** ({wf_work} in {wf_state})")
                 else:
                     investor_rate = 0
@@ -428,37 +440,47 @@ with tab3:
     # Use whichever rate is set
     base_rate = manual_rate if manual_rate > 0 else investor_rate
     
+    with st.expander("⚙️ Fee chain: change the cuts or add layers"):
+        st.caption("Layers run top to bottom, investor side first. Each keeps its cut of what reaches it plus any flat fee. Add rows for a sub or a sub-of-a-sub.")
+        chain_rows = st.data_editor(
+            pd.DataFrame({
+                "Layer": [layer['name'] for layer in fee_chain.STANDARD_LAYERS],
+                "Cut %": [layer['pct'] * 100 for layer in fee_chain.STANDARD_LAYERS],
+                "Flat $": [0.0] * len(fee_chain.STANDARD_LAYERS),
+            }),
+            num_rows="dynamic", hide_index=True, use_container_width=True, key="wf_chain",
+            column_config={
+                "Cut %": st.column_config.NumberColumn(min_value=0.0, max_value=100.0, step=1.0, format="%.1f%%"),
+                "Flat $": st.column_config.NumberColumn(min_value=0.0, step=1.0, format="$%.2f"),
+            }
+        )
+    chain_rows = chain_rows.dropna(how='all').fillna({"Cut %": 0.0, "Flat $": 0.0})
+    try:
+        chain = fee_chain.FeeChain([
+            {'name': row["Layer"] if pd.notna(row["Layer"]) else None, 'pct': row["Cut %"] / 100, 'flat': row["Flat $"]}
+            for row in chain_rows.to_dict('records')
+        ])
+    except ValueError as e:
+        st.error(f"Fee chain: {e}. Showing the standard split instead.")
+        chain = fee_chain.FeeChain()
+    
     if base_rate > 0:
         st.markdown("---")
         st.markdown("#### The Money Waterfall")
         
-        # Standard industry splits
-        national_cut_pct = 0.25
-        regional_cut_pct = 0.40  # of remainder
-        
-        national_takes = base_rate * national_cut_pct
-        after_national = base_rate - national_takes
-        regional_takes = after_national * regional_cut_pct
-        botg_gets = after_national - regional_takes
+        split = chain.evaluate(base_rate)
+        takes, remaining = split['takes'][0], split['remaining'][0]
+        botg_gets = float(split['botg_gets'][0])
         
         # The waterfall visualization
-        layers = [
-            ("Investor Allowable", base_rate, "#1e40af", "What the investor allows for this service"),
-            ("After National (~25%)", after_national, "#059669", f"National keeps ${national_takes:,.2f}"),
-            ("After Regional (~40%)", botg_gets, "#d97706", f"Regional keeps ${regional_takes:,.2f}"),
-        ]
+        colors = ["#059669", "#d97706", "#dc2626", "#7c3aed", "#db2777"]
+        layers = [("Investor Allowable", base_rate, "#1e40af", "What the investor allows for this service")]
+        for i, layer in enumerate(chain.layers):
+            cut = f"~{layer['pct'] * 100:.0f}%" + (f" + ${layer['flat']:,.2f}" if layer['flat'] else "")
+            layers.append((f"After {layer['name']} ({cut})", remaining[i + 1], colors[i % len(colors)],
+                           f"{layer['name']} keeps ${takes[i]:,.2f}"))
         
-        for label, amount, color, note in layers:
-            bar_pct = (amount / base_rate * 100) if base_rate > 0 else 0
-            st.markdown(f"""
-            <div class='waterfall-row'>
-                <div class='waterfall-label'>{label}</div>
-                <div style='flex: 1;'>
-                    <div class='waterfall-bar' style='width: {max(bar_pct, 8)}%; background-color: {color};'>${amount:,.2f}</div>
-                </div>
-                <div class='waterfall-amount' style='font-size: 0.75em;'>{note}</div>
-            </div>
-            """, unsafe_allow_html=True)
+        st.markdown(render.waterfall_html(layers, base_rate), unsafe_allow_html=True)
             
         st.markdown("<div class='waterfall-note'>*Percentage deductions are based on historical industry estimates and community-reported averages. Actual margins vary by national and contract.</div>", unsafe_allow_html=True)
         
@@ -480,18 +502,20 @@ with tab3:
             
             your_pct = (your_rate / base_rate * 100) if base_rate > 0 else 0
             
-            if your_rate >= botg_gets * 0.95:
+            position = rates.chain_position(your_rate, botg_gets)
+            depth = chain.layers_deep(base_rate, your_rate).iloc[0]
+            depth_text = f"{depth['layers_deep']}{'+' if depth['beyond_chain'] else ''} layer{'' if depth['layers_deep'] == 1 else 's'}"
+            if position == 'direct':
                 st.markdown(f"""
                 <div class='gap-good'>
                     ✅ <b>You're getting ${your_rate:,.2f} ({your_pct:.0f}% of allowable)</b> — This is consistent with working directly 
                     for a national or as a first-tier subcontractor.
                 </div>
                 """, unsafe_allow_html=True)
-            elif your_rate >= botg_gets * 0.60:
-                layers_deep = "2-3 layers"
+            elif position == 'mid':
                 st.markdown(f"""
                 <div class='gap-alert'>
-                    ⚠️ <b>You're getting ${your_rate:,.2f} ({your_pct:.0f}% of allowable)</b> — This suggests you're roughly {layers_deep} 
+                    ⚠️ <b>You're getting ${your_rate:,.2f} ({your_pct:.0f}% of allowable)</b> — This suggests you're roughly {depth_text} 
                     from the investor. There's ${base_rate - your_rate:,.2f} being taken before it reaches you.
                 </div>
                 """, unsafe_allow_html=True)
@@ -503,6 +527,115 @@ with tab3:
                     into the food chain. Consider moving up the chain or going direct.
                 </div>
                 """, unsafe_allow_html=True)
+            st.caption(f"Closest match in the fee chain above: {depth_text} deep, after {depth['layer']} "
+                       f"(${depth['expected']:,.2f} expected at that point).")
+    
+    st.markdown("---")
+    with st.expander("📊 BOTG pay for every investor rate"):
+        st.caption("Every tier-1 (investor) allowable for one investor, run through the fee chain above at once.")
+        investor_nationals = sorted(df.loc[df['tier'] == 1, 'national'].unique())
+        default_investor = investor_name if investor_name in investor_nationals else "HUD / FHA"
+        wf_batch = st.selectbox("Investor", investor_nationals, key="wf_batch_national",
+                                index=investor_nationals.index(default_investor) if default_investor in investor_nationals else 0)
+        investor_rows = df[(df['tier'] == 1) & (df['national'] == wf_batch)]
+        if wf_cat:
+            investor_rows = investor_rows[investor_rows['category'] == wf_cat]
+        with profiler.stage("tab3.botg_pay"):
+            paid = fee_chain.botg_pay(investor_rows, chain)
+        batch_view = pd.concat([investor_rows[['display_work', 'state', 'price']], paid.iloc[:, :-2], paid[['botg_gets']]], axis=1)
+        batch_view = batch_view.rename(columns={'display_work': "Work Type", 'state': "State", 'price': "Allowable", 'botg_gets': "BOTG Gets"})
+        batch_view = batch_view.rename(columns=lambda c: c.replace("after ", "After ", 1))
+        if wf_cat:
+            st.caption(f"Showing {wf_cat} only (the category picked above).")
+        st.dataframe(
+            batch_view, hide_index=True, use_container_width=True,
+            column_config={c: st.column_config.NumberColumn(format="$%.2f") for c in batch_view.columns[2:]}
+        )
+
+# ========================
+# TAB 4: BID SHEET
+# ========================
+with tab4, profiler.stage("tab4"):
+    st.markdown("### Price a Whole Work-Order Export")
+    st.caption("Upload a CSV or Excel export with work type, state, lot size and investor columns. Every line gets the investor allowable and an estimated BOTG pay.")
+    
+    bid_file = st.file_uploader("Work-order file", type=["csv", "xlsx"], key="bid_upload")
+    
+    if bid_file is not None:
+        # Price each upload once; reruns reuse the priced CSV kept in the session,
+        # which goes away with it (a temp file would outlive an ended session)
+        if st.session_state.get("bid_file_id") != bid_file.file_id:
+            st.session_state.pop("bid_result", None)
+            with st.spinner("Pricing work orders..."), profiler.stage("tab4.price_file"):
+                try:
+                    priced_csv, counts = bidsheet.price_to_bytes(bid_file, df)
+                except ValueError as e:
+                    st.error(str(e))
+                    st.stop()
+            st.session_state["bid_file_id"] = bid_file.file_id
+            st.session_state["bid_result"] = (priced_csv, counts)
+        
+        priced_csv, counts = st.session_state["bid_result"]
+        bc1, bc2, bc3 = st.columns(3)
+        with bc1:
+            st.metric("Lines", f"{counts['lines']:,}")
+        with bc2:
+            st.metric("Priced", f"{counts['matched']:,}")
+        with bc3:
+            st.metric("No Rate Found", f"{counts['unmatched']:,}", delta_color="inverse")
+        
+        st.dataframe(pd.read_csv(io.BytesIO(priced_csv), nrows=200), use_container_width=True, hide_index=True)
+        if counts['lines'] > 200:
+            st.caption(f"Showing the first 200 of {counts['lines']:,} lines. Download for the full priced file.")
+        st.download_button("⬇️ Download Priced File", priced_csv, "priced_work_orders.csv", "text/csv", use_container_width=True)
+        st.markdown("<div class='waterfall-note'>*BOTG estimates use the Pricing Waterfall's standard 25% national / 40% regional splits. Lines with no investor use the best verified rate for that work and state, or its best nationwide rate.</div>", unsafe_allow_html=True)
+    else:
+        st.info("Upload a work-order file to price it against the rate table.")
+
+# ========================
+# TAB 5: QUERY
+# ========================
+with tab5, profiler.stage("tab5"):
+    st.markdown("### Ad-hoc SQL Over the Rate Table")
+    st.caption(f"Read-only SQLite over the `{rate_sql.TABLE}` table. Use `:name` placeholders and fill them in below; one SELECT per run.")
+    with st.expander("Columns"):
+        st.code(", ".join(df.columns), language=None)
+    
+    q1, q2 = st.columns([3, 1])
+    with q1:
+        sql_text = st.text_area("SQL", rate_sql.EXAMPLE_QUERY, height=160, key="sql_text")
+    with q2:
+        sql_params = st.text_area("Parameters", "national=HUD / FHA", height=100, key="sql_params", help="One name=value per line")
+        sql_limit = st.number_input("Row limit", min_value=1, max_value=100_000, value=rate_sql.DEFAULT_ROW_LIMIT, step=1000, key="sql_limit")
+    
+    if st.button("▶️ Run Query", type="primary", key="sql_run"):
+        with st.spinner("Preparing the SQL table..."), profiler.stage("tab5.sql_build"):
+            engine = load_sql(rate_version, df)
+        progress = st.empty()
+        pages = []
+        with profiler.stage("tab5.query"):
+            try:
+                for page in engine.query(sql_text, parse_query_params(sql_params), row_limit=int(sql_limit)):
+                    pages.append(page)
+                    progress.caption(f"Fetched {sum(len(p) for p in pages):,} rows...")
+                st.session_state["sql_result"] = pd.concat(pages, ignore_index=True)
+            except (ValueError, TimeoutError) as e:
+                st.session_state.pop("sql_result", None)
+                st.error(str(e))
+        progress.empty()
+    
+    sql_result = st.session_state.get("sql_result")
+    if sql_result is not None:
+        if len(sql_result) >= sql_limit:
+            st.caption(f"Stopped at the {int(sql_limit):,}-row limit.")
+        else:
+            st.caption(f"{len(sql_result):,} rows")
+        st.dataframe(sql_result, use_container_width=True, hide_index=True)
+        # Written only when the button is clicked, as in Tab 1
+        sql_fmt = st.selectbox("Export format", list(export.EXPORT_FORMATS), key="sql_export_fmt", label_visibility="collapsed")
+        st.download_button(f"⬇️ Export {sql_fmt}", lambda: export.export_file(sql_result, sql_fmt, columns=None),
+                           export.export_filename("rate_query", sql_fmt), export.EXPORT_FORMATS[sql_fmt][1],
+                           use_container_width=True)
 
 # ========================
 # GLOBAL DISCLAIMER
@@ -516,3 +649,24 @@ Always confirm current rates directly with your national or investor before subm
 This data is provided for reference only.
 </div>
 """, unsafe_allow_html=True)
+
+# ========================
+# DEBUG: RERUN PROFILE
+# ========================
+if profiler.finish():
+    with st.sidebar:
+        st.markdown("### ⏱️ Rerun Profile")
+        st.caption(f"Session {profiler.session}, rerun {profiler.rerun}: **{profiler.total_ms:,.1f} ms**. "
+                   f"Every rerun is logged to `{profiler.log_path}`.")
+        st.dataframe(
+            profiler.frame(), hide_index=True, use_container_width=True,
+            column_config={
+                "ms": st.column_config.NumberColumn(format="%.2f"),
+                "share": st.column_config.ProgressColumn(min_value=0.0, max_value=1.0, format="percent"),
+            }
+        )
+        st.markdown("**p50 / p95 across sessions** (this process, last reruns)")
+        st.dataframe(
+            profiling.recent_percentiles(), hide_index=True, use_container_width=True,
+            column_config={c: st.column_config.NumberColumn(format="%.2f") for c in ["p50_ms", "p95_ms", "max_ms"]}
+        )
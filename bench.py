@@ -0,0 +1,852 @@
+"""Benchmarks for the rate tool's data paths.
+
+    python bench.py ingest [--sizes 10000 100000 1000000]
+    python bench.py classify
+    python bench.py lookup [--rows 500000]
+    python bench.py cache [--rows 1000000]
+    python bench.py memory [--rows 1000000]
+    python bench.py render [--cards 25]
+    python bench.py delta [--rows 1000000] [--delta-rows 1000]
+    python bench.py shared [--rows 1000000] [--workers 4]
+    python bench.py sql [--rows 1000000]
+    python bench.py export [--rows 1000000]
+    python bench.py waterfall [--rows 1000000]
+    python bench.py sources [--rows 1000000] [--files 50] [--workers 1 2 4 8]
+    python bench.py search [--labels 5000]
+    python bench.py history [--rows 1000000]
+    python bench.py generate synthetic.csv [--rows 10000000] [--seed 0]
+    python bench.py suite [--sizes 10000 100000 1000000] [--out results.json] [--baseline old.json]
+
+Synthetic rate sheets are drawn from Property_Pricing_Master.csv, so they keep
+the real mix of nationals, work types, states and lot ranges; see synthetic.py.
+
+``suite`` is the regression run for CI: it times load_data and every tab's
+data path at each size, with peak memory, writes the numbers as JSON and,
+given a baseline from an earlier run, exits non-zero when a case got slower
+or bigger than the tolerance allows.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from classify import KeywordClassifier
+from ingest import DEFAULT_PATH, compact_rate_table, load_rate_table, memory_report, process_rate_sheet, read_rate_sheet
+from rate_index import RateIndex
+from synthetic import synthetic_rate_sheet, write_synthetic_sheet
+
+
+# The row-wise load_data path as it stood before ingest.py, kept for comparison
+def legacy_process(raw):
+    df = raw.copy()
+    df['national'] = df['national'].replace({'HUD': 'HUD / FHA'})
+
+    def categorize_lot(size_str):
+        if pd.isna(size_str) or str(size_str).strip() == "": return ""
+        s = str(size_str).lower().replace('sf', '').strip()
+        for label, keys in LEGACY_LOT_BUCKETS:
+            if any(x in s for x in keys):
+                return label
+        return f"Unrecognized ({size_str.strip()})"
+
+    df['lot_size'] = df['lot_size'].apply(categorize_lot)
+    df.fillna("N/A_TEMP", inplace=True)
+    group_cols = [c for c in df.columns if c != 'price']
+    df = df.groupby(group_cols, as_index=False)['price'].max()
+    df.replace("N/A_TEMP", "", inplace=True)
+    df['display_work'] = df.apply(
+        lambda x: f"{x['work_type']} ({x['lot_size']})" if str(x['lot_size']).strip() != "" else x['work_type'],
+        axis=1
+    )
+    df['category'] = df['display_work'].apply(legacy_categorize)
+    return df
+
+
+LEGACY_LOT_BUCKETS = [
+    ("Standard Lot (<10,000 sf)", ['1-10000', '1-5000', '5001-10000', '1-1000', '1001-5000', '5001-8000', '8001-10000']),
+    ("Medium Lot (10k-25k sf)", ['10001-20000', '10001-15000', '15001-20000', '12001-15000', '15001-18000', '18001-20000', '10001-10890', '1-10890', '10891-12000', '1-15000', '15001-25000', '10001+']),
+    ("Oversized Lot (25k+ sf)", ['25001', '30001', '35001', '40001', '20001-30000', '20001-25000', '25001-35000', '35001-43560', '20001-21780', '21781-25000']),
+]
+
+
+def legacy_categorize(wt):
+    wt_lower = str(wt).lower()
+    if 'grass' in wt_lower or 'lawn' in wt_lower or 'recut' in wt_lower or 'landscape' in wt_lower or 'shrub' in wt_lower or 'tree trim' in wt_lower:
+        return "🌿 Grass & Lawn"
+    elif 'winteriz' in wt_lower or 'dewint' in wt_lower or 'thaw' in wt_lower or 're-wint' in wt_lower or 'pressure test' in wt_lower:
+        return "❄️ Winterization"
+    elif 'lock' in wt_lower or 'padlock' in wt_lower or 'board' in wt_lower or 'secur' in wt_lower or 'slider' in wt_lower or 'slide bolt' in wt_lower or 'window lock' in wt_lower or 're-key' in wt_lower or 'rekey' in wt_lower or 'glaz' in wt_lower:
+        return "🔒 Securing & Boarding"
+    elif 'debris' in wt_lower or 'trash' in wt_lower or 'carpet' in wt_lower or 'removal' in wt_lower or 'vehicle' in wt_lower or 'tire' in wt_lower or 'appliance' in wt_lower or 'refriger' in wt_lower or 'hazard' in wt_lower or 'personal property' in wt_lower:
+        return "🗑️ Debris & Removal"
+    elif 'roof' in wt_lower or 'gutter' in wt_lower or 'chimney' in wt_lower or 'tarp' in wt_lower:
+        return "🏠 Roof & Gutters"
+    elif 'inspect' in wt_lower or 'occupancy' in wt_lower or 'verification' in wt_lower or 'photo' in wt_lower:
+        return "🔍 Inspections"
+    elif 'snow' in wt_lower:
+        return "🌨️ Snow Removal"
+    elif 'clean' in wt_lower or 'broom' in wt_lower or 'maid' in wt_lower or 'janitorial' in wt_lower or 'sales clean' in wt_lower:
+        return "🧹 Cleaning"
+    elif 'sump' in wt_lower or 'dehumid' in wt_lower or 'basement' in wt_lower or 'mold' in wt_lower or 'cap' in wt_lower or 'wire' in wt_lower or 'outlet' in wt_lower or 'electric' in wt_lower or 'well' in wt_lower or 'septic' in wt_lower:
+        return "🔧 Utilities & Mechanicals"
+    elif 'pool' in wt_lower or 'spa' in wt_lower or 'hot tub' in wt_lower:
+        return "🏊 Pools & Spas"
+    elif 'smoke' in wt_lower or 'co2' in wt_lower or 'co detector' in wt_lower or 'handrail' in wt_lower or 'step' in wt_lower or 'guard' in wt_lower or 'extermin' in wt_lower or 'pest' in wt_lower:
+        return "⚠️ Health & Safety"
+    elif 'door' in wt_lower or 'garage' in wt_lower or 'fence' in wt_lower or 'graffiti' in wt_lower or 'overhead' in wt_lower or 'pressure wash' in wt_lower or 'address' in wt_lower:
+        return "🔨 Repairs & Maintenance"
+    elif 'trip' in wt_lower or 'access' in wt_lower or 'eviction' in wt_lower or 'emergency' in wt_lower or 'allowance' in wt_lower or 'initial service' in wt_lower:
+        return "🚗 Service Calls & Admin"
+    else:
+        return "📦 Other Services"
+
+
+def timed(func, *args, repeat=1):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, out
+
+
+def assert_same_rows(expected, actual):
+    # Blank text used to sort as a sentinel string and now sorts as NA, so
+    # compare the tables as row sets rather than in order
+    def ordered(df):
+        return df.sort_values(list(df.columns), kind='stable').reset_index(drop=True)
+    pd.testing.assert_frame_equal(ordered(expected), ordered(actual))
+
+
+def bench_ingest(sizes):
+    print(f"{'rows':>10} {'legacy rows/s':>15} {'ingest rows/s':>15} {'speedup':>8}")
+    for n in sizes:
+        raw = synthetic_rate_sheet(n)
+        old_s, old = timed(legacy_process, raw)
+        new_s, _ = timed(process_rate_sheet, raw)
+        assert_same_rows(old, process_rate_sheet(raw, compact=False)[old.columns])
+        print(f"{n:>10,} {n / old_s:>15,.0f} {n / new_s:>15,.0f} {old_s / new_s:>7.1f}x")
+
+
+def check_classifier_parity(path=DEFAULT_PATH):
+    # Every work type and display label in the sheet must land where the old elif chain put it
+    table = process_rate_sheet(read_rate_sheet(path))
+    labels = pd.unique(pd.concat([table['work_type'], table['display_work']]))
+    classifier = KeywordClassifier()
+    mismatches = [(label, legacy_categorize(label), classifier.classify(label))
+                  for label in labels if legacy_categorize(label) != classifier.classify(label)]
+    if mismatches:
+        raise AssertionError(f"{len(mismatches)} labels differ from the legacy chain, e.g. {mismatches[:3]}")
+    return labels
+
+
+def bench_classify():
+    labels = check_classifier_parity()
+    print(f"parity ok over {len(labels):,} distinct labels")
+    old_s, _ = timed(lambda: [legacy_categorize(label) for label in labels], repeat=5)
+    # Bypass the memo cache so this measures the matcher itself
+    classifier = KeywordClassifier()
+    new_s, _ = timed(lambda: [classifier._classify(label) for label in labels], repeat=5)
+    print(f"legacy chain:    {old_s * 1e6 / len(labels):8.2f} us/label")
+    print(f"compiled regex:  {new_s * 1e6 / len(labels):8.2f} us/label (uncached)")
+
+    raw = synthetic_rate_sheet(1_000_000)
+    works = raw['work_type']
+    old_s, _ = timed(works.map, legacy_categorize)
+    new_s, _ = timed(KeywordClassifier().classify_many, works)
+    print(f"1,000,000 rows:  legacy per-row {old_s:.2f}s, memoized per-distinct {new_s:.3f}s")
+
+
+# Data work of one Rate Lookup rerun as app.py did it before RateIndex
+def legacy_tab1_rerun(df, categories, investors, works, states):
+    cat_filtered = df.copy()
+    if categories: cat_filtered = cat_filtered[cat_filtered['category'].isin(categories)]
+    if investors: cat_filtered = cat_filtered[cat_filtered['national'].isin(investors)]
+    valid_works = sorted(cat_filtered['display_work'].unique())
+    ghost_works = sorted(set(sorted(df['display_work'].unique())) - set(valid_works))
+    state_filtered = cat_filtered
+    if works: state_filtered = state_filtered[state_filtered['display_work'].isin(works)]
+    valid_states = sorted(state_filtered['state'].unique())
+    ghost_states = sorted(set(sorted(df['state'].unique())) - set(valid_states))
+    result = df.copy()
+    if categories: result = result[result['category'].isin(categories)]
+    if investors: result = result[result['national'].isin(investors)]
+    if works: result = result[result['display_work'].isin(works)]
+    if states: result = result[result['state'].isin(states)]
+    return valid_works, ghost_works, valid_states, ghost_states, result
+
+
+def indexed_tab1_rerun(index, categories, investors, works, states):
+    cat_mask = index.mask(category=categories, national=investors)
+    state_mask = index.mask(category=categories, national=investors, display_work=works)
+    result = index.rows(index.mask(category=categories, national=investors, display_work=works, state=states))
+    return (index.options('display_work', cat_mask), index.missing('display_work', cat_mask),
+            index.options('state', state_mask), index.missing('state', state_mask), result)
+
+
+def bench_lookup(n_rows):
+    df = process_rate_sheet(synthetic_rate_sheet(n_rows))
+    build_s, index = timed(RateIndex, df)
+    print(f"{len(df):,} processed rows; index built in {build_s * 1e3:.0f} ms")
+
+    grass = "🌿 Grass & Lawn"
+    work = sorted(df.loc[df['category'] == grass, 'display_work'].unique())[0]
+    scenarios = [
+        ("default (HUD / FHA)", [], ["HUD / FHA"], [], []),
+        ("category + investor", [grass], ["HUD / FHA", "VA"], [], []),
+        ("work + state", [], [], [work], ["Ohio", "Texas"]),
+        ("all four filters", [grass], ["HUD / FHA"], [work], ["Ohio"]),
+    ]
+    print(f"{'scenario':<22} {'legacy ms':>10} {'indexed ms':>11} {'speedup':>8}")
+    for name, *selection in scenarios:
+        old_s, old = timed(legacy_tab1_rerun, df, *selection, repeat=3)
+        new_s, new = timed(indexed_tab1_rerun, index, *selection, repeat=3)
+        assert old[:4] == new[:4]
+        pd.testing.assert_frame_equal(old[4], new[4])
+        print(f"{name:<22} {old_s * 1e3:>10.1f} {new_s * 1e3:>11.1f} {old_s / new_s:>7.1f}x")
+
+
+STARTUP_SNIPPET = """
+import sys, time
+start = time.perf_counter()
+import table_cache
+df = table_cache.load_cached_rate_table(sys.argv[1], memory_map=sys.argv[2] == 'mmap')
+print(time.perf_counter() - start, len(df))
+"""
+
+
+def _fresh_process_load(csv_path, mode):
+    here = os.path.dirname(os.path.abspath(__file__))
+    out = subprocess.run([sys.executable, '-c', STARTUP_SNIPPET, csv_path, mode],
+                         cwd=here, capture_output=True, text=True, check=True).stdout.split()
+    return float(out[0]), int(out[1])
+
+
+def bench_cache(n_rows):
+    import table_cache
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'rates.csv')
+        synthetic_rate_sheet(n_rows).to_csv(csv_path, index=False)
+        print(f"{n_rows:,}-row sheet ({os.path.getsize(csv_path) / 1e6:.0f} MB), time to loaded frame in a fresh process, imports included:")
+        for mode in ('cold', 'warm', 'mmap'):
+            if mode == 'cold':
+                for stale in table_cache._stale_caches(csv_path, keep=None):
+                    os.remove(stale)
+            seconds, rows = _fresh_process_load(csv_path, mode)
+            print(f"  {mode:<5} {seconds:7.2f}s  ({rows:,} rows)")
+
+
+def bench_memory(n_rows):
+    plain = process_rate_sheet(synthetic_rate_sheet(n_rows), compact=False)
+    compact_s, compact = timed(compact_rate_table, plain)
+    print(f"{len(plain):,} processed rows; compacting took {compact_s:.2f}s")
+    report = memory_report(plain, compact)
+    print((report[['before_bytes', 'after_bytes']] / 1e6).round(2).rename(columns=lambda c: c.replace('bytes', 'MB'))
+          .assign(ratio=report['ratio']).to_string())
+
+
+# Per-row HTML as app.py emitted it before render.py: one st.markdown per row
+def legacy_card_html(row):
+    status_icon = "✅ Active & Verified" if row['tier'] == 1 else "⚠️ Community Data"
+    zone_tag = f" · 📍 {row['region_override']}" if pd.notna(row['region_override']) else ""
+    date = row['last_updated'].strftime('%Y-%m-%d') if pd.notna(row['last_updated']) else "—"
+    return f"""
+    <div class='card'>
+        <div style='color: #4b5563; font-size: 0.85em; text-transform: uppercase; font-weight: bold;'>{row['national']}{zone_tag}</div>
+        <div style='font-size: 1.1em; font-weight: bold; margin-bottom: 5px;'>{row['display_work']} — {row['state']}</div>
+        <div style='font-size: 1.4em; color: #059669; font-weight: bold; margin-bottom: 8px;'>${row['price']:,.2f} <span style='font-size: 0.7em; color: #6b7280;'>{row['unit']}</span></div>
+        <div style='font-size: 0.85em; margin-bottom: 10px; color: #4b5563;'><i>{status_icon} · {date}</i></div>
+        {"<div style='font-size: 0.9em; border-top: 1px solid #e5e7eb; padding-top: 8px;'>" + str(row['notes']) + "</div>" if pd.notna(row['notes']) else ""}
+    </div>
+    """
+
+
+def legacy_bar_html(row, max_price):
+    bar_pct = (row['price'] / max_price * 100) if max_price > 0 else 0
+    bar_color = "#059669" if row['tier'] == 1 else "#d97706"
+    tier_tag = "✅" if row['tier'] == 1 else "⚠️"
+    zone_note = f" ({row['region_override']})" if pd.notna(row['region_override']) else ""
+    date = row['last_updated'].strftime('%Y-%m-%d') if pd.notna(row['last_updated']) else "—"
+    return f"""
+    <div class='waterfall-row'>
+        <div class='waterfall-label'>{tier_tag} {row['national']}{zone_note}</div>
+        <div style='flex: 1;'>
+            <div class='waterfall-bar' style='width: {max(bar_pct, 8)}%; background-color: {bar_color};'>${row['price']:,.2f}</div>
+        </div>
+        <div class='waterfall-amount'>{date}</div>
+    </div>
+    """
+
+
+def _markdown_messages(bodies):
+    # The ForwardMsg deltas Streamlit would send for one st.markdown call per body
+    from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+    messages = []
+    for i, body in enumerate(bodies):
+        msg = ForwardMsg()
+        msg.metadata.delta_path[:] = [0, i]
+        msg.delta.new_element.markdown.body = body
+        msg.delta.new_element.markdown.allow_html = True
+        messages.append(msg.SerializeToString())
+    return messages
+
+
+def bench_render(n_cards):
+    import render
+    from comparison import ComparisonCube
+
+    df = process_rate_sheet(read_rate_sheet(DEFAULT_PATH))
+    cube = ComparisonCube(df)
+    pair = cube.stats.sort_values('companies', ascending=False).iloc[0]
+    views = [
+        (f"{n_cards} result cards", df.head(n_cards),
+         lambda rows: [legacy_card_html(r) for _, r in rows.iterrows()], render.result_cards_html),
+        (f"{pair['companies']} comparison bars", cube.rows(pair['display_work'], pair['state']),
+         lambda rows: [legacy_bar_html(r, rows['price'].max()) for _, r in rows.iterrows()], render.comparison_bars_html),
+    ]
+    print("Browser paint time is not measured here; each view is costed as the Streamlit deltas it sends.")
+    print(f"{'view':<24} {'path':<8} {'deltas':>7} {'bytes':>8} {'build ms':>9}")
+    for name, rows, legacy, batched in views:
+        for path, build in (('per-row', legacy), ('batched', lambda r: [batched(r)])):
+            seconds, messages = timed(lambda: _markdown_messages(build(rows)), repeat=5)
+            print(f"{name:<24} {path:<8} {len(messages):>7} {sum(map(len, messages)):>8,} {seconds * 1e3:>9.2f}")
+
+
+def synthetic_delta(sheet, n_rows, seed=1):
+    """A delta against ``sheet``: 70% repriced keys, 20% new keys, 10% retired keys."""
+    rng = np.random.default_rng(seed)
+    n_new, n_retired = n_rows // 5, n_rows // 10
+    picks = sheet.iloc[rng.choice(len(sheet), n_rows, replace=False)]
+    changed = picks.iloc[:n_rows - n_new - n_retired].assign(price=lambda d: (d['price'] * 1.05).round(2))
+    new = picks.iloc[len(changed):len(changed) + n_new].assign(national=lambda d: "Delta Servicer " + d.index.astype(str))
+    retired = picks.iloc[len(changed) + n_new:][['national', 'work_type', 'state', 'lot_size']].assign(action='retire')
+    return pd.concat([changed, new, retired], ignore_index=True)
+
+
+def _rebuild(csv_path):
+    from comparison import ComparisonCube
+
+    df = load_rate_table(csv_path)
+    return df, RateIndex(df), ComparisonCube(df)
+
+
+def bench_delta(n_rows, n_delta):
+    from rate_store import RateStore, _raw_rows, read_delta
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path, delta_path = os.path.join(tmp, 'rates.csv'), os.path.join(tmp, 'delta.csv')
+        sheet = synthetic_rate_sheet(n_rows)
+        sheet.to_csv(csv_path, index=False)
+        store = RateStore(csv_path)
+        # The first delta also reads the raw sheet; warm that up with an empty one
+        load_s, _ = timed(store.apply_delta, sheet.iloc[:0])
+        print(f"{len(store.table):,} processed rows; raw sheet loaded for deltas in {load_s:.2f}s (first delta only)")
+
+        delta = synthetic_delta(sheet, n_delta)
+        delta.to_csv(delta_path, index=False)
+        delta_s, summary = timed(lambda: store.apply_delta(read_delta(delta_path)))
+        print(f"{n_delta:,}-row delta: {delta_s:.2f}s  ({summary})")
+
+        # Full rebuild: what a reload does with the updated sheet
+        _raw_rows(store._sheet).to_csv(csv_path, index=False)
+        full_s, (df, index, _) = timed(lambda: _rebuild(csv_path))
+        print(f"full rebuild of the same table: {full_s:.2f}s  ({full_s / delta_s:.0f}x the delta)")
+        # Spliced categoricals keep labels in arrival order, so compare the labels themselves
+        assert_same_rows(_plain_labels(df), _plain_labels(store.table))
+        for col, fresh in index.columns.items():
+            spliced = store.index.columns[col]
+            assert fresh.values.tolist() == spliced.values.tolist(), col
+            assert np.array_equal(fresh.codes[fresh.order], spliced.codes[spliced.order]), col
+
+
+def _plain_labels(df):
+    return df.astype({c: object for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)})
+
+
+WORKER_SNIPPET = """
+import sys, time
+start = time.perf_counter()
+import {module}
+
+def smaps():
+    fields = dict(line.split()[:2] for line in open('/proc/self/smaps_rollup'))
+    return [int(fields[k]) for k in ('Pss:', 'Private_Dirty:', 'Shared_Clean:')]
+
+imported = smaps()
+df = {load}
+df['price'].sum(), df['lot_min_sf'].sum(), df['last_updated'].max(), df['notes'].str.len().sum()
+print(time.perf_counter() - start, *[after - before for after, before in zip(smaps(), imported)], flush=True)
+sys.stdin.read()
+"""
+
+
+def _run_workers(snippet, n_workers):
+    # Workers stay up until every one has reported, so shared pages are counted as shared
+    here = os.path.dirname(os.path.abspath(__file__))
+    procs = [subprocess.Popen([sys.executable, '-c', snippet], cwd=here, text=True,
+                              stdin=subprocess.PIPE, stdout=subprocess.PIPE) for _ in range(n_workers)]
+    reports = [np.array(p.stdout.readline().split(), dtype=float) for p in procs]
+    for p in procs:
+        p.communicate('')
+    return np.array(reports)
+
+
+def bench_shared(n_rows, n_workers):
+    from shared_table import publish_rate_table
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path, shared_path = os.path.join(tmp, 'rates.csv'), os.path.join(tmp, 'rates.arrow')
+        synthetic_rate_sheet(n_rows).to_csv(csv_path, index=False)
+        # Warm the per-worker cache too, so both backends skip the pipeline
+        import table_cache
+        publish_rate_table(table_cache.load_cached_rate_table(csv_path), shared_path)
+        backends = [
+            ("own cache", 'table_cache', f"table_cache.load_cached_rate_table({csv_path!r})"),
+            ("shared", 'table_cache', f"table_cache.read_table_cache({shared_path!r})"),
+            ("shared+idx", 'shared_table', f"shared_table.SharedRateTable({shared_path!r}).snapshot()[1]"),
+        ]
+        print(f"{n_rows:,}-row sheet, {n_workers} workers loading at once. Memory is what loading added")
+        print("per worker, from Linux smaps; shared+idx also attaches the published RateIndex and ComparisonCube.")
+        print(f"{'backend':<11} {'load s':>7} {'PSS':>7} {'private':>8} {'shared':>7}")
+        for name, module, load in backends:
+            snippet = WORKER_SNIPPET.format(module=module, load=load)
+            seconds, pss, private, shared = _run_workers(snippet, n_workers).mean(axis=0)
+            print(f"{name:<11} {seconds:>7.2f} {pss / 1024:>7.0f} {private / 1024:>8.0f} {shared / 1024:>7.0f}")
+
+
+def bench_sql(n_rows):
+    import rate_sql
+
+    df = process_rate_sheet(synthetic_rate_sheet(n_rows))
+    build_s, engine = timed(rate_sql.RateSQL, df)
+    print(f"{len(df):,} processed rows; SQLite table and indexes built in {build_s:.2f}s")
+    work = df['display_work'].iloc[0]
+    queries = [
+        ("avg HUD allowable by category/state", rate_sql.EXAMPLE_QUERY, {'national': "HUD / FHA"}),
+        ("avg rate per national in one state",
+         "SELECT national, AVG(price), COUNT(*) FROM rates WHERE state = ? GROUP BY national", ("Ohio",)),
+        ("one work, every rate, by price", "SELECT * FROM rates WHERE display_work = ? ORDER BY price DESC", (work,)),
+        ("full-table group by category", "SELECT category, COUNT(*), AVG(price) FROM rates GROUP BY category", None),
+    ]
+    print(f"{'query':<38} {'rows':>6} {'ms':>8}")
+    for name, sql, params in queries:
+        seconds, result = timed(engine.run, sql, params, repeat=3)
+        print(f"{name:<38} {len(result):>6,} {seconds * 1e3:>8.1f}")
+
+
+def legacy_export(result):
+    # Tab 1's Export CSV as built on every rerun before export.py
+    csv_export = result[['national', 'display_work', 'state', 'price', 'unit', 'tier', 'last_updated', 'notes', 'region_override']].copy()
+    csv_export.rename(columns={'national': 'Company', 'display_work': 'Work Type', 'state': 'State', 'price': 'Rate', 'unit': 'Unit',
+                               'tier': 'Tier', 'last_updated': 'Date', 'notes': 'Notes', 'region_override': 'Zone'}, inplace=True)
+    yield csv_export.to_csv(index=False).encode('utf-8')
+
+
+def _measure_stream(make_chunks):
+    # Time to the first chunk, total time and bytes; then, in a second traced
+    # pass (tracemalloc slows allocation a lot), the peak Python-heap allocation
+    import tracemalloc
+
+    start = time.perf_counter()
+    first, size = None, 0
+    for data in make_chunks():
+        first = first or time.perf_counter() - start
+        size += len(data)
+    total = time.perf_counter() - start
+
+    tracemalloc.start()
+    for data in make_chunks():
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return first, total, size, peak
+
+
+def bench_export(n_rows):
+    import export
+
+    result = process_rate_sheet(synthetic_rate_sheet(n_rows))
+    print(f"Exporting all {len(result):,} processed rows; peak is Python-heap allocation (tracemalloc), "
+          "so Arrow's own buffers in the Parquet writer are not counted")
+    print(f"{'path':<22} {'first byte s':>12} {'total s':>8} {'MB out':>7} {'peak MB':>8}")
+    paths = [("legacy to_csv string", lambda: legacy_export(result))]
+    paths += [(f"chunked {fmt}", lambda fmt=fmt: export.iter_export_chunks(result, fmt)) for fmt in export.EXPORT_FORMATS]
+    for name, chunks in paths:
+        first, total, size, peak = _measure_stream(chunks)
+        print(f"{name:<22} {first:>12.3f} {total:>8.2f} {size / 1e6:>7.1f} {peak / 1e6:>8.1f}")
+
+
+def bench_waterfall(n_rows):
+    import rates
+    from fee_chain import FeeChain
+
+    table = process_rate_sheet(read_rate_sheet(DEFAULT_PATH))
+    rng = np.random.default_rng(0)
+    rows = table.iloc[rng.integers(0, len(table), n_rows)].reset_index(drop=True)
+    price, nationals, categories = rows['price'].to_numpy(dtype=float), rows['national'], rows['category']
+    deep = FeeChain([
+        {'name': "National", 'pct': 0.25, 'by_national': {"HUD / FHA": {'pct': 0.20}, "VA": {'pct': 0.22}}},
+        {'name': "Regional", 'pct': 0.40, 'by_category': {"🌨️ Snow Removal": {'pct': 0.30, 'flat': 5.0}}},
+        {'name': "Sub", 'pct': 0.20, 'flat': 2.50},
+        {'name': "Sub-sub", 'pct': 0.15},
+    ])
+    standard = FeeChain()
+    split = standard.evaluate(price)
+    np.testing.assert_allclose(split['botg_gets'], rates.waterfall(price)['botg_gets'])
+
+    sample = price[:20_000]
+    loop_s, _ = timed(lambda: [rates.waterfall(rate)['botg_gets'] for rate in sample])
+    print(f"{n_rows:,} rates drawn from the processed table; standard chain matches rates.waterfall")
+    print(f"{'path':<40} {'s':>7} {'M evals/s':>10}")
+    print(f"{'per-rate rates.waterfall (extrapolated)':<40} {loop_s * n_rows / len(sample):>7.2f} "
+          f"{len(sample) / loop_s / 1e6:>10.2f}")
+    paid = deep.evaluate(price, nationals, categories)['remaining'][np.arange(n_rows), rng.integers(0, len(deep) + 1, n_rows)]
+    paths = [
+        ("evaluate, standard 2 layers", lambda: standard.evaluate(price)),
+        ("evaluate, 4 layers + overrides", lambda: deep.evaluate(price, nationals, categories)),
+        ("layers_deep, 4 layers + overrides", lambda: deep.layers_deep(price, paid, nationals, categories)),
+    ]
+    for name, run in paths:
+        seconds, _ = timed(run, repeat=3)
+        print(f"{name:<40} {seconds:>7.3f} {n_rows / seconds / 1e6:>10.2f}")
+
+
+SEARCH_QUERIES = ["rekey", "re key", "lawn", "grass cut", "winterizaton", "board", "smoke det", "roof tarp"]
+
+
+def bench_search(n_labels):
+    from classify import categorize_works
+    from work_search import WorkSearchIndex
+
+    real = process_rate_sheet(read_rate_sheet(DEFAULT_PATH))['display_work'].unique().tolist()
+    # A production-size catalogue: the real labels again under made-up variants
+    variants = [f"{label} - Variant {i}" for i in range(n_labels // len(real) + 1) for label in real]
+    for name, labels in [("real", real), ("synthetic", sorted(set(real + variants))[:n_labels])]:
+        build_s, index = timed(lambda: WorkSearchIndex(labels, categorize_works(pd.Series(labels)), cache_size=0))
+        print(f"{name}: {len(labels):,} labels, index built in {build_s * 1e3:.1f} ms")
+        print(f"  {'query':<16} {'ms':>7}  top match")
+        for query in SEARCH_QUERIES:
+            seconds, found = timed(index.search, query, repeat=20)
+            flag = "" if seconds < 1e-3 else "  (over 1 ms)"
+            print(f"  {query!r:<16} {seconds * 1e3:>7.3f}  {found[0] if found else '-'}{flag}")
+
+
+def legacy_as_of(df, national, work, state, date):
+    rows = df[(df['national'] == national) & (df['display_work'] == work) & (df['state'] == state)
+              & (df['last_updated'] <= date)]
+    return rows.loc[rows['last_updated'] == rows['last_updated'].max(), 'price'].max()
+
+
+def legacy_latest_as_of(df, date):
+    rows = df[df['last_updated'] <= date]
+    latest = rows.groupby(['national', 'display_work', 'state'], observed=True)['last_updated'].transform('max')
+    return rows[rows['last_updated'] == latest].groupby(
+        ['national', 'display_work', 'state'], observed=True, as_index=False)['price'].max()
+
+
+def bench_history(n_rows):
+    from rate_history import RateHistory
+
+    df = process_rate_sheet(synthetic_rate_sheet(n_rows))
+    build_s, history = timed(RateHistory, df)
+    print(f"{n_rows:,} synthetic sheet rows -> {len(df):,} rates, {history.n_keys:,} keys, {len(history):,} events; "
+          f"history built in {build_s:.2f}s")
+
+    date = pd.Timestamp("2018-06-30")
+    rng = np.random.default_rng(0)
+    sample = df.iloc[rng.integers(0, len(df), 200)][['national', 'display_work', 'state']].astype(object)
+    keys = list(sample.itertuples(index=False, name=None))
+    for key in keys[:20]:
+        expected = legacy_as_of(df, *key, date)
+        found = history.as_of(*key, date)
+        assert (found is None and pd.isna(expected)) or found['price'] == expected, key
+    legacy_s, _ = timed(lambda: [legacy_as_of(df, *key, date) for key in keys[:20]])
+    fast_s, _ = timed(lambda: [history.as_of(*key, date) for key in keys], repeat=3)
+    print(f"{'as_of, one rate':<30} {legacy_s / 20 * 1e3:>9.3f} ms filtered  {fast_s / len(keys) * 1e3:>9.4f} ms indexed")
+
+    legacy_s, expected = timed(legacy_latest_as_of, df, date)
+    fast_s, found = timed(history.latest_as_of, date, repeat=3)
+    found = found[found['last_updated'].notna()][['national', 'display_work', 'state', 'price']]
+    assert_same_rows(expected.astype({c: str for c in ['national', 'display_work', 'state']}),
+                     found.astype({c: str for c in ['national', 'display_work', 'state']}).reset_index(drop=True))
+    print(f"{'latest_as_of, whole table':<30} {legacy_s * 1e3:>9.1f} ms groupby   {fast_s * 1e3:>9.1f} ms indexed")
+
+
+SUITE_SIZES = [10_000, 100_000, 1_000_000]
+# Differences below these are noise, whatever the ratio
+SUITE_MIN_SECONDS = 0.025
+SUITE_MIN_MB = 1.0
+
+
+def _peak_mb(func):
+    # Peak Python-heap allocation of one call, in its own pass since tracemalloc slows
+    # allocation; Arrow's memory pool is outside the Python heap and not counted
+    import tracemalloc
+
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+
+
+def suite_cases(df, csv_path):
+    """(case, func) for every tab's data path over the processed table ``df`` of the sheet at ``csv_path``."""
+    import bidsheet
+    import export
+    import fee_chain
+    import rate_sql
+    from comparison import ComparisonCube
+
+    index, cube, sql = RateIndex(df), ComparisonCube(df), rate_sql.RateSQL(df)
+    pair = cube.stats.sort_values('companies', ascending=False).iloc[0]
+    category = df['category'].value_counts().index[0]
+    table = bidsheet.pricing_table(df)
+    orders = pd.read_csv(csv_path, nrows=10_000, usecols=['work_type', 'state', 'lot_size', 'national'])
+
+    def tab1_filter():
+        # One Tab 1 rerun: the cascading option lists, then the result rows
+        by_category = index.mask(category=[category], national=["HUD / FHA"])
+        works = index.options('display_work', by_category)
+        states = index.options('state', index.mask(category=[category], national=["HUD / FHA"], display_work=works[:3]))
+        return index.rows(index.mask(category=[category], national=["HUD / FHA"], display_work=works[:3], state=states))
+
+    def tab2_compare():
+        return cube.states(pair['display_work']), cube.rows(pair['display_work'], pair['state']), cube.leaderboard(n=25)
+
+    return [
+        ('tab1.index', lambda: RateIndex(df)),
+        ('tab1.filter', tab1_filter),
+        ('tab2.cube', lambda: ComparisonCube(df)),
+        ('tab2.compare', tab2_compare),
+        ('tab3.botg_pay', lambda: fee_chain.botg_pay(df[(df['tier'] == 1).to_numpy(dtype=bool, na_value=False)])),
+        ('tab4.price', lambda: bidsheet.price_work_orders(orders, table)),
+        ('tab5.sql_build', lambda: rate_sql.RateSQL(df)),
+        ('tab5.query', lambda: sql.run(rate_sql.EXAMPLE_QUERY, {'national': "HUD / FHA"})),
+        ('export.csv', lambda: sum(len(data) for data in export.iter_export_chunks(df, 'CSV'))),
+    ]
+
+
+def _suite_meta():
+    import pyarrow
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'created': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'), 'commit': commit,
+        'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+        'pyarrow': pyarrow.__version__, 'cpus': os.cpu_count(),
+    }
+
+
+def suite_regressions(results, baseline, tolerance):
+    """Cases in ``results`` slower or bigger than in ``baseline`` by more than ``tolerance`` (0.25 = 25%)."""
+    before = {(r['case'], r['rows']): r for r in baseline['results']}
+    found = []
+    for r in results:
+        old = before.get((r['case'], r['rows']))
+        if old is None:
+            continue
+        for key, floor in (('seconds', SUITE_MIN_SECONDS), ('peak_mb', SUITE_MIN_MB)):
+            if r[key] > old[key] * (1 + tolerance) and r[key] - old[key] > floor:
+                found.append(f"{r['case']} @ {r['rows']:,} rows: {key} {old[key]:.3f} -> {r[key]:.3f}")
+    return found
+
+
+def bench_suite(sizes, out, baseline_path, tolerance):
+    baseline = None
+    if baseline_path:
+        with open(baseline_path, encoding='utf-8') as f:
+            baseline = json.load(f)
+    before = {(r['case'], r['rows']): r for r in baseline['results']} if baseline else {}
+    results = []
+    print(f"{'case':<15} {'rows':>10} {'seconds':>9} {'peak MB':>8} {'vs base':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            csv_path = os.path.join(tmp, f'rates_{n}.csv')
+            write_synthetic_sheet(csv_path, n)
+            # Best of five for small sheets; one run is steady enough at a million rows
+            repeat = 5 if n < 1_000_000 else 1
+            seconds, df = timed(load_rate_table, csv_path, repeat=repeat)
+            cases = [('load_data', seconds, _peak_mb(lambda: load_rate_table(csv_path)))]
+            for case, func in suite_cases(df, csv_path):
+                seconds, _ = timed(func, repeat=repeat)
+                cases.append((case, seconds, _peak_mb(func)))
+            for case, seconds, peak in cases:
+                result = {'case': case, 'rows': n, 'table_rows': len(df), 'seconds': seconds, 'peak_mb': peak}
+                results.append(result)
+                old = before.get((case, n))
+                ratio = f"{seconds / old['seconds']:>7.2f}x" if old and old['seconds'] > 0 else ""
+                print(f"{case:<15} {n:>10,} {seconds:>9.4f} {peak:>8.1f} {ratio:>8}")
+
+    if out:
+        with open(out, 'w', encoding='utf-8') as f:
+            json.dump({'meta': _suite_meta(), 'results': results}, f, indent=1)
+        print(f"results -> {out}")
+    if baseline:
+        regressions = suite_regressions(results, baseline, tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions beyond {tolerance:.0%} against {baseline_path} ({baseline['meta'].get('commit')})")
+
+
+def split_into_sheets(raw, directory, n_files, xlsx_every=10):
+    """Write ``raw`` as about ``n_files`` per-national, per-year sheets; every ``xlsx_every``-th is XLSX."""
+    year = raw['last_updated'].astype(str).str[:4]
+    keys = raw['national'].astype(str) + "_" + year
+    sizes = keys.value_counts()
+    # The biggest (national, year) groups get their own sheet, the long tail shares the last one
+    own = sizes.index[:n_files - 1]
+    keys = keys.where(keys.isin(own), "other")
+    paths = []
+    for i, (key, rows) in enumerate(raw.groupby(keys, sort=True)):
+        name = key.replace(" ", "_").replace("/", "-")
+        if xlsx_every and i % xlsx_every == xlsx_every - 1 and len(rows) <= 50_000:
+            path = os.path.join(directory, f"{name}.xlsx")
+            rows.to_excel(path, index=False)
+        else:
+            path = os.path.join(directory, f"{name}.csv")
+            rows.to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def bench_sources(n_rows, n_files, worker_counts):
+    import shutil
+
+    import sources
+
+    raw = synthetic_rate_sheet(n_rows)
+    with tempfile.TemporaryDirectory() as tmp:
+        sheet_dir, cache_dir = os.path.join(tmp, 'sheets'), os.path.join(tmp, 'cache')
+        os.makedirs(sheet_dir)
+        paths = split_into_sheets(raw, sheet_dir, n_files)
+        n_xlsx = sum(p.endswith('.xlsx') for p in paths)
+        single_s, expected = timed(lambda: process_rate_sheet(sources.read_rate_sheets(sheet_dir)))
+        print(f"{n_rows:,} rows in {len(paths)} sheets ({n_xlsx} XLSX) -> {len(expected):,} processed rows; "
+              f"{os.cpu_count()} CPUs")
+        print(f"{'path':<34} {'s':>7} {'vs serial':>10}")
+        print(f"{'read all, one process_rate_sheet':<34} {single_s:>7.2f} {1:>9.2f}x")
+        for workers in worker_counts:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            seconds, df = timed(sources.load_rate_sources, sheet_dir, cache_dir, workers)
+            assert_same_rows(expected, df)
+            print(f"{f'cold, {workers} worker(s)':<34} {seconds:>7.2f} {single_s / seconds:>9.2f}x")
+
+        # One sheet re-published with a price change: only it is re-parsed
+        changed = next(p for p in paths if p.endswith('.csv'))
+        sheet = pd.read_csv(changed)
+        sheet['price'] = (sheet['price'] * 1.05).round(2)
+        sheet.to_csv(changed, index=False)
+        expected = process_rate_sheet(sources.read_rate_sheets(sheet_dir))
+        seconds, df = timed(sources.load_rate_sources, sheet_dir, cache_dir, max(worker_counts))
+        assert_same_rows(expected, df)
+        print(f"{'one sheet changed':<34} {seconds:>7.2f} {single_s / seconds:>9.2f}x")
+        seconds, df = timed(sources.load_rate_sources, sheet_dir, cache_dir, max(worker_counts))
+        print(f"{'unchanged (merged table cached)':<34} {seconds:>7.2f} {single_s / seconds:>9.2f}x")
+
+
+def bench_generate(output, n_rows, seed):
+    start = time.perf_counter()
+    written = write_synthetic_sheet(output, n_rows, seed=seed)
+    print(f"{written:,} synthetic rows (seed {seed}) -> {output} in {time.perf_counter() - start:.1f}s, "
+          f"{os.path.getsize(output) / 1e6:,.0f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='bench', required=True)
+    p = sub.add_parser('ingest', help="load_data pipeline: legacy row-wise vs batched")
+    p.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    sub.add_parser('classify', help="category rules: parity with the legacy chain and cost per label")
+    p = sub.add_parser('lookup', help="Rate Lookup rerun: frame copies + isin vs RateIndex")
+    p.add_argument('--rows', type=int, default=500_000)
+    p = sub.add_parser('cache', help="startup: cold pipeline vs columnar cache (read and memory-mapped)")
+    p.add_argument('--rows', type=int, default=1_000_000)
+    p = sub.add_parser('memory', help="processed table memory: plain strings vs compact dtypes")
+    p.add_argument('--rows', type=int, default=1_000_000)
+    p = sub.add_parser('delta', help="applying a rate-sheet delta vs rebuilding the table and its indexes")
+    p.add_argument('--rows', type=int, default=1_000_000)
+    p.add_argument('--delta-rows', type=int, default=1000)
+    p = sub.add_parser('shared', help="per-worker startup and memory: own cached table vs one published file")
+    p.add_argument('--rows', type=int, default=1_000_000)
+    p.add_argument('--workers', type=int, default=4)
+    p = sub.add_parser('sql', help="Query tab engine: SQLite build time and typical aggregations")
+    p.add_argument('--rows', type=int, default=1_000_000)
+    p = sub.add_parser('export', help="Tab 1 export: one to_csv string vs chunked CSV / gzip / Parquet")
+    p.add_argument('--rows', type=int, default=1_000_000)
+    p = sub.add_parser('waterfall', help="fee chains: per-rate waterfall vs vectorized chains and layers_deep")
+    p.add_argument('--rows', type=int, default=1_000_000)
+    p = sub.add_parser('sources', help="many per-servicer sheets: serial vs process pool vs per-file cache")
+    p.add_argument('--rows', type=int, default=1_000_000)
+    p.add_argument('--files', type=int, default=50)
+    p.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    p = sub.add_parser('search', help="work-type search: index build and per-query latency, uncached")
+    p.add_argument('--labels', type=int, default=5000)
+    p = sub.add_parser('history', help="rate history: as-of lookups and whole-table snapshots vs filtering")
+    p.add_argument('--rows', type=int, default=1_000_000)
+    p = sub.add_parser('generate', help="write a synthetic rate sheet CSV, streamed in chunks")
+    p.add_argument('output')
+    p.add_argument('--rows', type=int, default=1_000_000)
+    p.add_argument('--seed', type=int, default=0)
+    p = sub.add_parser('suite', help="time and peak memory of load_data and every tab's data path, for CI")
+    p.add_argument('--sizes', type=int, nargs='+', default=SUITE_SIZES)
+    p.add_argument('--out', help="write the results here as JSON")
+    p.add_argument('--baseline', help="an earlier --out file; exit 1 on regressions against it")
+    p.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown / growth (default: %(default)s)")
+    p = sub.add_parser('render', help="card and bar views: one st.markdown per row vs one per view")
+    p.add_argument('--cards', type=int, default=25)
+    args = parser.parse_args()
+
+    if args.bench == 'ingest':
+        bench_ingest(args.sizes)
+    elif args.bench == 'classify':
+        bench_classify()
+    elif args.bench == 'lookup':
+        bench_lookup(args.rows)
+    elif args.bench == 'cache':
+        bench_cache(args.rows)
+    elif args.bench == 'memory':
+        bench_memory(args.rows)
+    elif args.bench == 'delta':
+        bench_delta(args.rows, args.delta_rows)
+    elif args.bench == 'shared':
+        bench_shared(args.rows, args.workers)
+    elif args.bench == 'sql':
+        bench_sql(args.rows)
+    elif args.bench == 'export':
+        bench_export(args.rows)
+    elif args.bench == 'waterfall':
+        bench_waterfall(args.rows)
+    elif args.bench == 'sources':
+        bench_sources(args.rows, args.files, args.workers)
+    elif args.bench == 'search':
+        bench_search(args.labels)
+    elif args.bench == 'history':
+        bench_history(args.rows)
+    elif args.bench == 'generate':
+        bench_generate(args.output, args.rows, args.seed)
+    elif args.bench == 'suite':
+        bench_suite(args.sizes, args.out, args.baseline, args.tolerance)
+    elif args.bench == 'render':
+        bench_render(args.cards)
+
+
+if __name__ == '__main__':
+    main()
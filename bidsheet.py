@@ -0,0 +1,194 @@
+"""Bulk pricing of work-order exports against the rate table.
+
+A work-order file has one line per job: work type, state, lot size and
+investor. Each line is normalized with the same rules load_data applies to the
+rate sheet (national aliases, lot-size buckets, display_work), then priced with
+a hash join against a one-row-per-key view of the rate table. Files are read
+and priced in chunks, so memory stays bounded however long the export is.
+"""
+import csv
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+import rates
+from ingest import NATIONAL_ALIASES, build_display_work
+from lots import bucket_lot_sizes
+
+DEFAULT_CHUNKSIZE = 50_000
+
+# Accepted spellings of each work-order column (matched after lower-casing and
+# turning spaces/dashes into underscores)
+WORK_ORDER_COLUMNS = {
+    'work_type': ['work_type', 'work', 'service', 'display_work'],
+    'state': ['state'],
+    'lot_size': ['lot_size', 'lot', 'lot_sf', 'lot_sqft'],
+    'national': ['national', 'investor', 'company'],
+}
+RATE_COLUMNS = ['price', 'unit', 'tier', 'last_updated', 'source', 'region_override', 'notes']
+
+
+def pricing_table(df):
+    """One rate per (national, display_work, state): verified first, then newest, then highest.
+
+    ``rate_options`` counts the rates that competed for the key, so callers can
+    flag lines where a zone or unit choice may matter.
+    """
+    keys = rates.LOOKUP_KEYS
+    table = df[keys + RATE_COLUMNS].copy()
+    for col in keys:
+        table[col] = table[col].astype(str)
+    table['rate_options'] = table.groupby(keys)['price'].transform('size')
+    table = table.sort_values(['tier', 'last_updated', 'price'], ascending=[True, False, False], kind='stable')
+    return table.drop_duplicates(keys).reset_index(drop=True)
+
+
+def normalize_work_orders(orders):
+    """Rename work-order columns to the rate-table names and build their display_work."""
+    normalized = {c: str(c).strip().lower().replace(' ', '_').replace('-', '_') for c in orders.columns}
+    orders = orders.rename(columns=normalized)
+    for target, aliases in WORK_ORDER_COLUMNS.items():
+        found = next((a for a in aliases if a in orders.columns), None)
+        if found is None and target in ('work_type', 'state'):
+            raise ValueError(f"Work-order file needs a {target.replace('_', ' ')} column")
+        orders[target] = orders[found] if found else np.nan
+
+    out = pd.DataFrame(index=orders.index)
+    out['work_type'] = orders['work_type'].fillna("").astype(str).str.strip()
+    out['state'] = orders['state'].fillna("").astype(str).str.strip()
+    out['national'] = orders['national'].fillna("").astype(str).str.strip().replace(NATIONAL_ALIASES)
+    out['lot_size_input'] = orders['lot_size'].fillna("").astype(str).str.strip()
+    # A blank lot size leaves the work type as-is, so labels copied from the app still match
+    out['lot_size'] = bucket_lot_sizes(out['lot_size_input'])
+    out['display_work'] = build_display_work(out['work_type'], out['lot_size'])
+    return out
+
+
+def _match_lines(lines, table):
+    # The state / nationwide / no-national cascade for normalized lines, one row per line
+    keyed = lines.merge(table, on=rates.LOOKUP_KEYS, how='left')
+    keyed['match'] = np.where(keyed['price'].notna(), 'state', 'none')
+
+    def fill_from(mask, candidates, keys, label):
+        filled = keyed.loc[mask, ['line'] + keys].merge(candidates, on=keys, how='inner')
+        filled = filled.drop_duplicates('line').set_index('line')
+        hit = keyed['line'].isin(filled.index) & mask
+        at = keyed.loc[hit, 'line']
+        for col in RATE_COLUMNS + ['rate_options']:
+            keyed.loc[hit, col] = filled.loc[at, col].to_numpy()
+        keyed.loc[hit, 'match'] = label
+
+    # Nationwide rates stand in when the investor has nothing state-specific
+    nationwide = table[table['state'] == rates.ALL_STATES].drop(columns='state')
+    fill_from((keyed['match'] == 'none') & (keyed['national'] != ""), nationwide, ['national', 'display_work'], 'nationwide')
+    # No investor given: best rate any national pays for the work in that state,
+    # else its best nationwide rate (most work is only priced "All States")
+    ranked = table.sort_values(['tier', 'price'], ascending=[True, False], kind='stable').drop(columns='national')
+    best = ranked.drop_duplicates(['display_work', 'state'])
+    fill_from((keyed['match'] == 'none') & (keyed['national'] == ""), best, ['display_work', 'state'], 'no national')
+    best_nationwide = ranked[ranked['state'] == rates.ALL_STATES].drop(columns='state').drop_duplicates('display_work')
+    fill_from((keyed['match'] == 'none') & (keyed['national'] == ""), best_nationwide, ['display_work'], 'no national')
+    return keyed
+
+
+def price_work_orders(orders, table):
+    """Price one chunk of work orders against ``pricing_table`` output.
+
+    Adds the investor allowable, the Pricing Waterfall's estimated BOTG pay and a
+    ``match`` flag: 'state', 'nationwide' ("All States" rate), 'no national'
+    (no investor given; the work's best rate in the state was used, or its
+    best nationwide rate when no national prices it in the state) or 'none'.
+    Lines are matched on their lot-bucketed work label first; those that find
+    nothing are retried on the bare work type, since a lot size given for work
+    that isn't priced by lot (e.g. pumping a basement) has no bucketed rate.
+    ``display_work`` is the label the line was priced under.
+    """
+    lines = normalize_work_orders(orders)
+    lines['line'] = orders.index.to_numpy()
+    keyed = _match_lines(lines, table)
+
+    retry = ((keyed['match'] == 'none') & (keyed['display_work'] != keyed['work_type'])).to_numpy()
+    if retry.any():
+        bare = _match_lines(lines[retry].assign(display_work=lines.loc[retry, 'work_type']), table)
+        bare.index = keyed.index[retry]
+        keyed = pd.concat([keyed[~retry], bare]).sort_index()
+
+    keyed['tier'] = keyed['tier'].astype('Int8')
+    keyed['rate_options'] = keyed['rate_options'].astype('Int64')
+    keyed['investor_allowable'] = keyed['price']
+    keyed['botg_estimate'] = rates.waterfall(keyed['price'])['botg_gets'].round(2)
+    keyed['matched'] = keyed['match'] != 'none'
+    return keyed.drop(columns='price')
+
+
+def _read_chunks(source, chunksize):
+    # source is a path or an uploaded file object with a .name
+    ext = os.path.splitext(str(getattr(source, 'name', source)))[1].lower()
+    if ext in ('.xlsx', '.xlsm'):
+        yield from _read_excel_chunks(source, chunksize)
+    else:
+        yield from pd.read_csv(source, dtype=str, chunksize=chunksize, keep_default_na=False)
+
+
+def _read_excel_chunks(source, chunksize):
+    # openpyxl's read-only mode streams rows instead of loading the whole sheet
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(h) if h is not None else "" for h in next(rows, [])]
+        batch, start = [], 0
+        for row in rows:
+            batch.append(row)
+            if len(batch) == chunksize:
+                yield pd.DataFrame(batch, columns=header, index=pd.RangeIndex(start, start + len(batch)), dtype=object)
+                start += len(batch)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=header, index=pd.RangeIndex(start, start + len(batch)), dtype=object)
+    finally:
+        workbook.close()
+
+
+def iter_priced_chunks(source, df, chunksize=DEFAULT_CHUNKSIZE):
+    """Yield priced DataFrames for successive chunks of a CSV or Excel work-order file."""
+    table = pricing_table(df)
+    for chunk in _read_chunks(source, chunksize):
+        yield price_work_orders(chunk, table)
+
+
+PRICED_COLUMNS = [
+    'line', 'national', 'work_type', 'lot_size_input', 'state', 'display_work', 'matched', 'match',
+    'investor_allowable', 'botg_estimate', 'unit', 'tier', 'last_updated', 'rate_options',
+    'region_override', 'notes', 'source',
+]
+
+
+def price_file(source, df, output, chunksize=DEFAULT_CHUNKSIZE):
+    """Price a work-order file into a CSV, one chunk at a time. Returns line counts.
+
+    ``output`` is a path, or a text file opened with ``newline=''``.
+    """
+    if isinstance(output, (str, os.PathLike)):
+        with open(output, 'w', newline='', encoding='utf-8') as out:
+            return price_file(source, df, out, chunksize)
+    lines = matched = 0
+    for i, priced in enumerate(iter_priced_chunks(source, df, chunksize)):
+        priced[PRICED_COLUMNS].to_csv(output, index=False, header=i == 0, quoting=csv.QUOTE_MINIMAL,
+                                      date_format='%Y-%m-%d')
+        lines += len(priced)
+        matched += int(priced['matched'].sum())
+    return {'lines': lines, 'matched': matched, 'unmatched': lines - matched}
+
+
+def price_to_bytes(source, df, chunksize=DEFAULT_CHUNKSIZE):
+    """``price_file`` into memory: (the priced CSV as bytes, line counts)."""
+    buffer = io.BytesIO()
+    text = io.TextIOWrapper(buffer, encoding='utf-8', newline='')
+    counts = price_file(source, df, text, chunksize)
+    text.flush()
+    text.detach()
+    return buffer.getvalue(), counts
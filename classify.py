@@ -0,0 +1,100 @@
+"""Work-type category rules and the compiled matcher that applies them.
+
+Rules are checked in priority order and the first category with a keyword
+found anywhere in the (lower-cased) work label wins. All keywords are compiled
+into one trie-shaped regex, so adding rules doesn't add passes over a label.
+
+The speedup over the old if/elif chain is the memo: results are cached per
+distinct label, and a rate table repeats a few hundred labels across every row.
+Uncached, the regex is no faster than the chain: slower on the sheet's own
+labels (about 4 us against 2.5 us each), on par for short ones. Classify
+through ``classify`` / ``classify_many``, not ``_classify``; see ``bench.py classify``.
+"""
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Category -> keywords, highest priority first
+CATEGORY_RULES = [
+    ("🌿 Grass & Lawn", ['grass', 'lawn', 'recut', 'landscape', 'shrub', 'tree trim']),
+    ("❄️ Winterization", ['winteriz', 'dewint', 'thaw', 're-wint', 'pressure test']),
+    ("🔒 Securing & Boarding", ['lock', 'padlock', 'board', 'secur', 'slider', 'slide bolt', 'window lock', 're-key', 'rekey', 'glaz']),
+    ("🗑️ Debris & Removal", ['debris', 'trash', 'carpet', 'removal', 'vehicle', 'tire', 'appliance', 'refriger', 'hazard', 'personal property']),
+    ("🏠 Roof & Gutters", ['roof', 'gutter', 'chimney', 'tarp']),
+    ("🔍 Inspections", ['inspect', 'occupancy', 'verification', 'photo']),
+    ("🌨️ Snow Removal", ['snow']),
+    ("🧹 Cleaning", ['clean', 'broom', 'maid', 'janitorial', 'sales clean']),
+    ("🔧 Utilities & Mechanicals", ['sump', 'dehumid', 'basement', 'mold', 'cap', 'wire', 'outlet', 'electric', 'well', 'septic']),
+    ("🏊 Pools & Spas", ['pool', 'spa', 'hot tub']),
+    ("⚠️ Health & Safety", ['smoke', 'co2', 'co detector', 'handrail', 'step', 'guard', 'extermin', 'pest']),
+    ("🔨 Repairs & Maintenance", ['door', 'garage', 'fence', 'graffiti', 'overhead', 'pressure wash', 'address']),
+    ("🚗 Service Calls & Admin", ['trip', 'access', 'eviction', 'emergency', 'allowance', 'initial service']),
+]
+DEFAULT_CATEGORY = "📦 Other Services"
+
+
+def _trie_pattern(words):
+    # Factor shared prefixes ("pressure test|pressure wash" -> "pressure (?:test|wash)")
+    # so the regex engine walks each label once instead of trying every keyword
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+
+    def build(node):
+        alts = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not alts:
+            return ''
+        body = alts[0] if len(alts) == 1 else '(?:' + '|'.join(alts) + ')'
+        # Optional tail is greedy, so the longest keyword at a position wins
+        return '(?:' + body + ')?' if '' in node else body
+
+    return build(trie)
+
+
+class KeywordClassifier:
+    def __init__(self, rules=CATEGORY_RULES, default=DEFAULT_CATEGORY):
+        self.rules = [(category, list(keywords)) for category, keywords in rules]
+        self.default = default
+
+        # Each keyword maps to the priority of the first rule that lists it
+        self._priority = {}
+        for rank, (_, keywords) in enumerate(self.rules):
+            for kw in keywords:
+                self._priority.setdefault(kw.lower(), rank)
+
+        # If a keyword matches at some position, so does every keyword that is a
+        # prefix of it; fold those in so the longest match carries the best rank
+        for kw in self._priority:
+            self._priority[kw] = min(rank for prefix, rank in self._priority.items() if kw.startswith(prefix))
+
+        # One trie-shaped regex inside a zero-width lookahead: it reports the
+        # longest keyword starting at every position, so overlapping keywords
+        # can't hide a higher-priority one
+        self._pattern = re.compile('(?=(' + _trie_pattern(self._priority) + '))')
+        self.classify = lru_cache(maxsize=None)(self._classify)
+
+    def _classify(self, label):
+        hits = self._pattern.findall(str(label).lower())
+        return self.rules[min(map(self._priority.__getitem__, hits))][0] if hits else self.default
+
+    def classify_many(self, labels):
+        """Category for each label in a Series, classifying each distinct label once."""
+        codes, uniques = pd.factorize(labels, use_na_sentinel=False)
+        mapped = np.array([self.classify(u) for u in uniques], dtype=object)
+        return pd.Series(mapped[codes], index=labels.index)
+
+
+_default_classifier = KeywordClassifier()
+
+
+def categorize(label):
+    return _default_classifier.classify(label)
+
+
+def categorize_works(labels):
+    return _default_classifier.classify_many(labels)
@@ -0,0 +1,185 @@
+"""Command-line access to the rate table for batch jobs.
+
+    python cli.py lookup requests.csv [-o results.csv] [--data Property_Pricing_Master.csv]
+    python cli.py price work_orders.xlsx -o priced.csv [--chunksize 50000]
+    python cli.py publish rates.arrow [--updates rate_updates] [--watch 30]
+    python cli.py profile [profile.jsonl] [--last-minutes 60]
+    python cli.py lot "Grass Cut - Initial" Alaska 12000 [--national ServiceLink]
+    python cli.py asof "Grass Cut - Initial (Standard Lot (<10,000 sf))" Ohio [--national "HUD / FHA"] [--date 2019-12-31]
+
+The requests file needs ``work`` and ``state`` columns (``work`` is the Work
+Type label shown in the app, lot bucket included) and may have ``national``.
+All requests are answered with one join; throughput goes to stderr.
+
+``--data`` also takes a directory or glob of per-servicer sheets, which are
+parsed in parallel and merged; see sources.py.
+
+``price`` takes a work-order export (CSV or XLSX with work type, state, lot
+size and investor columns) and writes it back priced; see bidsheet.py.
+
+``publish`` is the loader for multi-worker deployments: it writes the table
+(deltas applied) to one Arrow file that app workers started with
+RATE_TABLE_FILE=rates.arrow memory-map instead of loading the sheet
+themselves. With ``--watch`` it keeps polling the sheet and the updates
+directory and republishes whenever either changes; see shared_table.py.
+
+``profile`` summarizes the per-rerun stage log the app writes when started
+with RATE_PROFILE=1: p50 / p95 / max milliseconds per stage, across every
+session and worker that wrote to it; see profiling.py.
+
+``lot`` gives the rate each national publishes for a work type (as in the
+sheet, without the lot bucket) on a lot of exactly that many square feet,
+from the sheet's own ranges rather than the app's three buckets; see lots.py.
+
+``asof`` answers "what was the rate on this date": the latest rate each
+national had on record for the work in that state (nationwide rates
+included) on or before ``--date`` (default: today); see rate_history.py.
+"""
+import argparse
+import sys
+import time
+
+import pandas as pd
+
+import bidsheet
+import rates
+from ingest import DEFAULT_PATH, NATIONAL_ALIASES
+from table_cache import load_cached_rate_table
+
+OUTPUT_COLUMNS = ['request_row', 'matched', 'national', 'display_work', 'state', 'price', 'unit', 'tier',
+                  'last_updated', 'region_override', 'notes']
+
+
+def cmd_lookup(args):
+    df = load_cached_rate_table(args.data)
+    requests = pd.read_csv(args.requests, dtype=str)
+    missing = {'work', 'state'} - set(requests.columns)
+    if missing:
+        sys.exit(f"{args.requests}: missing column(s) {', '.join(sorted(missing))}")
+
+    start = time.perf_counter()
+    result = rates.lookup_batch(df, requests)
+    elapsed = time.perf_counter() - start
+
+    result[OUTPUT_COLUMNS].to_csv(args.output or sys.stdout, index=False)
+    unmatched = result.loc[~result['matched'], 'request_row'].nunique()
+    print(f"{len(requests):,} requests -> {len(result):,} rows ({unmatched:,} unmatched) "
+          f"in {elapsed:.3f}s, {len(requests) / max(elapsed, 1e-9):,.0f} requests/s", file=sys.stderr)
+
+
+def cmd_price(args):
+    df = load_cached_rate_table(args.data)
+    start = time.perf_counter()
+    counts = bidsheet.price_file(args.work_orders, df, args.output, chunksize=args.chunksize)
+    elapsed = time.perf_counter() - start
+    print(f"{counts['lines']:,} lines priced ({counts['unmatched']:,} with no rate) in {elapsed:.2f}s, "
+          f"{counts['lines'] / max(elapsed, 1e-9):,.0f} lines/s -> {args.output}", file=sys.stderr)
+
+
+def cmd_publish(args):
+    from rate_store import RateStore
+    from shared_table import publish_rate_table
+    from table_cache import source_fingerprint
+
+    store, loads, published = None, 0, None
+    while True:
+        if store is None or source_fingerprint(args.data) != store.fingerprint:
+            # A new master sheet means a full reload; deltas are re-applied on top
+            store, loads = RateStore(args.data), loads + 1
+        for name in store.sync(args.updates):
+            if 'error' in store.applied[name]:
+                print(f"skipped {name}: {store.applied[name]['error']}", file=sys.stderr)
+        if (loads, store.version) != published:
+            start = time.perf_counter()
+            version = publish_rate_table(store.table, args.output, index=store.index, cube=store.cube)
+            published = (loads, store.version)
+            print(f"published version {version}: {len(store.table):,} rows in {time.perf_counter() - start:.2f}s "
+                  f"-> {args.output}", file=sys.stderr)
+        if not args.watch:
+            return
+        time.sleep(args.watch)
+
+
+def cmd_profile(args):
+    import profiling
+
+    since = time.time() - args.last_minutes * 60 if args.last_minutes else None
+    summary = profiling.percentiles(profiling.read_log(args.log, since=since))
+    if summary.empty:
+        sys.exit(f"{args.log}: no reruns logged")
+    print(summary.to_string(index=False, float_format=lambda x: f"{x:,.2f}"))
+
+
+def cmd_lot(args):
+    from ingest import lot_rate_rows
+    from lots import LotSizeIndex
+    from sources import read_rate_sheets
+
+    index = LotSizeIndex(lot_rate_rows(read_rate_sheets(args.data)))
+    national = NATIONAL_ALIASES.get(args.national, args.national)
+    hits = index.lookup(args.work_type, args.state, args.sqft, national=national)
+    if hits.empty:
+        sys.exit(f"No lot-based rate for {args.work_type!r} in {args.state} covers {args.sqft:,.0f} sf")
+    hits = hits.assign(last_updated=hits['last_updated'].astype(str))
+    print(hits[['national', 'work_type', 'state', 'lot_size', 'price', 'unit', 'tier', 'last_updated',
+                'region_override']].to_string(index=False))
+
+
+def cmd_asof(args):
+    from rate_history import RateHistory
+
+    history = RateHistory(load_cached_rate_table(args.data))
+    try:
+        snapshot = history.latest_as_of(args.date)
+    except ValueError as e:
+        sys.exit(str(e))
+    hits = snapshot[(snapshot['display_work'] == args.work) & snapshot['state'].isin([args.state, rates.ALL_STATES])]
+    if args.national:
+        hits = hits[hits['national'] == args.national]
+    if hits.empty:
+        sys.exit(f"No rate on record for {args.work!r} in {args.state} as of {args.date}")
+    hits = hits.sort_values('price', ascending=False).assign(last_updated=hits['last_updated'].dt.strftime('%Y-%m-%d'))
+    print(hits.to_string(index=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', default=DEFAULT_PATH,
+                        help="rate sheet CSV, or a directory or glob of CSV / XLSX sheets (default: %(default)s)")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('lookup', help="answer a CSV of (national, work, state) lookups")
+    p.add_argument('requests')
+    p.add_argument('-o', '--output', help="write results here instead of stdout")
+    p.set_defaults(func=cmd_lookup)
+    p = sub.add_parser('price', help="price a work-order export in chunks")
+    p.add_argument('work_orders')
+    p.add_argument('-o', '--output', required=True)
+    p.add_argument('--chunksize', type=int, default=bidsheet.DEFAULT_CHUNKSIZE)
+    p.set_defaults(func=cmd_price)
+    p = sub.add_parser('publish', help="write the table to a shared Arrow file for app workers")
+    p.add_argument('output')
+    p.add_argument('--updates', default='rate_updates', help="delta CSV directory (default: %(default)s)")
+    p.add_argument('--watch', type=float, metavar='SECONDS', help="keep republishing when the sheet or deltas change")
+    p.set_defaults(func=cmd_publish)
+    p = sub.add_parser('profile', help="p50 / p95 per app stage from a RATE_PROFILE log")
+    p.add_argument('log', nargs='?', default='profile.jsonl')
+    p.add_argument('--last-minutes', type=float, help="only reruns logged in the last N minutes")
+    p.set_defaults(func=cmd_profile)
+    p = sub.add_parser('lot', help="each national's rate for a work type on a lot of an exact size")
+    p.add_argument('work_type')
+    p.add_argument('state')
+    p.add_argument('sqft', type=float)
+    p.add_argument('--national')
+    p.set_defaults(func=cmd_lot)
+    p = sub.add_parser('asof', help="each national's rate for a work and state as of a date")
+    p.add_argument('work')
+    p.add_argument('state')
+    p.add_argument('--national')
+    p.add_argument('--date', default=pd.Timestamp.today().strftime('%Y-%m-%d'), help="YYYY-MM-DD (default: today)")
+    p.set_defaults(func=cmd_asof)
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
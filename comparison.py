@@ -0,0 +1,157 @@
+"""Precomputed National Comparison cube.
+
+For every (display_work, state) pair the comparison rows (that state's rates
+plus the work's nationwide "All States" rates) are laid out contiguously in
+rates.compare order, alongside min / max / spread / count statistics. Tab 2
+lookups are then a dict hit and a slice, and the whole table of spreads is
+available at once for the "biggest spreads" leaderboard. Each compared rate's
+price over time comes from ``history`` (see rate_history), built on first use.
+"""
+import functools
+
+import numpy as np
+import pandas as pd
+
+from rates import ALL_STATES
+
+STAT_COLUMNS = ['display_work', 'state', 'companies', 'nationals', 'units', 'low', 'high', 'spread', 'spread_pct']
+
+
+def _sorted_codes(column):
+    # Integer codes whose order is the values' sort order, so sorting and grouping never touch strings
+    values = pd.Categorical(column)
+    if not values.categories.is_monotonic_increasing:
+        values = values.reorder_categories(values.categories.sort_values())
+    return values.codes.astype(np.int64), np.asarray(values.categories, dtype=object)
+
+
+def _build(df, rows):
+    """Cube positions, stats and offered states for the comparisons among ``rows`` of ``df``.
+
+    ``rows`` must hold every row of each (display_work, state) pair it
+    touches, plus the work's nationwide rows.
+    """
+    sub = df.iloc[rows]
+    work, works = _sorted_codes(sub['display_work'])
+    state, states = _sorted_codes(sub['state'])
+    national, _ = _sorted_codes(sub['national'])
+    unit, _ = _sorted_codes(sub['unit'])
+    own = pd.DataFrame({'work': work, 'state': state, 'national': national,
+                        'unit': np.where(unit >= 0, unit, np.nan), 'pos': rows})
+
+    # Nationwide rates join every state-specific comparison of the same work
+    all_states = states.tolist().index(ALL_STATES) if ALL_STATES in states else -2
+    nationwide = own[own['state'] == all_states]
+    pairs = own.loc[own['state'] != all_states, ['work', 'state']].drop_duplicates()
+    extra = pairs.merge(nationwide[['work', 'national', 'unit', 'pos']], on='work')
+
+    cube = pd.concat([own, extra], ignore_index=True)
+    pos = cube['pos'].to_numpy()
+    price = df['price'].to_numpy()[pos]
+    tier_key = np.where((df['tier'] == 1).to_numpy(dtype=bool, na_value=False)[pos], 0, 1)
+    # Ties keep table order, as they do in rates.compare
+    group_key = (cube['work'].to_numpy() * (len(states) + 1) + cube['state'].to_numpy()) * 2 + tier_key
+    order = np.lexsort((pos, -price, group_key))
+    cube = cube.iloc[order].assign(price=price[order]).reset_index(drop=True)
+
+    grouped = cube.groupby(['work', 'state'], sort=False)
+    stats = grouped.agg(companies=('pos', 'size'), nationals=('national', 'nunique'), units=('unit', 'nunique'),
+                        low=('price', 'min'), high=('price', 'max')).reset_index()
+    stats.insert(0, 'display_work', works[stats.pop('work')])
+    stats.insert(1, 'state', states[stats.pop('state')])
+    stats['spread'] = stats['high'] - stats['low']
+    stats['spread_pct'] = np.where(stats['high'] > 0, stats['spread'] / stats['high'] * 100, 0.0)
+
+    # States offered for each work: those where 2+ nationals report it directly
+    counts = own.groupby(['work', 'state'])['national'].nunique()
+    multi = counts[counts >= 2].reset_index()
+    offered = {works[w]: sorted(states[g['state']]) for w, g in multi.groupby('work', sort=False)}
+    return cube['pos'].to_numpy(), stats, offered
+
+
+class ComparisonCube:
+    def __init__(self, df, parts=None):
+        self.df = df
+        positions, stats, states = parts if parts is not None else _build(df, np.arange(len(df)))
+        self._positions = positions
+        # Groups are laid out in stats order, so each one's rows start where the previous ended
+        stats = stats.reset_index(drop=True)
+        stats['start'] = np.cumsum(stats['companies'].to_numpy()) - stats['companies'].to_numpy()
+        self.stats = stats
+        self._slices = dict(zip(zip(stats['display_work'], stats['state']),
+                                zip(stats['start'], stats['start'] + stats['companies'], stats.index)))
+        self._states = states
+
+    def updated(self, df, kept, changed):
+        """The cube for ``df``: this cube's table with rows ``kept`` (a mask), then new rows appended.
+
+        ``changed`` holds the display_work / state of every row removed or
+        added. Only the comparisons those rows appear in are rebuilt: a
+        state's pair, or every pair of the work for a nationwide rate. The
+        rest are carried over with their rows renumbered.
+        """
+        changed = changed[['display_work', 'state']].astype(str).drop_duplicates()
+        whole = set(changed.loc[changed['state'] == ALL_STATES, 'display_work'])
+        pairs = changed[~changed['display_work'].isin(whole)]
+        # A state's comparison includes its work's nationwide rows, so rebuild that pair too
+        pairs = pd.concat([pairs, pd.DataFrame({'display_work': pairs['display_work'].unique(), 'state': ALL_STATES})])
+        pair_set = set(zip(pairs['display_work'], pairs['state']))
+
+        old = self.stats
+        keep_stats = ~(old['display_work'].isin(whole).to_numpy()
+                       | np.array([p in pair_set for p in zip(old['display_work'], old['state'])], dtype=bool))
+        keep_rows = np.repeat(keep_stats, old['companies'].to_numpy())
+
+        work = pd.Categorical(df['display_work'])
+        state = pd.Categorical(df['state'])
+        n_states = len(state.categories) + 1
+        pair_codes = work.codes.astype(np.int64) * n_states + state.codes
+        wanted = (work.categories.get_indexer(pairs['display_work']).astype(np.int64) * n_states
+                  + state.categories.get_indexer(pairs['state']))
+        affected = np.isin(pair_codes, wanted) | np.isin(work.codes, work.categories.get_indexer(list(whole)))
+        positions, stats, states = _build(df, np.flatnonzero(affected))
+
+        # Offered states: drop the rebuilt pairs' states, then add back what the rebuild found
+        rebuilt = {w: set(g) for w, g in pairs.groupby('display_work')['state']}
+        merged = {}
+        for w in set(self._states) | set(states):
+            if w in whole:
+                offered = set(states.get(w, []))
+            else:
+                offered = (set(self._states.get(w, [])) - rebuilt.get(w, set())) | set(states.get(w, []))
+            if offered:
+                merged[w] = sorted(offered)
+
+        new_pos = np.cumsum(kept) - 1
+        return ComparisonCube(df, parts=(
+            np.concatenate([new_pos[self._positions[keep_rows]], positions]),
+            pd.concat([old.loc[keep_stats].drop(columns='start'), stats], ignore_index=True),
+            merged,
+        ))
+
+    @functools.cached_property
+    def history(self):
+        from rate_history import RateHistory
+        return RateHistory(self.df)
+
+    def states(self, work):
+        """States worth comparing for ``work`` (2+ nationals report it there), sorted."""
+        return self._states.get(work, [])
+
+    def rows(self, work, state):
+        """The rates.compare result for (work, state), as a slice of the rate table."""
+        start, stop, _ = self._slices.get((work, state), (0, 0, None))
+        return self.df.iloc[self._positions[start:stop]]
+
+    def summary(self, work, state):
+        """Min / max / spread / count stats for (work, state), or None."""
+        hit = self._slices.get((work, state))
+        return None if hit is None else self.stats.loc[hit[2], STAT_COLUMNS]
+
+    def leaderboard(self, n=25, min_nationals=2, category=None):
+        """The (work, state) pairs where nationals' rates differ the most."""
+        board = self.stats[self.stats['nationals'] >= min_nationals]
+        if category:
+            works = set(self.df.loc[self.df['category'] == category, 'display_work'].astype(str))
+            board = board[board['display_work'].isin(works)]
+        return board.nlargest(n, ['spread_pct', 'spread'])[STAT_COLUMNS].reset_index(drop=True)
@@ -0,0 +1,91 @@
+"""Chunked export of Rate Lookup results as CSV, gzipped CSV or Parquet.
+
+Nothing is built until a download is requested. The export is then written
+``DEFAULT_CHUNKSIZE`` rows at a time: each chunk is sliced, renamed and
+serialized on its own. Memory stays bounded by the chunk size, not the size
+of the result. ``iter_export_chunks`` yields the encoded bytes as they are
+produced, for callers that can stream. ``export_file`` collects the same
+bytes in a BytesIO for st.download_button's deferred data, which takes bytes
+or a binary buffer (not a temp file) and reads the whole export into memory
+anyway; only the encoded output is held, never the intermediate frames.
+"""
+import gzip
+import io
+
+EXPORT_COLUMNS = {
+    'national': 'Company', 'display_work': 'Work Type', 'state': 'State', 'price': 'Rate', 'unit': 'Unit',
+    'tier': 'Tier', 'last_updated': 'Date', 'notes': 'Notes', 'region_override': 'Zone',
+}
+# format -> (file extension, MIME type)
+EXPORT_FORMATS = {
+    'CSV': ('csv', 'text/csv'),
+    'CSV (gzip)': ('csv.gz', 'application/gzip'),
+    'Parquet': ('parquet', 'application/vnd.apache.parquet'),
+}
+DEFAULT_CHUNKSIZE = 50_000
+
+
+def _chunks(df, chunksize, columns):
+    for start in range(0, max(len(df), 1), chunksize):
+        chunk = df.iloc[start:start + chunksize]
+        yield chunk if columns is None else chunk[list(columns)].rename(columns=columns)
+
+
+def _iter_csv(df, chunksize, columns):
+    for i, chunk in enumerate(_chunks(df, chunksize, columns)):
+        yield chunk.to_csv(index=False, header=i == 0, date_format='%Y-%m-%d').encode('utf-8')
+
+
+def _iter_gzip(df, chunksize, columns):
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode='wb', compresslevel=6) as gz:
+        for data in _iter_csv(df, chunksize, columns):
+            gz.write(data)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _iter_parquet(df, chunksize, columns):
+    # One row group per chunk; the footer is written when the writer closes
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    buffer = io.BytesIO()
+    writer = None
+    for chunk in _chunks(df, chunksize, columns):
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(buffer, table.schema)
+        writer.write_table(table)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    writer.close()
+    yield buffer.getvalue()
+
+
+def iter_export_chunks(df, fmt='CSV', chunksize=DEFAULT_CHUNKSIZE, columns=EXPORT_COLUMNS):
+    """Yield the export of ``df`` in ``fmt`` (a key of EXPORT_FORMATS) as successive byte strings.
+
+    ``columns`` maps the columns to export to their headers; None exports
+    every column under its own name (e.g. a Query tab result).
+    """
+    writers = {'CSV': _iter_csv, 'CSV (gzip)': _iter_gzip, 'Parquet': _iter_parquet}
+    if fmt not in writers:
+        raise ValueError(f"Unknown export format {fmt!r}; expected one of {', '.join(EXPORT_FORMATS)}")
+    return (data for data in writers[fmt](df, chunksize, columns) if data)
+
+
+def export_file(df, fmt='CSV', chunksize=DEFAULT_CHUNKSIZE, columns=EXPORT_COLUMNS):
+    """The export written chunk by chunk to a BytesIO, rewound for reading."""
+    out = io.BytesIO()
+    for data in iter_export_chunks(df, fmt, chunksize, columns):
+        out.write(data)
+    out.seek(0)
+    return out
+
+
+def export_filename(stem, fmt):
+    return f"{stem}.{EXPORT_FORMATS[fmt][0]}"
@@ -0,0 +1,174 @@
+"""Fee chains: how an investor allowable is split, layer by layer, on its way to the BOTG contractor.
+
+A chain is a list of layers, investor side first. Each layer keeps ``pct`` of
+what reaches it plus a ``flat`` amount, never more than is left. A layer can
+charge differently for some nationals or categories:
+
+    FeeChain([
+        {'name': "National", 'pct': 0.25, 'by_national': {"HUD / FHA": {'pct': 0.20}}},
+        {'name': "Regional", 'pct': 0.40},
+        {'name': "Sub", 'pct': 0.15, 'flat': 5.0, 'by_category': {"🌨️ Snow Removal": {'flat': 0.0}}},
+    ])
+
+A national override beats a category override, which beats the layer's own
+cut; an override only replaces the fields it names.
+
+Chains are evaluated over whole arrays of rates: one NumPy pass per layer,
+with overrides resolved per distinct national / category rather than per
+row, so "BOTG pay for every HUD tier-1 row" costs a few vector operations.
+``layers_deep`` runs the chain the other way: given what contractors are
+actually paid, it finds how many layers each payment most likely passed
+through.
+"""
+import numpy as np
+import pandas as pd
+
+from rates import NATIONAL_CUT_PCT, REGIONAL_CUT_PCT
+
+# The standard two-layer split rates.waterfall has always used
+STANDARD_LAYERS = [
+    {'name': "National", 'pct': NATIONAL_CUT_PCT},
+    {'name': "Regional", 'pct': REGIONAL_CUT_PCT},
+]
+LAYER_FIELDS = ('pct', 'flat')
+
+
+def _check_cut(where, cut):
+    unknown = set(cut) - set(LAYER_FIELDS)
+    if unknown:
+        raise ValueError(f"{where}: unknown field(s) {', '.join(sorted(unknown))}; expected pct and/or flat")
+    pct, flat = cut.get('pct', 0.0), cut.get('flat', 0.0)
+    if not 0 <= pct <= 1:
+        raise ValueError(f"{where}: pct must be between 0 and 1, got {pct}")
+    if flat < 0:
+        raise ValueError(f"{where}: flat must not be negative, got {flat}")
+
+
+def _factorize(keys):
+    # (codes, distinct keys), so overrides are looked up once per distinct key;
+    # categoricals hand back the codes they already have
+    return None if keys is None else pd.factorize(keys)
+
+
+def _by_key(keys, values, n_rows):
+    # values {key: number} for every row of factorized keys, NaN where a row's key has no entry
+    if keys is None or not values:
+        return np.full(n_rows, np.nan)
+    codes, uniques = keys
+    table = np.array([values.get(key, np.nan) for key in uniques] + [np.nan], dtype=float)
+    return table[codes]  # code -1 (missing key) picks the trailing NaN
+
+
+class FeeChain:
+    """An ordered list of fee layers between the investor and the BOTG contractor."""
+
+    def __init__(self, layers=STANDARD_LAYERS):
+        self.layers = []
+        for i, layer in enumerate(layers):
+            name = str(layer.get('name') or f"Layer {i + 1}")
+            cut = {f: float(layer.get(f) or 0.0) for f in LAYER_FIELDS}
+            _check_cut(name, cut)
+            overrides = {}
+            for scope in ('by_national', 'by_category'):
+                overrides[scope] = {}
+                for key, override in (layer.get(scope) or {}).items():
+                    override = {f: float(v) for f, v in override.items()}
+                    _check_cut(f"{name} ({key})", override)
+                    overrides[scope][key] = override
+            self.layers.append({'name': name, **cut, **overrides})
+        if not self.layers:
+            raise ValueError("A fee chain needs at least one layer")
+        names = ["Investor"] + self.names
+        if len(set(names)) < len(names):
+            raise ValueError("Layer names must be unique and not 'Investor'")
+
+    @property
+    def names(self):
+        return [layer['name'] for layer in self.layers]
+
+    def __len__(self):
+        return len(self.layers)
+
+    def _cuts(self, layer, field, nationals, categories, n_rows):
+        # The layer's pct or flat per row, or a scalar when nothing overrides it
+        by_national = {k: v[field] for k, v in layer['by_national'].items() if field in v}
+        by_category = {k: v[field] for k, v in layer['by_category'].items() if field in v}
+        if not (by_national and nationals is not None) and not (by_category and categories is not None):
+            return layer[field]
+        cut = _by_key(nationals, by_national, n_rows)
+        missing = np.isnan(cut)
+        cut[missing] = _by_key(categories, by_category, n_rows)[missing]
+        return np.where(np.isnan(cut), layer[field], cut)
+
+    def evaluate(self, rates, nationals=None, categories=None):
+        """Run every rate through the chain.
+
+        ``rates`` is a scalar or array of investor allowables; ``nationals`` and
+        ``categories`` (aligned with it) pick up the layers' overrides. Returns
+        a dict of arrays: ``takes`` (rows x layers) is what each layer keeps,
+        ``remaining`` (rows x layers + 1) is what is left before the first and
+        after each layer, and ``botg_gets`` is the last column of it.
+        """
+        investor = np.atleast_1d(np.asarray(rates, dtype=float))
+        n_rows = len(investor)
+        nationals, categories = _factorize(nationals), _factorize(categories)
+        takes = np.empty((n_rows, len(self.layers)))
+        remaining = np.empty((n_rows, len(self.layers) + 1))
+        remaining[:, 0] = left = investor
+        for i, layer in enumerate(self.layers):
+            pct = self._cuts(layer, 'pct', nationals, categories, n_rows)
+            flat = self._cuts(layer, 'flat', nationals, categories, n_rows)
+            take = np.minimum(left * pct + flat, np.maximum(left, 0))
+            takes[:, i] = take
+            remaining[:, i + 1] = left = left - take
+        return {'investor': investor, 'takes': takes, 'remaining': remaining, 'botg_gets': remaining[:, -1]}
+
+    def layers_deep(self, rates, paid, nationals=None, categories=None):
+        """How many layers each payment most likely passed through, for a batch of actual pay amounts.
+
+        ``paid[i]`` is matched to the step of rate ``i``'s chain (0 = paid the
+        full allowable, len(chain) = after every layer) whose amount is closest
+        to it in ratio terms, so a $5 miss on a $20 job counts as much as $50
+        on a $200 one. Returns a frame with ``layers_deep``, the ``layer``
+        last passed ("Investor" for 0), the ``expected`` pay at that depth and
+        ``beyond_chain``, true when the pay is nearer one more layer (cutting
+        like the last one) than the last step, i.e. the chain is too short.
+        A rate that isn't positive has no steps to match: its ``layers_deep``
+        is <NA>, ``layer`` and ``expected`` are missing and ``beyond_chain``
+        is false.
+        """
+        rates, paid = np.broadcast_arrays(np.asarray(rates, dtype=float), np.asarray(paid, dtype=float))
+        remaining = self.evaluate(rates, nationals, categories)['remaining']
+        paid = np.atleast_1d(paid)
+        placed = remaining[:, 0] > 0
+        # Steps only go down, so the closest one in ratio terms is found by counting the
+        # geometric midpoints between neighbouring steps that lie above the pay. Amounts
+        # under a cent count as a cent, so zero pay lands on the deepest step
+        steps = np.maximum(remaining, 0.01)
+        pay = np.maximum(paid, 0.01)
+        midpoints = np.sqrt(steps[:, :-1] * steps[:, 1:])
+        depth = (pay[:, None] < midpoints).sum(axis=1)
+        expected = np.take_along_axis(remaining, depth[:, None], axis=1)[:, 0]
+        # Likewise past the end: the midpoint to one more layer with the last layer's
+        # ratio. A last layer that took nothing (or left nothing) has no layer past it
+        cutoff = steps[:, -1] * np.sqrt(steps[:, -1] / steps[:, -2])
+        return pd.DataFrame({
+            'layers_deep': pd.arrays.IntegerArray(depth, ~placed),
+            'layer': pd.Categorical.from_codes(np.where(placed, depth, -1), categories=["Investor"] + self.names),
+            'expected': np.where(placed, expected, np.nan),
+            'beyond_chain': placed & (steps[:, -1] < steps[:, -2]) & (pay < cutoff),
+        })
+
+
+def botg_pay(df, chain=None):
+    """The chain's split for every row of rate table rows ``df``, as a frame aligned with it.
+
+    One ``after <layer>`` column per layer, ending in ``botg_gets``; each row
+    uses its own national and category overrides. E.g. BOTG pay for every
+    HUD tier-1 row: ``botg_pay(df[(df['national'] == "HUD / FHA") & (df['tier'] == 1)])``.
+    """
+    chain = FeeChain() if chain is None else chain
+    split = chain.evaluate(df['price'].to_numpy(dtype=float, na_value=np.nan), df['national'], df['category'])
+    out = pd.DataFrame(split['remaining'][:, 1:], index=df.index, columns=[f"after {n}" for n in chain.names])
+    out['botg_gets'] = split['botg_gets']
+    return out
@@ -0,0 +1,171 @@
+"""Rate-sheet ingestion for the Property Preservation Rate Lookup.
+
+Turns a raw rate sheet (one row per national / work type / state / lot range)
+into the processed rate table the app works from. Every step runs as a batched
+column operation; the per-value string work (lot-size bucketing, category
+classification) is done once per distinct value and broadcast back to rows.
+
+Raw rate-sheet schema (one CSV row per published rate):
+
+    national         Investor or national servicer name ("HUD" is shown as "HUD / FHA")
+    work_type        Service name as published, e.g. "Grass Cut - Initial"
+    state            Full state name, or "All States" for nationwide rates
+    lot_size         Lot-size range such as "1-10000 sf"; blank when the rate is not lot-based
+    price            Allowable / reported rate in dollars
+    unit             Billing unit, e.g. "per cut", "per occurrence"
+    notes            Free-text caveats (optional)
+    source           Where the rate came from, e.g. a HUD Mortgagee Letter
+    last_updated     Date the rate was published or reported (YYYY-MM-DD)
+    tier             1 = verified official allowable, 2 = industry reported
+    tier_label       Human-readable tier label
+    tier_note        Human-readable provenance note
+    region_override  Zone qualifier for nationals that price by zone (optional)
+
+The processed table keeps those columns (with ``lot_size`` replaced by its
+bucket label) and adds the numeric lot bounds ``lot_min_sf`` / ``lot_max_sf``
+(NaN for work that isn't lot-based), ``display_work`` and ``category``. It is
+stored compactly (see compact_rate_table): labels are categoricals, ``tier`` is
+a nullable Int8, ``last_updated`` is a datetime and missing text is NA.
+"""
+import numpy as np
+import pandas as pd
+
+from classify import categorize_works
+from lots import bucket_lot_sizes, parse_lot_sizes
+
+DEFAULT_PATH = "Property_Pricing_Master.csv"
+
+RATE_SHEET_COLUMNS = [
+    'national', 'work_type', 'state', 'lot_size', 'price', 'unit', 'notes', 'source',
+    'last_updated', 'tier', 'tier_label', 'tier_note', 'region_override',
+]
+REQUIRED_COLUMNS = ['national', 'work_type', 'state', 'price', 'tier']
+
+NATIONAL_ALIASES = {'HUD': 'HUD / FHA'}
+
+LOT_BOUND_COLUMNS = ['lot_min_sf', 'lot_max_sf']
+
+# Low-cardinality labels stored as categoricals in the processed table
+CATEGORICAL_COLUMNS = [
+    'national', 'work_type', 'state', 'lot_size', 'unit', 'source', 'tier_label', 'tier_note',
+    'region_override', 'display_work', 'category',
+]
+# Text columns where "" means "not given"; stored as NA
+BLANKABLE_COLUMNS = ['lot_size', 'notes', 'region_override']
+
+
+def validate_rate_sheet(raw):
+    missing = [c for c in REQUIRED_COLUMNS if c not in raw.columns]
+    if missing:
+        raise ValueError(f"Rate sheet is missing required column(s): {', '.join(missing)}")
+    price = pd.to_numeric(raw['price'], errors='coerce')
+    if price.isna().any():
+        bad = raw.loc[price.isna(), 'price'].head(3).tolist()
+        raise ValueError(f"Rate sheet has non-numeric prices, e.g. {bad}")
+    # Optional columns are allowed to be absent; fill them so the output schema is stable
+    absent = {col: np.nan for col in RATE_SHEET_COLUMNS if col not in raw.columns}
+    return raw.assign(price=price, **absent)
+
+
+def read_rate_sheet(path=DEFAULT_PATH):
+    return validate_rate_sheet(pd.read_csv(path))
+
+
+def build_display_work(work_type, lot_size):
+    # Merge the "Phantom Variable" (Lot Size) directly into the Work Type
+    work = work_type.astype(str)
+    has_lot = lot_size.astype(str).str.strip() != ""
+    return work.where(~has_lot, work + " (" + lot_size.astype(str) + ")")
+
+
+def compact_rate_table(df):
+    """Store the processed table in compact dtypes.
+
+    Repetitive labels become categoricals, ``tier`` a nullable small int,
+    ``last_updated`` a real date, and blank ``lot_size`` / ``notes`` /
+    ``region_override`` values become NA instead of "".
+    """
+    df = df.copy()
+    for col in BLANKABLE_COLUMNS:
+        df[col] = df[col].replace("", np.nan)
+    for col in CATEGORICAL_COLUMNS:
+        df[col] = df[col].astype('category')
+    df['notes'] = df['notes'].astype('string')
+    df['tier'] = pd.to_numeric(df['tier'], errors='coerce').astype('Int8')
+    df['last_updated'] = pd.to_datetime(df['last_updated'], errors='coerce')
+    return df
+
+
+def memory_report(before, after):
+    """Deep bytes per column for two versions of the rate table, plus a total row."""
+    report = pd.DataFrame({
+        'before_bytes': before.memory_usage(index=False, deep=True),
+        'after_bytes': after.memory_usage(index=False, deep=True),
+    }).fillna(0).astype('int64')
+    report.loc['total'] = report.sum()
+    report['ratio'] = (report['after_bytes'] / report['before_bytes']).round(3)
+    return report
+
+
+def group_max(df):
+    """One row per distinct rate: the max price, with lot bounds spanning every range folded in.
+
+    Grouping a concatenation of group_max outputs gives the same rows as
+    grouping the raw rows they came from, which is what lets sheets be
+    deduplicated one file at a time and merged afterwards.
+    """
+    group_cols = [c for c in df.columns if c not in ['price'] + LOT_BOUND_COLUMNS]
+    return df.groupby(group_cols, as_index=False, dropna=False).agg(
+        price=('price', 'max'), lot_min_sf=('lot_min_sf', 'min'), lot_max_sf=('lot_max_sf', 'max'),
+    )
+
+
+def dedupe_rate_rows(raw):
+    """The per-row half of the pipeline: national aliases, lot buckets and bounds, then group_max."""
+    df = raw.copy()
+
+    # Rename HUD to HUD / FHA for clarity
+    df['national'] = df['national'].replace(NATIONAL_ALIASES)
+
+    # Parse lot ranges into numeric bounds, then consolidate them into the three lot buckets
+    bounds = parse_lot_sizes(df['lot_size'])
+    df['lot_size'] = bucket_lot_sizes(df['lot_size'], bounds)
+
+    # Group by the clean parameters and take the max price to deduplicate rows
+    df[LOT_BOUND_COLUMNS] = bounds
+    return group_max(df)
+
+
+def lot_rate_rows(raw):
+    """The sheet's lot-based rows, one per published range, with national aliases and lot bounds.
+
+    These are the rows before bucketing and group_max fold each bucket's
+    ranges into one, so an exact square footage still finds its own range.
+    """
+    df = raw[RATE_SHEET_COLUMNS].copy()
+    df['national'] = df['national'].replace(NATIONAL_ALIASES)
+    df[LOT_BOUND_COLUMNS] = parse_lot_sizes(df['lot_size'])
+    return df[df['lot_min_sf'].notna()].reset_index(drop=True)
+
+
+def finish_rate_table(df, compact=True):
+    """The per-label half: display_work and category on deduplicated rows, then the compact dtypes."""
+    group_cols = [c for c in df.columns if c not in ['price'] + LOT_BOUND_COLUMNS]
+    df['display_work'] = build_display_work(df['work_type'], df['lot_size'])
+
+    # Build work type categories for the category filter
+    df['category'] = categorize_works(df['display_work'])
+
+    if not compact:
+        # The shape load_data used to return: plain strings with "" for blanks
+        df[group_cols] = df[group_cols].fillna("")
+        return df
+    return compact_rate_table(df)
+
+
+def process_rate_sheet(raw, compact=True):
+    return finish_rate_table(dedupe_rate_rows(raw), compact=compact)
+
+
+def load_rate_table(path=DEFAULT_PATH):
+    return process_rate_sheet(read_rate_sheet(path))
@@ -0,0 +1,96 @@
+"""Lot-size parsing, bucketing and lookup by exact square footage.
+
+Rate sheets publish lot-based work (grass cuts, mostly) against ranges such as
+"1-10000 sf" or "40001+ sf". Those strings are parsed once into numeric
+(low, high) square-foot bounds; the bucket label shown in the app is derived
+from the bounds, and LotSizeIndex answers "what does this work pay on a lot
+of N sq ft" by binary search over the bounds. The index is built from the
+sheet's per-range rows (ingest.lot_rate_rows), not the processed table, whose
+rows each span a whole bucket at its highest rate.
+"""
+import numpy as np
+import pandas as pd
+
+STANDARD_LOT = "Standard Lot (<10,000 sf)"
+MEDIUM_LOT = "Medium Lot (10k-25k sf)"
+OVERSIZED_LOT = "Oversized Lot (25k+ sf)"
+
+# Ranges that top out at 10,000 sf are Standard. Otherwise a range is Medium if
+# it starts at or below 20,000 sf (this covers flat 1-15000 / 1-10890 rates and
+# 15001-25000), and Oversized once it starts above that.
+STANDARD_MAX_SF = 10_000
+MEDIUM_MAX_START_SF = 20_000
+
+LOT_RANGE_PATTERN = r'^\s*(?P<low>\d[\d,]*)\s*(?:(?P<plus>\+)|-\s*(?P<high>\d[\d,]*))?\s*(?:sf|sq\.?\s*ft\.?)?\s*$'
+
+
+def _to_sf(values):
+    return pd.to_numeric(values.str.replace(',', '', regex=False), errors='coerce')
+
+
+def parse_lot_sizes(lot_sizes):
+    """Parse lot-size strings into a frame of float ``lot_min_sf`` / ``lot_max_sf``.
+
+    Open-ended ranges ("10001+ sf") get an infinite upper bound; blank or
+    unparseable strings get NaN for both.
+    """
+    codes, uniques = pd.factorize(lot_sizes, use_na_sentinel=False)
+    parts = pd.Series(uniques, dtype=object).astype(str).str.lower().str.extract(LOT_RANGE_PATTERN)
+    low = _to_sf(parts['low'])
+    high = _to_sf(parts['high']).where(parts['plus'].isna(), np.inf)
+    # A bare number is a single-size rate
+    high = high.fillna(low)
+    bounds = pd.DataFrame({'lot_min_sf': low.to_numpy()[codes], 'lot_max_sf': high.to_numpy()[codes]},
+                          index=lot_sizes.index)
+    return bounds
+
+
+def bucket_lot_sizes(lot_sizes, bounds=None):
+    """Map raw lot-size strings to their bucket label ("" when blank)."""
+    if bounds is None:
+        bounds = parse_lot_sizes(lot_sizes)
+    low, high = bounds['lot_min_sf'].to_numpy(), bounds['lot_max_sf'].to_numpy()
+    raw = lot_sizes.astype(str).str.strip()
+    blank = (lot_sizes.isna() | (raw == "")).to_numpy()
+    with np.errstate(invalid='ignore'):
+        labels = np.select(
+            [blank, high <= STANDARD_MAX_SF, low <= MEDIUM_MAX_START_SF, low > MEDIUM_MAX_START_SF],
+            ["", STANDARD_LOT, MEDIUM_LOT, OVERSIZED_LOT],
+            # Flag anything that doesn't parse instead of silently defaulting
+            default=("Unrecognized (" + raw + ")").to_numpy(dtype=object),
+        )
+    return pd.Series(labels, index=lot_sizes.index, dtype=object)
+
+
+class LotSizeIndex:
+    """Per-range lot rates sorted by (national, work_type, state, lot_min_sf) for exact-size lookups.
+
+    ``df`` is ingest.lot_rate_rows output: one row per published range.
+    """
+
+    KEY = ['national', 'work_type', 'state']
+
+    def __init__(self, df):
+        lots = df[df['lot_min_sf'].notna()]
+        self.rows = lots.sort_values(self.KEY + ['lot_min_sf'], kind='stable')
+        self._min = self.rows['lot_min_sf'].to_numpy()
+        self._max = self.rows['lot_max_sf'].to_numpy()
+        # Key -> contiguous [start, stop) slice of the sorted rows
+        starts = self.rows.groupby(self.KEY, sort=False).indices
+        self._slices = {key: (pos[0], pos[-1] + 1) for key, pos in starts.items()}
+        self._nationals = {}
+        for national, work_type, state in self._slices:
+            self._nationals.setdefault((work_type, state), []).append(national)
+
+    def lookup(self, work_type, state, sqft, national=None):
+        """Rows whose lot range covers ``sqft``, narrowest range first within each national."""
+        nationals = [national] if national else self._nationals.get((work_type, state), [])
+        positions = []
+        for nat in nationals:
+            start, stop = self._slices.get((nat, work_type, state), (0, 0))
+            # Ranges in the slice are sorted by their low bound, so everything
+            # that could cover sqft sits before the insertion point
+            end = start + np.searchsorted(self._min[start:stop], sqft, side='right')
+            hits = np.arange(start, end)[self._max[start:end] >= sqft]
+            positions.extend(hits[np.argsort(self._max[hits] - self._min[hits], kind='stable')])
+        return self.rows.iloc[positions]
@@ -0,0 +1,132 @@
+"""Per-rerun stage timings for the app, off unless asked for.
+
+The app turns this on for every session with RATE_PROFILE=1 in the
+environment, or for one session with ``?profile=1`` on the URL. Stages are
+timed with ``with profiler.stage("name"):`` blocks; a disabled profiler hands
+back a shared no-op context, so the instrumentation costs nothing when off.
+Stages may nest (``tab1`` around ``tab1.filter``); a stage entered twice in
+one rerun is summed.
+
+Each finished rerun is appended as one JSON line to RATE_PROFILE_LOG
+(default profile.jsonl):
+
+    {"ts": 1760000000.0, "session": "3f2a9c1e", "rerun": 4, "total_ms": 41.2,
+     "stages": {"load_store": 0.4, "tab1": 12.9, "tab1.filter": 1.7, ...}}
+
+The last ``WINDOW`` timings of each stage, across every session in the
+process, give the p50 / p95 the app's debug sidebar shows. ``read_log``
+gives the same from the log file, so reruns from every worker count:
+``python cli.py profile profile.jsonl``.
+"""
+import collections
+import contextlib
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_LOG = 'profile.jsonl'
+WINDOW = 1000  # recent timings kept per stage, per process
+TOTAL = 'total'
+
+_recent = collections.defaultdict(lambda: collections.deque(maxlen=WINDOW))
+_lock = threading.Lock()
+
+
+def enabled_by(environ=os.environ, query_params=None):
+    """Whether profiling is on: RATE_PROFILE set (not "0"), or ``profile=1`` among the query params."""
+    if environ.get('RATE_PROFILE', '0') not in ('', '0'):
+        return True
+    return bool(query_params) and query_params.get('profile') == '1'
+
+
+class RerunProfiler:
+    """Stage timings for one rerun; ``finish`` records and logs them."""
+
+    def __init__(self, session, rerun, enabled=True, log_path=None):
+        self.session = session
+        self.rerun = rerun
+        self.enabled = enabled
+        self.log_path = log_path or os.environ.get('RATE_PROFILE_LOG', DEFAULT_LOG)
+        self.stages = {}
+        self.total_ms = None
+        self._start = time.perf_counter()
+
+    def stage(self, name):
+        return self._timed(name) if self.enabled else contextlib.nullcontext()
+
+    @contextlib.contextmanager
+    def _timed(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + (time.perf_counter() - start) * 1e3
+
+    def finish(self):
+        """Close the rerun: add its timings to the process window and append them to the log.
+
+        Returns the log record, or None when profiling is off.
+        """
+        if not self.enabled:
+            return None
+        self.total_ms = (time.perf_counter() - self._start) * 1e3
+        record = {
+            'ts': round(time.time(), 3), 'session': self.session, 'rerun': self.rerun,
+            'total_ms': round(self.total_ms, 3), 'stages': {k: round(v, 3) for k, v in self.stages.items()},
+        }
+        with _lock:
+            _recent[TOTAL].append(self.total_ms)
+            for name, ms in self.stages.items():
+                _recent[name].append(ms)
+            with open(self.log_path, 'a', encoding='utf-8') as log:
+                log.write(json.dumps(record) + '\n')
+        return record
+
+    def frame(self):
+        """This rerun's stages, slowest first, with the share of the rerun each took."""
+        out = pd.DataFrame({'stage': list(self.stages), 'ms': list(self.stages.values())})
+        out['share'] = out['ms'] / self.total_ms if self.total_ms else np.nan
+        return out.sort_values('ms', ascending=False, ignore_index=True)
+
+
+def percentiles(samples):
+    """p50 / p95 / max per stage from {stage: [ms, ...]}, the rerun total first, then slowest p95 first."""
+    rows = [{'stage': name, 'reruns': len(ms), 'p50_ms': np.percentile(ms, 50), 'p95_ms': np.percentile(ms, 95),
+             'max_ms': max(ms)}
+            for name, ms in samples.items() if len(ms)]
+    out = pd.DataFrame(rows, columns=['stage', 'reruns', 'p50_ms', 'p95_ms', 'max_ms'])
+    order = np.lexsort((-out['p95_ms'].to_numpy(dtype=float), (out['stage'] != TOTAL).to_numpy()))
+    return out.iloc[order].reset_index(drop=True)
+
+
+def recent_percentiles():
+    """``percentiles`` over the last WINDOW reruns of every session in this process."""
+    with _lock:
+        samples = {name: list(ms) for name, ms in _recent.items()}
+    return percentiles(samples)
+
+
+def read_log(path, since=None):
+    """Stage timings from a JSON-lines log as {stage: [ms, ...]}; ``since`` is a unix time.
+
+    Lines that aren't valid records (say, a write cut short) are skipped.
+    """
+    samples = collections.defaultdict(list)
+    with open(path, encoding='utf-8') as log:
+        for line in log:
+            try:
+                record = json.loads(line)
+                ts, total = record['ts'], float(record['total_ms'])
+                stages = [(name, float(ms)) for name, ms in record['stages'].items()]
+            except (ValueError, KeyError, TypeError, AttributeError):
+                continue
+            if since is not None and ts < since:
+                continue
+            samples[TOTAL].append(total)
+            for name, ms in stages:
+                samples[name].append(ms)
+    return dict(samples)
@@ -0,0 +1,118 @@
+"""Rate history: every rate's price over time, with point-in-time lookups.
+
+The processed table keeps one row per distinct rate and date (the dedupe in
+ingest groups on ``last_updated`` too), so it already holds the history; this
+lays it out for lookups. Rows are keyed by (national, display_work, state) and
+each key's events are sorted by effective date (``last_updated``). Rows of one
+key on the same date (zones, units, tiers) become one event at their highest
+price, as the dedupe does for repeated rows.
+
+    history = RateHistory(df)
+    history.as_of("HUD / FHA", "Grass Cut - Initial", "Ohio", "2019-12-31")
+    history.latest_as_of("2019-12-31")    # the whole table as it stood then
+
+``as_of`` is two binary searches: one for the key, one in its dates.
+``latest_as_of`` picks the last event on or before the date for every key
+with one array pass. Undated rows count as in effect from the start.
+"""
+import numpy as np
+import pandas as pd
+
+KEY_COLUMNS = ['national', 'display_work', 'state']
+EFFECTIVE = 'last_updated'
+
+
+def _timestamp(date):
+    # ns since the epoch, as the event dates are stored
+    stamp = pd.Timestamp(date)
+    if stamp is pd.NaT:
+        raise ValueError(f"Not a date: {date!r}")
+    return stamp.as_unit('ns').value
+
+
+class RateHistory:
+    def __init__(self, df):
+        labels, codes = [], []
+        for col in KEY_COLUMNS:
+            values = pd.Categorical(df[col])
+            labels.append(np.asarray(values.categories, dtype=object))
+            codes.append(values.codes.astype(np.int64) + 1)  # 0 is NA
+        self._label_code = [{label: i + 1 for i, label in enumerate(col)} for col in labels]
+        self._radix = [len(col) + 1 for col in labels]
+        combined = (codes[0] * self._radix[1] + codes[1]) * self._radix[2] + codes[2]
+
+        dates = df[EFFECTIVE].to_numpy(dtype='datetime64[ns]').view(np.int64)  # NaT is the smallest int64
+        price = df['price'].to_numpy(dtype=float)
+        order = np.lexsort((dates, combined))
+        combined, dates, price = combined[order], dates[order], price[order]
+
+        # One event per (key, date), at its highest price
+        starts = np.flatnonzero(np.r_[True, (combined[1:] != combined[:-1]) | (dates[1:] != dates[:-1])][:len(combined)])
+        self.dates = dates[starts]
+        self.prices = np.maximum.reduceat(price, starts) if len(starts) else price[:0]
+        event_key = combined[starts]
+
+        # CSR by key: key k's events are [offsets[k], offsets[k + 1])
+        key_starts = np.flatnonzero(np.r_[True, event_key[1:] != event_key[:-1]][:len(event_key)])
+        self._keys = event_key[key_starts]
+        self._offsets = np.r_[key_starts, len(event_key)]
+        self._event_key = np.repeat(np.arange(len(self._keys)), np.diff(self._offsets))
+
+        # Each key's label codes back out of the combined code (-1 is NA)
+        state = self._keys % self._radix[2]
+        work = self._keys // self._radix[2] % self._radix[1]
+        national = self._keys // (self._radix[2] * self._radix[1])
+        self._categories = labels
+        self._key_codes = [code - 1 for code in (national, work, state)]
+
+    def __len__(self):
+        return len(self.dates)
+
+    @property
+    def n_keys(self):
+        return len(self._keys)
+
+    def _key(self, national, work, state):
+        codes = [lookup.get(label) for lookup, label in zip(self._label_code, (national, work, state))]
+        if None in codes:
+            return None
+        combined = (codes[0] * self._radix[1] + codes[1]) * self._radix[2] + codes[2]
+        k = np.searchsorted(self._keys, combined)
+        return k if k < len(self._keys) and self._keys[k] == combined else None
+
+    def history(self, national, work, state):
+        """Every event for one rate as a frame of ``last_updated`` / ``price``, oldest first."""
+        k = self._key(national, work, state)
+        lo, hi = (0, 0) if k is None else (self._offsets[k], self._offsets[k + 1])
+        return pd.DataFrame({EFFECTIVE: self.dates[lo:hi].view('datetime64[ns]'), 'price': self.prices[lo:hi]})
+
+    def as_of(self, national, work, state, date):
+        """The rate in effect on ``date``: {'price', 'last_updated'}, or None when there was none yet."""
+        k = self._key(national, work, state)
+        if k is None:
+            return None
+        lo, hi = self._offsets[k], self._offsets[k + 1]
+        i = lo + np.searchsorted(self.dates[lo:hi], _timestamp(date), side='right') - 1
+        if i < lo:
+            return None
+        return {'price': float(self.prices[i]), EFFECTIVE: pd.Timestamp(self.dates[i].view('datetime64[ns]'))}
+
+    def latest_as_of(self, date=None):
+        """The latest event on or before ``date`` (default: ever) for every rate, one row per key.
+
+        Columns: national, display_work, state, price, last_updated and
+        ``changes``, the number of events up to that one.
+        """
+        cutoff = np.iinfo(np.int64).max if date is None else _timestamp(date)
+        # Dates ascend within a key, so its in-effect events are a prefix and the
+        # last one is followed by another key or by a later date
+        known = self.dates <= cutoff
+        latest = known & np.r_[(self._event_key[1:] != self._event_key[:-1]) | ~known[1:], True]
+        rows = np.flatnonzero(latest)
+        keys = self._event_key[rows]
+        out = pd.DataFrame({col: pd.Categorical.from_codes(codes[keys], categories)
+                            for col, codes, categories in zip(KEY_COLUMNS, self._key_codes, self._categories)})
+        out['price'] = self.prices[rows]
+        out[EFFECTIVE] = self.dates[rows].view('datetime64[ns]')
+        out['changes'] = rows - self._offsets[keys] + 1
+        return out
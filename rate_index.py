@@ -0,0 +1,139 @@
+"""Precomputed filter index over the processed rate table.
+
+The Rate Lookup tab filters on four columns and rebuilds its cascading option
+lists on every rerun. RateIndex factorizes those columns once at load time and
+keeps, for every value, the row positions that hold it. A selection then becomes
+a handful of boolean-mask ORs/ANDs over positions, and option lists are read off
+the integer codes of the matching rows, with no frame copies or string compares.
+Work types can also be searched by fuzzy text (see work_search), limited to the
+ones a mask leaves.
+"""
+import functools
+
+import numpy as np
+import pandas as pd
+
+FILTER_COLUMNS = ['category', 'national', 'display_work', 'state']
+
+
+class _ColumnIndex:
+    def __init__(self, values, parts=None, offsets=None):
+        if parts is None:
+            # Sorted uniques give option lists in display order for free
+            codes, uniques = pd.factorize(values, sort=True)
+            uniques, codes = np.asarray(uniques, dtype=object), codes.astype(np.int32)
+            parts = (uniques, codes, np.argsort(codes, kind='stable'))
+        self.values, self.codes, self.order = parts
+        self.lookup = {value: code for code, value in enumerate(self.values)}
+        # CSR layout: rows holding code c are order[offsets[c]:offsets[c + 1]]
+        if offsets is None:
+            offsets = np.searchsorted(self.codes[self.order], np.arange(len(self.values) + 1))
+        self.offsets = offsets
+
+    def rows_for(self, code):
+        return self.order[self.offsets[code]:self.offsets[code + 1]]
+
+    def updated(self, kept, tail):
+        """The index after keeping only the rows in ``kept`` (a mask) and appending ``tail``'s values.
+
+        Values no kept row holds are dropped and the tail's new ones inserted
+        in sort order. Old codes map to new ones in the same order, so the kept
+        rows' part of the CSR stays sorted and the tail is merged into it.
+        """
+        kept_codes = self.codes[kept]
+        tail = np.asarray(pd.Series(tail).astype(object), dtype=object)
+        present = pd.notna(tail)
+        live = np.bincount(kept_codes[kept_codes >= 0], minlength=len(self.values)) > 0
+        added = pd.Index(pd.unique(tail[present])).difference(pd.Index(self.values[live]))
+        values = np.sort(np.concatenate([self.values[live], np.asarray(added, dtype=object)]))
+
+        remap = np.full(len(self.values) + 1, -1, dtype=np.int32)  # the last slot takes code -1 (NA)
+        remap[:-1][live] = np.searchsorted(values, self.values[live])
+        tail_codes = np.full(len(tail), -1, dtype=np.int32)
+        tail_codes[present] = np.searchsorted(values, tail[present])
+        codes = np.concatenate([remap[kept_codes], tail_codes])
+
+        renumbered = np.cumsum(kept) - 1
+        head_order = renumbered[self.order[kept[self.order]]]
+        tail_order = len(kept_codes) + np.argsort(tail_codes, kind='stable')
+        # Merge two runs sorted by code; a tail row goes after the kept rows with its code
+        at = np.searchsorted(codes[head_order], codes[tail_order], side='right') + np.arange(len(tail_order))
+        order = np.empty(len(codes), dtype=np.int64)
+        from_tail = np.zeros(len(codes), dtype=bool)
+        from_tail[at] = True
+        order[at] = tail_order
+        order[~from_tail] = head_order
+        return _ColumnIndex(None, parts=(values, codes, order))
+
+
+class RateIndex:
+    def __init__(self, df, columns=FILTER_COLUMNS, parts=None):
+        self.df = df
+        self.n_rows = len(df)
+        self.columns = parts if parts is not None else {col: _ColumnIndex(df[col]) for col in columns}
+
+    def updated(self, df, kept, tail):
+        """The index for ``df``: this index's table with rows ``kept`` (a mask), then ``tail``'s rows.
+
+        Costs array passes over the codes rather than a re-factorize and sort
+        of every column, as a delta touches a small part of the table.
+        """
+        parts = {col: index.updated(kept, tail[col]) for col, index in self.columns.items()}
+        index = RateIndex(df, parts=parts)
+        # The work-type search only depends on the work-type labels
+        if 'work_search' in self.__dict__ and np.array_equal(parts['display_work'].values,
+                                                              self.columns['display_work'].values):
+            index.work_search = self.work_search
+        return index
+
+    def all_values(self, column):
+        return self.columns[column].values.tolist()
+
+    def mask(self, **selections):
+        """Boolean row mask for ``column=[values...]`` selections; empty selections don't filter.
+
+        Returns None when nothing is selected, meaning every row matches.
+        """
+        mask = None
+        for column, selected in selections.items():
+            if not selected:
+                continue
+            index = self.columns[column]
+            col_mask = np.zeros(self.n_rows, dtype=bool)
+            for value in selected:
+                code = index.lookup.get(value)
+                if code is not None:
+                    col_mask[index.rows_for(code)] = True
+            mask = col_mask if mask is None else mask & col_mask
+        return mask
+
+    def _present(self, column, mask):
+        index = self.columns[column]
+        if mask is None:
+            return np.ones(len(index.values), dtype=bool)
+        return np.bincount(index.codes[mask], minlength=len(index.values)) > 0
+
+    def options(self, column, mask=None):
+        """Sorted distinct values of ``column`` among the rows in ``mask``."""
+        return self.columns[column].values[self._present(column, mask)].tolist()
+
+    def missing(self, column, mask=None):
+        """Sorted values of ``column`` that no row in ``mask`` has (the "ghost" options)."""
+        return self.columns[column].values[~self._present(column, mask)].tolist()
+
+    @functools.cached_property
+    def work_search(self):
+        from classify import categorize_works
+        from work_search import WorkSearchIndex
+        labels = self.columns['display_work'].values
+        return WorkSearchIndex(labels, categorize_works(pd.Series(labels)))
+
+    def search_works(self, query, mask=None, limit=20):
+        """Best fuzzy matches for ``query`` among the work types of the rows in ``mask``."""
+        return self.work_search.search(query, limit=limit, allowed=self._present('display_work', mask))
+
+    def rows(self, mask=None):
+        """The matching slice of the rate table, in table order."""
+        if mask is None:
+            return self.df
+        return self.df.iloc[np.flatnonzero(mask)]
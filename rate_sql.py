@@ -0,0 +1,124 @@
+"""Read-only SQL over the rate table, on the standard library's SQLite.
+
+The processed table is copied once into an in-memory database as ``rates``,
+with indexes on the columns analysts filter and group by. Every query gets
+its own connection to that database with guardrails on:
+
+    read-only   the connection is query_only and an authorizer allows nothing
+                but SELECT, so no INSERT/UPDATE, PRAGMA or ATTACH gets through
+    timeout     a progress handler aborts the statement past its deadline
+    row limit   rows are fetched in pages and fetching stops at the limit
+
+Results come back as a generator of DataFrame pages, so a large result is
+never materialized in one piece. ``last_updated`` is stored as YYYY-MM-DD
+text, which sorts and compares like the date.
+"""
+import itertools
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+TABLE = 'rates'
+INDEXED_COLUMNS = ['national', 'state', 'display_work', 'category']
+# Covers "allowable by category and state for one national" without touching the table
+COVERING_INDEXES = {'national_category_state': ['national', 'category', 'state', 'tier', 'price']}
+
+DEFAULT_ROW_LIMIT = 10_000
+DEFAULT_PAGE_SIZE = 1_000
+DEFAULT_TIMEOUT_S = 5.0
+
+EXAMPLE_QUERY = """SELECT category, state, ROUND(AVG(price), 2) AS avg_allowable, COUNT(*) AS rates
+FROM rates
+WHERE national = :national AND tier = 1
+GROUP BY category, state
+ORDER BY category, state"""
+
+_ALLOWED_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE}
+_uris = itertools.count()
+
+
+def _authorize(action, *_):
+    return sqlite3.SQLITE_OK if action in _ALLOWED_ACTIONS else sqlite3.SQLITE_DENY
+
+
+def _sql_values(values):
+    # One column as a list SQLite can bind: str / int / float, with None for missing
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        labels = np.append(values.cat.categories.astype(object).to_numpy(), None)
+        return labels[values.cat.codes.to_numpy()].tolist()  # code -1 picks the trailing None
+    if pd.api.types.is_datetime64_any_dtype(values):
+        values = values.dt.strftime('%Y-%m-%d')
+    elif pd.api.types.is_float_dtype(values):
+        return values.tolist()  # SQLite stores NaN as NULL
+    return values.astype(object).where(values.notna(), None).tolist()
+
+
+class RateSQL:
+    """An in-memory SQLite copy of the rate table, queried through guarded connections."""
+
+    def __init__(self, df):
+        # A named shared-cache database lives as long as this owning connection
+        self._uri = f"file:rate_sql_{next(_uris)}?mode=memory&cache=shared"
+        self._owner = sqlite3.connect(self._uri, uri=True, check_same_thread=False)
+        self.columns = list(df.columns)
+
+        rows = zip(*[_sql_values(df[col]) for col in self.columns])
+        quoted = ", ".join(f'"{c}"' for c in self.columns)
+        with self._owner:
+            self._owner.execute(f"CREATE TABLE {TABLE} ({quoted})")
+            self._owner.executemany(f"INSERT INTO {TABLE} VALUES ({', '.join('?' * len(self.columns))})", rows)
+            for col in INDEXED_COLUMNS:
+                self._owner.execute(f'CREATE INDEX idx_{col} ON {TABLE} ("{col}")')
+            for name, cols in COVERING_INDEXES.items():
+                self._owner.execute(f"CREATE INDEX idx_{name} ON {TABLE} ({', '.join(cols)})")
+        self._owner.execute("ANALYZE")
+
+    def _connect(self, deadline):
+        conn = sqlite3.connect(self._uri, uri=True, check_same_thread=False)
+        conn.execute("PRAGMA query_only = ON")
+        conn.set_authorizer(_authorize)
+        # Checked every few thousand VM steps; a non-zero return interrupts the statement
+        conn.set_progress_handler(lambda: time.monotonic() > deadline, 10_000)
+        return conn
+
+    def query(self, sql, params=None, row_limit=DEFAULT_ROW_LIMIT, page_size=DEFAULT_PAGE_SIZE,
+              timeout=DEFAULT_TIMEOUT_S):
+        """Run one SELECT and yield its rows as DataFrame pages of up to ``page_size`` rows.
+
+        ``params`` fills ``?`` or ``:name`` placeholders. At most ``row_limit``
+        rows are returned, and the whole query, fetching included, is stopped
+        after ``timeout`` seconds. Raises ValueError for SQL that fails or
+        isn't a read, and TimeoutError when the deadline passes.
+        """
+        deadline = time.monotonic() + timeout
+        conn = self._connect(deadline)
+        try:
+            try:
+                cursor = conn.execute(sql, params or ())
+                if cursor.description is None:
+                    raise ValueError("Only SELECT queries are allowed")
+                columns = [d[0] for d in cursor.description]
+                remaining = row_limit
+                while remaining > 0:
+                    rows = cursor.fetchmany(min(page_size, remaining))
+                    if not rows:
+                        break
+                    remaining -= len(rows)
+                    yield pd.DataFrame.from_records(rows, columns=columns)
+                if remaining == row_limit:
+                    # No rows: one empty page, so callers still get the column names
+                    yield pd.DataFrame(columns=columns)
+            except sqlite3.OperationalError as e:
+                if str(e) == 'interrupted':
+                    raise TimeoutError(f"Query stopped after the {timeout:g}s limit") from None
+                raise ValueError(f"SQL error: {e}") from None
+            except sqlite3.DatabaseError as e:
+                raise ValueError(f"SQL error: {e}") from None
+        finally:
+            conn.close()
+
+    def run(self, sql, params=None, row_limit=DEFAULT_ROW_LIMIT, timeout=DEFAULT_TIMEOUT_S):
+        """``query`` collected into one frame (at most ``row_limit`` rows)."""
+        return pd.concat(self.query(sql, params, row_limit=row_limit, timeout=timeout), ignore_index=True)
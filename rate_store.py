@@ -0,0 +1,220 @@
+"""Live rate table that takes incremental delta updates.
+
+A delta file is a CSV in the rate-sheet format (see ingest) with an optional
+``action`` column. Its rows are keyed by (national, work_type, state, lot_size):
+
+    upsert   (the default when blank) the delta's rows for a key replace every
+             sheet row with that key, or add the key if it is new; a key with
+             several zone-priced rows is sent as several upsert rows
+    retire   every sheet row with that key is removed; only the key columns
+             need to be filled in
+
+Every processed row comes from the raw rows of a single (national, work_type,
+state) block, so applying a delta reprocesses only the blocks it touches:
+their old processed rows are dropped, the re-run ingest output for them is
+appended, and the filter index and comparison cube are updated for just
+those rows and comparisons. Each applied delta bumps ``version``, which
+sessions compare against to pick up the change without reloading the whole
+sheet.
+
+The raw sheet and processed table are spliced column by column on their
+categorical codes (see _splice_rows): labels a delta brings are appended to
+the categories and labels no row uses any more are left in place, so the
+table's categories can differ in order and extent from a fresh load's.
+"""
+import glob
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+import ingest
+from comparison import ComparisonCube
+from rate_index import RateIndex
+from sources import read_rate_sheets
+from table_cache import load_cached_rate_table, source_fingerprint
+
+DELTA_KEY_COLUMNS = ['national', 'work_type', 'state', 'lot_size']
+BLOCK_COLUMNS = ['national', 'work_type', 'state']
+DELTA_ACTIONS = ('upsert', 'retire')
+
+
+def read_delta(path):
+    return normalize_delta(pd.read_csv(path))
+
+
+def normalize_delta(delta):
+    """Check a delta's columns and actions; returns it with the national aliases applied."""
+    missing = [c for c in BLOCK_COLUMNS if c not in delta.columns]
+    if missing:
+        raise ValueError(f"Delta is missing key column(s): {', '.join(missing)}")
+    delta = delta.copy()
+    if 'action' not in delta.columns:
+        delta['action'] = 'upsert'
+    delta['action'] = delta['action'].fillna('upsert').astype(str).str.strip().str.lower()
+    bad = sorted(set(delta['action']) - set(DELTA_ACTIONS))
+    if bad:
+        raise ValueError(f"Delta has unknown action(s) {bad}; expected one of {', '.join(DELTA_ACTIONS)}")
+
+    upserts = delta[delta['action'] == 'upsert'].drop(columns='action')
+    upserts = ingest.validate_rate_sheet(upserts) if len(upserts) else upserts.reindex(columns=ingest.RATE_SHEET_COLUMNS)
+    retires = delta.loc[delta['action'] == 'retire', [c for c in DELTA_KEY_COLUMNS if c in delta.columns]]
+    delta = pd.concat([upserts[ingest.RATE_SHEET_COLUMNS].assign(action='upsert'), retires.assign(action='retire')],
+                      ignore_index=True)
+    delta['national'] = delta['national'].replace(ingest.NATIONAL_ALIASES)
+    return delta
+
+
+def _key_frame(rows, columns):
+    # Key columns as plain strings, with blanks (e.g. no lot size) as ""
+    return pd.DataFrame({c: rows[c].astype(object).where(rows[c].notna(), "").astype(str).to_numpy()
+                         for c in columns})
+
+
+def _compact_sheet(sheet):
+    # Raw rows are kept for reprocessing only; categoricals keep a big sheet small
+    sheet = sheet[ingest.RATE_SHEET_COLUMNS].reset_index(drop=True)
+    for col in ingest.RATE_SHEET_COLUMNS:
+        if col not in ('price', 'tier'):
+            sheet[col] = sheet[col].astype('category')
+    return sheet
+
+
+def _raw_rows(sheet):
+    # Back to the dtypes read_rate_sheet gives, so ingest sees the same input as a full load
+    return sheet.astype({c: object for c in sheet.columns if isinstance(sheet[c].dtype, pd.CategoricalDtype)})
+
+
+def _splice_rows(head, kept, tail):
+    """head's rows where ``kept`` (a mask), then tail's rows, with head's dtypes.
+
+    Categorical columns are joined on their codes, with the tail's new labels
+    appended to head's categories, so head's codes are copied, never remapped.
+    """
+    tail = tail[head.columns]
+    columns = {}
+    for col in head.columns:
+        values = head[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            categories = values.cat.categories
+            incoming = tail[col].astype(object)
+            new = pd.Index(incoming.dropna().unique()).difference(categories)
+            if len(new):
+                categories = categories.append(new)
+            codes = np.concatenate([values.cat.codes.to_numpy()[kept], categories.get_indexer(incoming)])
+            columns[col] = pd.Categorical.from_codes(codes, dtype=pd.CategoricalDtype(categories))
+        else:
+            columns[col] = pd.concat([values[kept], tail[col].astype(values.dtype)], ignore_index=True)
+    return pd.DataFrame(columns)
+
+
+class RateStore:
+    """The processed rate table, its filter index and comparison cube, updated in place by deltas.
+
+    The raw sheet behind the table is only read when the first delta arrives,
+    so a store that never gets one starts as fast as load_cached_rate_table.
+    """
+
+    def __init__(self, path=ingest.DEFAULT_PATH):
+        # ``path`` is one sheet, or a directory or glob of them (see sources.py)
+        self.path = path
+        self.version = 0
+        self.table = load_cached_rate_table(path)
+        self.index = RateIndex(self.table)
+        self.cube = ComparisonCube(self.table)
+        self.applied = {}
+        self.fingerprint = source_fingerprint(path)
+        self._sheet = None
+        self._lock = threading.Lock()
+
+    def _load_sheet(self):
+        if source_fingerprint(self.path) != self.fingerprint:
+            raise RuntimeError(f"{self.path} changed since it was loaded; reload instead of applying deltas")
+        sheet = read_rate_sheets(self.path)
+        sheet['national'] = sheet['national'].replace(ingest.NATIONAL_ALIASES)
+        self._sheet = _compact_sheet(sheet)
+        # Every raw and processed row gets the code of its (national, work_type, state) block
+        codes, uniques = pd.MultiIndex.from_frame(_key_frame(self._sheet, BLOCK_COLUMNS)).factorize()
+        self._blocks = {block: code for code, block in enumerate(uniques)}
+        self._sheet_block = codes.astype(np.int64)
+        self._table_block = uniques.get_indexer(pd.MultiIndex.from_frame(_key_frame(self.table, BLOCK_COLUMNS)))
+
+    def _block_codes(self, keys):
+        codes = []
+        for block in map(tuple, keys[BLOCK_COLUMNS].to_numpy()):
+            if block not in self._blocks:
+                self._blocks[block] = len(self._blocks)
+            codes.append(self._blocks[block])
+        return np.array(codes, dtype=np.int64)
+
+    def apply_delta(self, delta):
+        """Apply a delta frame (see the module docstring). Returns a summary of what changed."""
+        with self._lock:
+            return self._apply(normalize_delta(delta))
+
+    def _apply(self, delta):
+        if self._sheet is None:
+            self._load_sheet()
+        if delta.empty:
+            return {'version': self.version, 'upserted': 0, 'retired': 0, 'blocks': 0, 'rows_removed': 0, 'rows_added': 0}
+        keys = _key_frame(delta, DELTA_KEY_COLUMNS)
+        delta_blocks = self._block_codes(keys)
+        touched = np.unique(delta_blocks)
+
+        # Raw rows of the touched blocks, minus every key the delta names, plus its upserts
+        in_sheet = np.isin(self._sheet_block, touched)
+        block_rows = self._sheet[in_sheet]
+        named = pd.MultiIndex.from_frame(keys)
+        replaced = pd.MultiIndex.from_frame(_key_frame(block_rows, DELTA_KEY_COLUMNS)).isin(named)
+        upserts = (delta['action'] == 'upsert').to_numpy()
+        block_rows = _splice_rows(block_rows, ~replaced, delta.loc[upserts, ingest.RATE_SHEET_COLUMNS])
+        block_codes = np.concatenate([self._sheet_block[in_sheet][~replaced], delta_blocks[upserts]])
+
+        self._sheet = _splice_rows(self._sheet, ~in_sheet, block_rows)
+        self._sheet_block = np.concatenate([self._sheet_block[~in_sheet], block_codes])
+
+        # Re-run ingest on just those blocks and swap their processed rows
+        processed = ingest.process_rate_sheet(_raw_rows(block_rows)) if len(block_rows) else self.table.iloc[:0]
+        kept = ~np.isin(self._table_block, touched)
+        changed = pd.concat([self.table.loc[~kept, ['display_work', 'state']].astype(str),
+                             processed[['display_work', 'state']].astype(str)])
+        table = _splice_rows(self.table, kept, processed)
+
+        self._table_block = np.concatenate([self._table_block[kept],
+                                            self._block_codes(_key_frame(processed, BLOCK_COLUMNS))])
+        self.cube = self.cube.updated(table, kept, changed)
+        self.index = self.index.updated(table, kept, processed)
+        self.table = table
+        self.version += 1
+        return {
+            'version': self.version, 'upserted': int(upserts.sum()), 'retired': int((~upserts).sum()),
+            'blocks': len(touched), 'rows_removed': int((~kept).sum()), 'rows_added': len(processed),
+        }
+
+    def snapshot(self):
+        """(version, table, index, cube), consistent with each other even while a delta is applied."""
+        with self._lock:
+            return self.version, self.table, self.index, self.cube
+
+    def sync(self, updates_dir):
+        """Apply delta CSVs in ``updates_dir`` not applied yet, in file-name order. Returns their names.
+
+        A file that fails validation is recorded in ``applied`` with its error
+        and not retried; fix it under a new name. So is every file found after
+        the sheet itself changed on disk, which takes a reload (a new store).
+        """
+        new = []
+        for path in sorted(glob.glob(os.path.join(updates_dir, '*.csv'))):
+            name = os.path.basename(path)
+            if name in self.applied:
+                continue
+            with self._lock:
+                if name in self.applied:
+                    continue
+                try:
+                    self.applied[name] = self._apply(read_delta(path))
+                except (ValueError, RuntimeError) as e:
+                    self.applied[name] = {'error': str(e)}
+            new.append(name)
+        return new
@@ -0,0 +1,140 @@
+"""Rate queries behind the app's tabs, usable without Streamlit.
+
+Every function takes the processed rate table (see ingest.load_rate_table or
+table_cache.load_cached_rate_table) as its first argument and returns plain
+pandas objects or dicts, so bid-generation jobs can call them directly.
+"""
+import numpy as np
+import pandas as pd
+
+from ingest import NATIONAL_ALIASES
+
+ALL_STATES = 'All States'
+
+# Standard industry splits used by the Pricing Waterfall
+NATIONAL_CUT_PCT = 0.25
+REGIONAL_CUT_PCT = 0.40  # of what's left after the national
+
+LOOKUP_KEYS = ['national', 'display_work', 'state']
+
+
+def _as_list(value):
+    if value is None or value == "":
+        return []
+    if isinstance(value, str):
+        return [value]
+    return list(value)
+
+
+def lookup(df, national=None, work=None, state=None, category=None):
+    """Rates matching every given filter; each filter takes a value or a list of values."""
+    mask = np.ones(len(df), dtype=bool)
+    for column, selected in (('national', national), ('display_work', work), ('state', state), ('category', category)):
+        selected = _as_list(selected)
+        if selected:
+            mask &= df[column].isin(selected).to_numpy()
+    return df[mask]
+
+
+def comparison_states(df, work):
+    """States where at least two nationals report ``work``, i.e. where a comparison means something."""
+    work_df = df[df['display_work'] == work]
+    counts = work_df.groupby('state', observed=True)['national'].nunique()
+    return sorted(counts[counts >= 2].index.tolist())
+
+
+def compare(df, work, state):
+    """Every company's rate for ``work`` in ``state`` (nationwide rates included).
+
+    Verified (tier 1) rates come first, then highest price first.
+    """
+    rows = df[(df['display_work'] == work) & df['state'].isin([state, ALL_STATES])]
+    sort_key = np.where(rows['tier'] == 1, 0, 1)
+    return (rows.assign(sort_key=sort_key)
+            .sort_values(['sort_key', 'price'], ascending=[True, False], kind='stable')
+            .drop(columns='sort_key'))
+
+
+def spread(comparison):
+    """Gap between the first and last row of a ``compare`` result, or None with fewer than two."""
+    if len(comparison) < 2:
+        return None
+    highest, lowest = comparison.iloc[0], comparison.iloc[-1]
+    gap = highest['price'] - lowest['price']
+    gap_pct = (gap / highest['price'] * 100) if highest['price'] > 0 else 0
+    return {'highest': highest, 'lowest': lowest, 'gap': gap, 'gap_pct': gap_pct}
+
+
+def investor_allowable(df, work, state):
+    """The verified (tier 1) allowable row for ``work`` in ``state``, or None."""
+    match = df[(df['tier'] == 1) & (df['display_work'] == work) & (df['state'] == state)]
+    return match.iloc[0] if not match.empty else None
+
+
+def waterfall(rate, national_cut_pct=NATIONAL_CUT_PCT, regional_cut_pct=REGIONAL_CUT_PCT):
+    """Split an investor allowable into what each layer keeps on the way to the BOTG contractor."""
+    national_takes = rate * national_cut_pct
+    after_national = rate - national_takes
+    regional_takes = after_national * regional_cut_pct
+    botg_gets = after_national - regional_takes
+    return {
+        'investor': rate,
+        'national_takes': national_takes,
+        'after_national': after_national,
+        'regional_takes': regional_takes,
+        'botg_gets': botg_gets,
+    }
+
+
+def chain_position(your_rate, botg_gets):
+    """Where a contractor paid ``your_rate`` likely sits: 'direct', 'mid' (2-3 layers) or 'deep'."""
+    if your_rate >= botg_gets * 0.95:
+        return 'direct'
+    elif your_rate >= botg_gets * 0.60:
+        return 'mid'
+    return 'deep'
+
+
+def lookup_batch(df, requests):
+    """Answer a frame of lookup requests with one join against the rate table.
+
+    ``requests`` needs ``work`` and ``state`` columns and may have ``national``
+    (blank means every national; "HUD" is read as "HUD / FHA"). Each national
+    answers with its rates published for the state, falling back to its
+    nationwide ("All States") rates when it has none there. The result has one row per (request, matching rate), keyed by
+    ``request_row`` (the request's position), and a ``matched`` flag; requests
+    with no rate come back once with ``matched`` False.
+    """
+    req = pd.DataFrame({
+        'request_row': np.arange(len(requests)),
+        'display_work': requests['work'].astype(str).str.strip().to_numpy(),
+        'state': requests['state'].astype(str).str.strip().to_numpy(),
+        'national': (requests['national'].fillna("").astype(str).str.strip().replace(NATIONAL_ALIASES).to_numpy()
+                     if 'national' in requests else ""),
+    })
+
+    def join(reqs, table, keys):
+        unused = [c for c in LOOKUP_KEYS if c not in keys]
+        return reqs.drop(columns=unused, errors='ignore').merge(table, on=keys, how='inner')
+
+    by_national = req['national'] != ""
+    exact = pd.concat([
+        join(req[by_national], df, LOOKUP_KEYS),
+        join(req[~by_national], df, ['display_work', 'state']),
+    ])
+
+    # Nationwide fallback, per national: a national with no rate for the state
+    # still answers with its nationwide one, whatever the other nationals have
+    nationwide = df[df['state'] == ALL_STATES].drop(columns='state')
+    fallback = pd.concat([
+        join(req[by_national], nationwide, ['national', 'display_work']),
+        join(req[~by_national], nationwide, ['display_work']),
+    ]).assign(state=ALL_STATES)
+    answered = pd.MultiIndex.from_arrays([exact['request_row'], exact['national'].astype(str)])
+    fallback = fallback[~pd.MultiIndex.from_arrays([fallback['request_row'], fallback['national'].astype(str)])
+                        .isin(answered)]
+
+    found = pd.concat([exact, fallback]).assign(matched=True)
+    missing = req[~req['request_row'].isin(found['request_row'])].assign(matched=False)
+    out = pd.concat([found, missing], ignore_index=True)
+    return out.sort_values('request_row', kind='stable').reset_index(drop=True)
@@ -0,0 +1,87 @@
+"""HTML builders for the app's card and bar views.
+
+Each builder turns a whole frame into a single HTML string with column-wise
+string operations on object arrays, so a page of results goes to the browser as one
+st.markdown element instead of one element per row. The markup is kept on
+single lines with no blank lines, so Markdown treats it as one HTML block.
+"""
+import numpy as np
+import pandas as pd
+
+
+def _text(series):
+    # Categoricals/strings as a plain object array with NA as "", so "+" concatenates element-wise
+    return np.where(series.notna().to_numpy(), series.astype(object).to_numpy(), "").astype(object)
+
+
+def _money(series):
+    # &#36; rather than "$": a page with several amounts must not read as LaTeX math
+    return np.array(["&#36;{:,.2f}".format(v) for v in series.to_numpy(dtype=float)], dtype=object)
+
+
+def _dates(series):
+    return np.array([v.strftime('%Y-%m-%d') if pd.notna(v) else "—" for v in series], dtype=object)
+
+
+def _widths(pct):
+    # Bars never narrower than 8%, so the amount inside stays readable
+    return np.array(["{:.1f}".format(v) for v in np.maximum(pct, 8)], dtype=object)
+
+
+def _is_tier_1(rows):
+    return (rows['tier'] == 1).to_numpy(dtype=bool, na_value=False)
+
+
+def result_cards_html(rows):
+    """Mobile card view for a page of Rate Lookup results."""
+    if rows.empty:
+        return ""
+    status = np.where(_is_tier_1(rows), "✅ Active & Verified", "⚠️ Community Data").astype(object)
+    zone = _text(rows['region_override'])
+    zone = np.where(zone == "", zone, " · 📍 " + zone)
+    notes = _text(rows['notes'])
+    notes = np.where(notes == "", notes, "<div style='font-size: 0.9em; border-top: 1px solid #e5e7eb; padding-top: 8px;'>" + notes + "</div>")
+    cards = (
+        "<div class='card'>"
+        "<div style='color: #4b5563; font-size: 0.85em; text-transform: uppercase; font-weight: bold;'>" + _text(rows['national']) + zone + "</div>"
+        "<div style='font-size: 1.1em; font-weight: bold; margin-bottom: 5px;'>" + _text(rows['display_work']) + " — " + _text(rows['state']) + "</div>"
+        "<div style='font-size: 1.4em; color: #059669; font-weight: bold; margin-bottom: 8px;'>" + _money(rows['price'])
+        + " <span style='font-size: 0.7em; color: #6b7280;'>" + _text(rows['unit']) + "</span></div>"
+        "<div style='font-size: 0.85em; margin-bottom: 10px; color: #4b5563;'><i>" + status + " · " + _dates(rows['last_updated']) + "</i></div>"
+        + notes + "</div>"
+    )
+    return "".join(cards)
+
+
+def _bar_rows(labels, widths, colors, amounts, notes, note_style=""):
+    return (
+        "<div class='waterfall-row'><div class='waterfall-label'>" + labels + "</div>"
+        "<div style='flex: 1;'><div class='waterfall-bar' style='width: " + widths + "%; background-color: " + colors + ";'>"
+        + amounts + "</div></div><div class='waterfall-amount'" + note_style + ">" + notes + "</div></div>"
+    )
+
+
+def comparison_bars_html(rows):
+    """National Comparison bar chart: one bar per company, scaled to the highest rate."""
+    if rows.empty:
+        return ""
+    tier_1 = _is_tier_1(rows)
+    max_price = rows['price'].max()
+    pct = rows['price'].to_numpy(dtype=float) / max_price * 100 if max_price > 0 else np.zeros(len(rows))
+    zone = _text(rows['region_override'])
+    zone = np.where(zone == "", zone, " (" + zone + ")")
+    labels = np.where(tier_1, "✅ ", "⚠️ ").astype(object) + _text(rows['national']) + zone
+    colors = np.where(tier_1, "#059669", "#d97706").astype(object)
+    widths = _widths(pct)
+    return "".join(_bar_rows(labels, widths, colors, _money(rows['price']), _dates(rows['last_updated'])))
+
+
+def waterfall_html(layers, base_rate):
+    """Pricing Waterfall bars for (label, amount, color, note) layers."""
+    layers = pd.DataFrame(layers, columns=['label', 'amount', 'color', 'note'])
+    pct = layers['amount'].to_numpy(dtype=float) / base_rate * 100 if base_rate > 0 else np.zeros(len(layers))
+    labels = _text(layers['label'].str.replace("$", "&#36;", regex=False))
+    notes = _text(layers['note'].str.replace("$", "&#36;", regex=False))
+    rows = _bar_rows(labels, _widths(pct), _text(layers['color']), _money(layers['amount']), notes,
+                     note_style=" style='font-size: 0.75em;'")
+    return "".join(rows)
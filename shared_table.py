@@ -0,0 +1,173 @@
+"""One published rate table shared by every app process on a host.
+
+A single loader (``python cli.py publish``) builds the processed table, with
+any rate_updates/ deltas applied, and writes it as an uncompressed Arrow file.
+App workers started with RATE_TABLE_FILE pointing at that file don't parse
+the sheet at all: they memory-map it read-only, so the numeric, date and
+text columns live once in the OS page cache however many workers there are.
+
+The loader also publishes the table's RateIndex and ComparisonCube arrays
+(each filter column's codes, row order and offsets; the cube's row positions
+and per-comparison stats) in a sibling ``<path>.<version>.parts.arrow`` file
+that the table's metadata names. Workers memory-map those too instead of
+factorizing, sorting and grouping the table themselves. Each worker still
+builds the per-label value -> code dicts and comparison slice dict, and, on
+first use, the work-type search (per label) and the cube's rate history (per
+row, for the Rate History view); bench.py shared measures the attach.
+
+Publishing writes the parts file, then a temp table file renamed over the
+old one. A worker notices the new file (inode / mtime / size) on its next
+rerun and attaches to it. Sessions already mid-run keep reading the old
+mappings, which stay valid until they let go of them, so there is no window
+where the table is missing or half-written. Parts files are kept for the
+current and previous version; older ones are removed.
+
+Requires pyarrow.
+"""
+import glob
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from comparison import ComparisonCube
+from rate_index import RateIndex, _ColumnIndex
+from table_cache import to_frame, write_table_cache
+
+VERSION_KEY = b'rate_version'
+PARTS_KEY = b'rate_parts'
+OFFERED_KEY = b'offered_states'
+CUBE_STAT_COLUMNS = ['display_work', 'state', 'companies', 'nationals', 'units', 'low', 'high', 'spread', 'spread_pct']
+
+
+def _file_key(path):
+    st = os.stat(path)
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def published_version(path):
+    """Version of the table published at ``path``, or 0 when there is none."""
+    if not os.path.exists(path):
+        return 0
+    metadata = feather.read_table(path, memory_map=True).schema.metadata or {}
+    return int(metadata.get(VERSION_KEY, 0))
+
+
+def parts_path(path, version):
+    return f"{path}.{version}.parts.arrow"
+
+
+def _one_list(values):
+    # A whole array as the single row of a list column; it reads back as one flat buffer
+    values = pa.array(values)
+    return pa.LargeListArray.from_arrays(pa.array([0, len(values)], type=pa.int64()), values)
+
+
+def _flat(table, name):
+    values = table.column(name).chunk(0).flatten()
+    # Numbers come back as views of the mapped file; labels are copied into objects
+    return values.to_numpy(zero_copy_only=pa.types.is_integer(values.type) or pa.types.is_floating(values.type))
+
+
+def write_parts(index, cube, parts_file):
+    """The index and cube arrays as one-row list columns in an Arrow file."""
+    columns = {}
+    for col, column in index.columns.items():
+        columns[f'index.{col}.values'] = _one_list(column.values.tolist())
+        for field in ('codes', 'order', 'offsets'):
+            columns[f'index.{col}.{field}'] = _one_list(getattr(column, field))
+    columns['cube.positions'] = _one_list(cube._positions)
+    for col in CUBE_STAT_COLUMNS:
+        columns[f'cube.stats.{col}'] = _one_list(cube.stats[col].to_numpy())
+    table = pa.table(columns).replace_schema_metadata({OFFERED_KEY: json.dumps(cube._states).encode()})
+    tmp = f"{parts_file}.{os.getpid()}.tmp"
+    try:
+        feather.write_feather(table, tmp, compression='uncompressed')
+        os.replace(tmp, parts_file)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def read_parts(parts_file, df):
+    """(RateIndex, ComparisonCube) for ``df`` from a write_parts file, its arrays memory-mapped."""
+    table = feather.read_table(parts_file, memory_map=True)
+    columns = {}
+    for col in [name.split('.')[1] for name in table.column_names if name.endswith('.codes')]:
+        values = np.asarray(_flat(table, f'index.{col}.values'), dtype=object)
+        parts = (values, _flat(table, f'index.{col}.codes'), _flat(table, f'index.{col}.order'))
+        columns[col] = _ColumnIndex(None, parts=parts, offsets=_flat(table, f'index.{col}.offsets'))
+    stats = pd.DataFrame({col: _flat(table, f'cube.stats.{col}') for col in CUBE_STAT_COLUMNS})
+    offered = json.loads(table.schema.metadata[OFFERED_KEY])
+    return RateIndex(df, parts=columns), ComparisonCube(df, parts=(_flat(table, 'cube.positions'), stats, offered))
+
+
+def _remove_old_parts(path, version):
+    for old in glob.glob(glob.escape(path) + ".*.parts.arrow"):
+        stamp = old[len(path) + 1:-len(".parts.arrow")]
+        if stamp.isdigit() and int(stamp) < version - 1:
+            try:
+                os.remove(old)
+            except OSError:
+                pass  # e.g. still mapped on a platform that won't unlink it; next publish retries
+
+
+def publish_rate_table(df, path, version=None, index=None, cube=None):
+    """Atomically replace the table at ``path``; returns the version it was published as.
+
+    ``index`` / ``cube`` are the table's RateIndex and ComparisonCube when
+    the caller has them (e.g. a RateStore's); they are built otherwise.
+    Versions count up from whatever is already published, so workers never
+    see a number go backwards when the loader restarts.
+    """
+    if version is None:
+        version = published_version(path) + 1
+    index = RateIndex(df) if index is None else index
+    cube = ComparisonCube(df) if cube is None else cube
+    parts_file = parts_path(path, version)
+    write_parts(index, cube, parts_file)
+    write_table_cache(df, path, metadata={VERSION_KEY: str(version).encode(),
+                                          PARTS_KEY: os.path.basename(parts_file).encode()})
+    _remove_old_parts(path, version)
+    return version
+
+
+class SharedRateTable:
+    """Read-only view of a published table, with the same snapshot() as RateStore."""
+
+    def __init__(self, path):
+        self.path = path
+        self._key = None
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def _attach(self):
+        # Retry if the file was replaced while we were opening it
+        while True:
+            key = _file_key(self.path)
+            table = feather.read_table(self.path, memory_map=True)
+            metadata = table.schema.metadata or {}
+            df = to_frame(table)
+            try:
+                if PARTS_KEY in metadata:
+                    index, cube = read_parts(os.path.join(os.path.dirname(self.path), metadata[PARTS_KEY].decode()), df)
+                else:
+                    # Published without its parts: build them here
+                    index, cube = RateIndex(df), ComparisonCube(df)
+            except FileNotFoundError:
+                continue  # two publishes since we opened the table; its parts are gone
+            if _file_key(self.path) == key:
+                break
+        version = int(metadata.get(VERSION_KEY, 0))
+        return key, (version, df, index, cube)
+
+    def snapshot(self):
+        """(version, table, index, cube) for the file currently published."""
+        with self._lock:
+            if self._snapshot is None or _file_key(self.path) != self._key:
+                self._key, self._snapshot = self._attach()
+            return self._snapshot
@@ -0,0 +1,169 @@
+"""Rate tables built from many sheets: a directory or glob of CSV / XLSX files.
+
+Production rates arrive as separate sheets, one per national or investor and
+year. Anywhere a rate-sheet path is taken (load_cached_rate_table, RateStore,
+``cli.py --data``), a directory or a glob pattern works too:
+
+    load_rate_sources("rate_sheets/")
+    load_rate_sources("rate_sheets/*_2017.xlsx")
+
+Each sheet is read, validated and put through the per-row half of the
+pipeline (aliases, lot buckets, group-max; see ingest.dedupe_rate_rows) in a
+process pool, one file per task. The per-file results are concatenated and
+grouped again, which gives exactly the rows one concatenated sheet would,
+and then labelled and compacted once.
+
+Every file's result is cached as an Arrow file named after the hash of its
+bytes (and of the ingest rules), so a load after one sheet changed re-parses
+only that sheet; the merged table is cached the same way under the hash of
+all of them, so an unchanged set loads as one memory-mapped read. A cache
+directory belongs to one source set: entries the set no longer uses are
+removed. Requires pyarrow for the caches, openpyxl for XLSX sheets.
+"""
+import concurrent.futures
+import glob
+import hashlib
+import os
+
+import pandas as pd
+
+import ingest
+import table_cache
+from table_cache import file_fingerprint, is_source_set, read_table_cache, rules_fingerprint, write_table_cache
+
+SHEET_EXTENSIONS = ('.csv', '.xlsx')
+CACHE_DIR_NAME = '.rate_cache'
+
+
+def resolve_sources(spec):
+    """The sheet files ``spec`` names, sorted. Raises ValueError when there are none."""
+    if os.path.isdir(spec):
+        paths = [os.path.join(spec, name) for name in os.listdir(spec)]
+    elif glob.has_magic(spec):
+        paths = glob.glob(spec)
+    else:
+        paths = [spec]
+    paths = sorted(p for p in paths if os.path.isfile(p) and p.lower().endswith(SHEET_EXTENSIONS))
+    if not paths:
+        raise ValueError(f"No CSV or XLSX rate sheets found at {spec!r}")
+    return paths
+
+
+def set_fingerprint(fingerprints):
+    # File names don't matter to the table, only which contents are in the set
+    return hashlib.blake2b(" ".join(sorted(fingerprints)).encode(), digest_size=8).hexdigest()
+
+
+def sources_fingerprint(spec):
+    return set_fingerprint(file_fingerprint(p) for p in resolve_sources(spec))
+
+
+def default_cache_dir(spec):
+    paths = resolve_sources(spec)
+    root = spec if os.path.isdir(spec) else os.path.commonpath([os.path.dirname(os.path.abspath(p)) for p in paths])
+    return os.path.join(root, CACHE_DIR_NAME)
+
+
+def read_source(path):
+    """One sheet as a validated raw frame; XLSX dates come back as YYYY-MM-DD text like CSV's."""
+    try:
+        if path.lower().endswith('.xlsx'):
+            raw = pd.read_excel(path)
+            if 'last_updated' in raw and pd.api.types.is_datetime64_any_dtype(raw['last_updated']):
+                raw['last_updated'] = raw['last_updated'].dt.strftime('%Y-%m-%d')
+        else:
+            raw = pd.read_csv(path)
+        return ingest.validate_rate_sheet(raw)
+    except ValueError as e:
+        raise ValueError(f"{path}: {e}") from None
+
+
+def read_rate_sheets(spec):
+    """Every sheet ``spec`` names as one raw frame, in the order resolve_sources lists them."""
+    if not is_source_set(spec):
+        return ingest.read_rate_sheet(spec)
+    frames = [read_source(p)[ingest.RATE_SHEET_COLUMNS] for p in resolve_sources(spec)]
+    return pd.concat(frames, ignore_index=True)
+
+
+def _dedupe_source(path, cache_file):
+    # Pool task: the file's group-max rows, written to its cache. The path goes
+    # back rather than the frame, so the parent maps the result instead of unpickling it
+    rows = ingest.dedupe_rate_rows(read_source(path)[ingest.RATE_SHEET_COLUMNS])
+    if cache_file is None:
+        return rows
+    try:
+        write_table_cache(rows, cache_file)
+        return cache_file
+    except OSError:
+        return rows
+
+
+def _read_partial(result):
+    return read_table_cache(result) if isinstance(result, str) else result
+
+
+def load_rate_sources(spec, cache_dir=None, max_workers=None):
+    """The processed rate table for every sheet ``spec`` names, cached per file and as a whole.
+
+    ``max_workers`` caps the process pool (default: one per CPU); sheets whose
+    cached result is current are not re-read at all.
+    """
+    paths = resolve_sources(spec)
+    if table_cache.pa is None:
+        # No pyarrow, no caches: every load parses every sheet
+        cache_dir, partial_files, table_file = None, [None] * len(paths), None
+    else:
+        cache_dir = cache_dir or default_cache_dir(spec)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+        except OSError:
+            pass  # writes fail below and every load parses every sheet
+        rules = rules_fingerprint()
+        fingerprints = [file_fingerprint(p) for p in paths]
+        partial_files = [os.path.join(cache_dir, f"sheet.{fp}-{rules}.arrow") for fp in fingerprints]
+        table_file = os.path.join(cache_dir, f"table.{set_fingerprint(fingerprints)}-{rules}.arrow")
+
+    if table_file and os.path.exists(table_file):
+        try:
+            return read_table_cache(table_file)
+        except (OSError, table_cache.pa.ArrowInvalid):
+            pass  # unreadable (e.g. truncated): rebuild below
+
+    results = dict.fromkeys(range(len(paths)))
+    missing = []
+    for i, cache_file in enumerate(partial_files):
+        if cache_file and os.path.exists(cache_file):
+            try:
+                results[i] = read_table_cache(cache_file)
+                continue
+            except (OSError, table_cache.pa.ArrowInvalid):
+                pass
+        missing.append(i)
+
+    # Biggest sheets first, so one large file doesn't start last and hold up the merge
+    missing.sort(key=lambda i: os.path.getsize(paths[i]), reverse=True)
+    workers = min(max_workers or os.cpu_count() or 1, len(missing))
+    if workers > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(_dedupe_source, paths[i], partial_files[i]): i for i in missing}
+            for future in concurrent.futures.as_completed(futures):
+                results[futures[future]] = _read_partial(future.result())
+    else:
+        for i in missing:
+            results[i] = _read_partial(_dedupe_source(paths[i], partial_files[i]))
+
+    merged = ingest.group_max(pd.concat([results[i] for i in range(len(paths))], ignore_index=True))
+    df = ingest.finish_rate_table(merged)
+    if table_file is None:
+        return df
+    try:
+        write_table_cache(df, table_file)
+        keep = set(partial_files) | {table_file}
+        for name in os.listdir(cache_dir):
+            stale = os.path.join(cache_dir, name)
+            if name.endswith('.arrow') and stale not in keep:
+                os.remove(stale)
+    except OSError:
+        pass  # read-only cache directory: the next load re-parses
+    return df
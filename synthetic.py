@@ -0,0 +1,84 @@
+"""Synthetic rate sheets at production scale, in the real sheet's schema and mix.
+
+Rows are drawn from Property_Pricing_Master.csv as templates, so every row
+stays internally consistent: a work type keeps its units, lot-size ranges,
+tier and zone (``region_override``) rows together, and investors stay tier 1.
+On top of that, the draw spreads the rows the way merged production sheets
+are spread:
+
+    nationals   half the industry-reported (tier 2) rows go to one of
+                ``n_servicers`` regional servicers; investor rows keep their investor
+    states      half the state-specific rows move to another state, drawn
+                from the real state mix; nationwide rows stay "All States"
+    dates       tier 2 rows get a report month between 2014 and 2021, as the
+                community data has; tier 1 rows keep their allowable's date
+    prices      jittered by up to 20% either way
+
+so the groupby-max dedupe keeps most rows, and lookups and comparisons see
+many more (work, state) pairs than the sample has. Sheets are built in
+chunks of ``chunk_rows`` from one seed: the same (n_rows, seed) always gives
+the same sheet, and write_synthetic_sheet streams sheets far bigger than
+memory (10M rows and up) straight to CSV.
+"""
+import numpy as np
+import pandas as pd
+
+from ingest import DEFAULT_PATH, read_rate_sheet
+from rates import ALL_STATES
+
+DEFAULT_CHUNK_ROWS = 500_000
+DEFAULT_SERVICERS = 200
+PRICE_JITTER = 0.2
+
+
+def _chunk_sizes(n_rows, chunk_rows):
+    return [min(chunk_rows, n_rows - start) for start in range(0, n_rows, chunk_rows)] or [0]
+
+
+def iter_synthetic_chunks(n_rows, seed=0, path=DEFAULT_PATH, n_servicers=DEFAULT_SERVICERS,
+                          chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Yield a synthetic sheet of ``n_rows`` rows as frames of up to ``chunk_rows`` rows."""
+    base = read_rate_sheet(path)
+    servicers = np.array([f"Servicer {i:03d}" for i in range(n_servicers)], dtype=object)
+    months = pd.date_range("2014-01-01", "2021-12-01", freq="MS").strftime("%Y-%m-%d").to_numpy(dtype=object)
+    states = base.loc[base['state'] != ALL_STATES, 'state'].value_counts(normalize=True)
+    state_names, state_p = states.index.to_numpy(dtype=object), states.to_numpy()
+
+    sizes = _chunk_sizes(n_rows, chunk_rows)
+    for size, chunk_seed in zip(sizes, np.random.SeedSequence(seed).spawn(len(sizes))):
+        rng = np.random.default_rng(chunk_seed)
+        df = base.iloc[rng.integers(0, len(base), size)].reset_index(drop=True)
+        reported = (df['tier'] == 2).to_numpy()
+
+        moved = reported & (rng.random(size) < 0.5)
+        national = df['national'].to_numpy(dtype=object)
+        national[moved] = servicers[rng.integers(0, len(servicers), moved.sum())]
+        df['national'] = national
+
+        relocated = (df['state'] != ALL_STATES).to_numpy() & (rng.random(size) < 0.5)
+        state = df['state'].to_numpy(dtype=object)
+        state[relocated] = rng.choice(state_names, relocated.sum(), p=state_p)
+        df['state'] = state
+
+        last_updated = df['last_updated'].to_numpy(dtype=object)
+        last_updated[reported] = months[rng.integers(0, len(months), reported.sum())]
+        df['last_updated'] = last_updated
+
+        df['price'] = (df['price'] * rng.uniform(1 - PRICE_JITTER, 1 + PRICE_JITTER, size)).round(2)
+        yield df
+
+
+def synthetic_rate_sheet(n_rows, seed=0, path=DEFAULT_PATH, n_servicers=DEFAULT_SERVICERS,
+                         chunk_rows=DEFAULT_CHUNK_ROWS):
+    """A synthetic raw sheet of ``n_rows`` rows, in read_rate_sheet's columns and dtypes."""
+    return pd.concat(iter_synthetic_chunks(n_rows, seed, path, n_servicers, chunk_rows), ignore_index=True)
+
+
+def write_synthetic_sheet(output, n_rows, seed=0, path=DEFAULT_PATH, n_servicers=DEFAULT_SERVICERS,
+                          chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Stream a synthetic sheet to CSV ``output`` one chunk at a time; returns the rows written."""
+    written = 0
+    for i, chunk in enumerate(iter_synthetic_chunks(n_rows, seed, path, n_servicers, chunk_rows)):
+        chunk.to_csv(output, index=False, header=i == 0, mode='w' if i == 0 else 'a')
+        written += len(chunk)
+    return written
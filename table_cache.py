@@ -0,0 +1,128 @@
+"""On-disk columnar cache of the processed rate table.
+
+The processed table is written as an uncompressed Arrow IPC (Feather v2) file
+next to the source sheet, named after a hash of the sheet's bytes and of the
+ingest rules. A fresh process whose sheet and rules are unchanged reads that
+file (memory-mapped) instead of re-running the ingest pipeline; any change to
+either produces a new key, so a stale cache is never read and gets rebuilt.
+
+pyarrow is optional: without it every load simply runs the pipeline.
+"""
+import glob
+import hashlib
+import os
+
+import ingest
+import lots
+from classify import CATEGORY_RULES, DEFAULT_CATEGORY
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+
+# Bump when process_rate_sheet changes in a way the rule tables don't capture
+CACHE_FORMAT_VERSION = 3
+
+
+def rules_fingerprint():
+    rules = (
+        CACHE_FORMAT_VERSION, CATEGORY_RULES, DEFAULT_CATEGORY, ingest.NATIONAL_ALIASES,
+        lots.STANDARD_MAX_SF, lots.MEDIUM_MAX_START_SF, lots.LOT_RANGE_PATTERN,
+    )
+    return hashlib.blake2b(repr(rules).encode(), digest_size=8).hexdigest()
+
+
+def is_source_set(spec):
+    """Whether ``spec`` names several sheets (a directory or a glob) rather than one file."""
+    return os.path.isdir(spec) or glob.has_magic(spec)
+
+
+def file_fingerprint(path):
+    digest = hashlib.blake2b(digest_size=8)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_fingerprint(path):
+    if is_source_set(path):
+        from sources import sources_fingerprint
+        return sources_fingerprint(path)
+    return file_fingerprint(path)
+
+
+def cache_path(path):
+    stem, _ = os.path.splitext(path)
+    return f"{stem}.{source_fingerprint(path)}-{rules_fingerprint()}.arrow"
+
+
+def _stale_caches(path, keep):
+    stem, _ = os.path.splitext(path)
+    return [p for p in glob.glob(glob.escape(stem) + ".*-*.arrow") if p != keep]
+
+
+def to_arrow(df, metadata=None):
+    """The table as one Arrow record batch, laid out so pandas can read it without copying.
+
+    With a single chunk, split_blocks reads hand back numeric, date and text
+    columns that point straight into the (memory-mapped) file. Float NaNs are
+    kept as values rather than nulls so the lot bounds qualify too.
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for col in ingest.LOT_BOUND_COLUMNS:
+        if col in df.columns:
+            table = table.set_column(table.schema.get_field_index(col), col, pa.array(df[col].to_numpy()))
+    if metadata:
+        table = table.replace_schema_metadata({**table.schema.metadata, **metadata})
+    return table.combine_chunks()
+
+
+def to_frame(table):
+    return table.to_pandas(split_blocks=True)
+
+
+def read_table_cache(cache_file, memory_map=True):
+    # Memory-mapped reads let numeric columns come straight from the page cache
+    return to_frame(feather.read_table(cache_file, memory_map=memory_map))
+
+
+def write_table_cache(df, cache_file, metadata=None):
+    # Write to a temp file and rename, so readers never see a half-written cache
+    tmp = f"{cache_file}.{os.getpid()}.tmp"
+    try:
+        feather.write_feather(to_arrow(df, metadata), tmp, compression='uncompressed', chunksize=max(len(df), 1))
+        os.replace(tmp, cache_file)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def load_cached_rate_table(path=ingest.DEFAULT_PATH, memory_map=True):
+    """load_rate_table, served from the columnar cache when it is current."""
+    if is_source_set(path):
+        # A directory or glob of sheets: merged from per-file caches, see sources.py
+        from sources import load_rate_sources
+        return load_rate_sources(path)
+    if pa is None:
+        return ingest.load_rate_table(path)
+
+    cache_file = cache_path(path)
+    if os.path.exists(cache_file):
+        try:
+            return read_table_cache(cache_file, memory_map=memory_map)
+        except (OSError, pa.ArrowInvalid):
+            # Unreadable cache (e.g. truncated by a full disk): rebuild it below
+            pass
+
+    df = ingest.load_rate_table(path)
+    try:
+        write_table_cache(df, cache_file)
+        for stale in _stale_caches(path, keep=cache_file):
+            os.remove(stale)
+    except OSError:
+        # A read-only checkout still works, it just can't skip the pipeline next time
+        pass
+    return df
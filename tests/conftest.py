@@ -0,0 +1,24 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# The modules live flat at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ingest import load_rate_table  # noqa: E402
+
+SHEET = Path(__file__).parent.parent / "Property_Pricing_Master.csv"
+
+
+@pytest.fixture(scope='session')
+def sheet_path():
+    """The repo's rate sheet, wherever pytest is run from."""
+    return str(SHEET)
+
+
+@pytest.fixture(scope='session')
+def rate_table(sheet_path):
+    # Uncached: load_cached_rate_table would write an .arrow file next to the sheet
+    return load_rate_table(sheet_path)
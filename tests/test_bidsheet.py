@@ -0,0 +1,56 @@
+import io
+
+import pandas as pd
+import pytest
+
+import bidsheet
+
+
+@pytest.fixture(scope='module')
+def table(rate_table):
+    return bidsheet.pricing_table(rate_table)
+
+
+def test_lot_size_on_work_not_priced_by_lot(table):
+    orders = pd.DataFrame({
+        'Work Type': ["Basement Water Pumping", "Basement Water Pumping", "Grass Cut - Initial", "Grass Cut - Initial"],
+        'State': ["Ohio"] * 4, 'Lot Size': ["8500", "", "8500", "50000"], 'Investor': ["HUD"] * 4,
+    }, index=[10, 11, 12, 13])
+    priced = bidsheet.price_work_orders(orders, table).set_index('line')
+
+    assert priced.loc[[10, 11], 'match'].tolist() == ['nationwide', 'nationwide']
+    assert priced.loc[[10, 11], 'investor_allowable'].tolist() == [500.0, 500.0]
+    assert priced.loc[10, 'display_work'] == "Basement Water Pumping"
+    # Lot-priced work still matches on its bucket
+    assert priced.loc[12, 'display_work'] == "Grass Cut - Initial (Standard Lot (<10,000 sf))"
+    assert priced.loc[12, 'investor_allowable'] == 85.0
+    assert priced.index.tolist() == [10, 11, 12, 13]
+
+
+def test_unknown_work_is_flagged(table):
+    orders = pd.DataFrame({'work': ["Nope"], 'state': ["Ohio"], 'lot': ["8500"]})
+    priced = bidsheet.price_work_orders(orders, table)
+    assert priced['match'].tolist() == ['none'] and not priced['matched'].any()
+
+
+def test_no_investor_falls_back_to_nationwide(table):
+    # Address Posting is only priced "All States"
+    orders = pd.DataFrame({'work': ["Address Posting", "Address Posting", "Grass Cut - Initial"],
+                           'state': ["Ohio"] * 3, 'investor': ["", "ServiceLink", ""], 'lot': ["", "", "8500"]})
+    priced = bidsheet.price_work_orders(orders, table)
+    assert priced['match'].tolist() == ['no national', 'nationwide', 'no national']
+    assert priced['investor_allowable'].tolist()[:2] == [50.0, 50.0]
+    # A state rate still wins over a nationwide one
+    state_best = table[(table['display_work'] == priced.loc[2, 'display_work']) & (table['state'] == "Ohio")]
+    best = state_best.sort_values(['tier', 'price'], ascending=[True, False]).iloc[0]
+    assert (priced.loc[2, 'state'], priced.loc[2, 'investor_allowable']) == ("Ohio", best['price'])
+
+
+def test_price_to_bytes_matches_price_file(rate_table, tmp_path):
+    orders = "Work Type,State,Lot Size,Investor\nAddress Posting,Ohio,,\nGrass Cut - Initial,Ohio,8500,HUD\nNope,Ohio,,\n"
+    data, counts = bidsheet.price_to_bytes(io.BytesIO(orders.encode()), rate_table, chunksize=2)
+    assert counts == {'lines': 3, 'matched': 2, 'unmatched': 1}
+    path = tmp_path / 'priced.csv'
+    assert bidsheet.price_file(io.BytesIO(orders.encode()), rate_table, str(path), chunksize=2) == counts
+    assert path.read_bytes() == data
+    assert pd.read_csv(io.BytesIO(data))['investor_allowable'].tolist()[:2] == [50.0, 85.0]
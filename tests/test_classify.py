@@ -0,0 +1,42 @@
+import random
+
+import pandas as pd
+import pytest
+
+from bench import legacy_categorize
+from classify import CATEGORY_RULES, DEFAULT_CATEGORY, KeywordClassifier, categorize_works
+
+
+@pytest.fixture(scope='module')
+def classifier():
+    return KeywordClassifier()
+
+
+def test_sheet_labels_match_the_legacy_chain(classifier, rate_table):
+    labels = pd.unique(pd.concat([rate_table['work_type'].astype(str), rate_table['display_work'].astype(str)]))
+    assert [classifier.classify(label) for label in labels] == [legacy_categorize(label) for label in labels]
+
+
+def test_random_labels_match_the_legacy_chain(classifier):
+    # Keywords run together, overlapping and in mixed case, between filler words
+    rng = random.Random(0)
+    words = [kw for _, keywords in CATEGORY_RULES for kw in keywords] + ["unit", "dry", "initial", "x", "-", "(2)"]
+    for _ in range(20_000):
+        label = rng.choice(["", " ", "-"]).join(rng.choices(words, k=rng.randint(1, 5)))
+        label = label.upper() if rng.random() < 0.2 else label.title()
+        assert classifier._classify(label) == legacy_categorize(label), label
+
+
+def test_priority_and_default():
+    classifier = KeywordClassifier([("A", ['door']), ("B", ['garage door', 'gate'])], default="Other")
+    assert classifier.classify("Garage Door Repair") == "A"
+    assert classifier.classify("Gate latch") == "B"
+    assert classifier.classify("Pool fence") == "Other"
+    assert KeywordClassifier().classify("Mystery Service") == DEFAULT_CATEGORY
+
+
+def test_classify_many_keeps_the_index():
+    labels = pd.Series(["Snow Removal", "Re-Key", "Snow Removal", None], index=[10, 11, 12, 13])
+    out = categorize_works(labels)
+    assert out.index.tolist() == [10, 11, 12, 13]
+    assert out.tolist() == [legacy_categorize(label) for label in labels]
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import rates
+from fee_chain import FeeChain, botg_pay
+
+SNOW = "🌨️ Snow Removal"
+
+
+def test_standard_chain_matches_the_waterfall():
+    prices = np.array([0.0, 12.5, 85.0, 1234.56])
+    split = FeeChain().evaluate(prices)
+    old = rates.waterfall(prices)
+    np.testing.assert_allclose(split['takes'][:, 0], old['national_takes'])
+    np.testing.assert_allclose(split['remaining'][:, 1], old['after_national'])
+    np.testing.assert_allclose(split['takes'][:, 1], old['regional_takes'])
+    np.testing.assert_allclose(split['botg_gets'], old['botg_gets'])
+
+
+def test_national_beats_category_beats_the_layer():
+    chain = FeeChain([{
+        'name': "National", 'pct': 0.25, 'flat': 2.0,
+        'by_national': {"HUD / FHA": {'pct': 0.10}},
+        'by_category': {SNOW: {'pct': 0.50, 'flat': 0.0}},
+    }])
+    takes = chain.evaluate([100.0] * 4, nationals=pd.Series(["HUD / FHA", "HUD / FHA", "VA", "VA"]),
+                           categories=pd.Series([SNOW, "Other", SNOW, "Other"]))['takes'][:, 0]
+    # HUD's override only names pct, so a snow job still gets the category's flat
+    assert takes.tolist() == [10.0, 12.0, 50.0, 27.0]
+
+
+def test_a_layer_never_takes_more_than_is_left():
+    chain = FeeChain([{'name': "A", 'flat': 30.0}, {'name': "B", 'flat': 30.0}])
+    split = chain.evaluate([50.0])
+    assert split['takes'].tolist() == [[30.0, 20.0]]
+    assert split['botg_gets'].tolist() == [0.0]
+
+
+@pytest.mark.parametrize('layers, message', [
+    ([{'name': "A", 'pct': 1.5}], "between 0 and 1"),
+    ([{'name': "A", 'flat': -1}], "negative"),
+    ([{'name': "A", 'by_national': {"VA": {'cut': 0.1}}}], "unknown field"),
+    ([{'name': "A"}, {'name': "A"}], "unique"),
+    ([{'name': "Investor"}], "unique"),
+    ([], "at least one layer"),
+])
+def test_bad_chains_are_rejected(layers, message):
+    with pytest.raises(ValueError, match=message):
+        FeeChain(layers)
+
+
+def test_depth_at_the_step_boundaries():
+    # $100 -> $75 -> $45; ratio midpoints at sqrt(100 * 75) and sqrt(75 * 45), and
+    # sqrt(45 * 27) toward a third layer cutting 40% like the last
+    chain = FeeChain()
+    first, second, past = np.sqrt(7500), np.sqrt(3375), np.sqrt(45 * 27)
+    paid = [100.0, first + 0.01, first - 0.01, second + 0.01, second - 0.01, past + 0.01, past - 0.01, 0.0]
+    deep = chain.layers_deep(100.0, paid)
+    assert deep['layers_deep'].tolist() == [0, 0, 1, 1, 2, 2, 2, 2]
+    assert deep['layer'].tolist() == ["Investor", "Investor", "National", "National",
+                                      "Regional", "Regional", "Regional", "Regional"]
+    assert deep['expected'].tolist() == [100.0, 100.0, 75.0, 75.0, 45.0, 45.0, 45.0, 45.0]
+    assert deep['beyond_chain'].tolist() == [False] * 6 + [True, True]
+
+
+def test_depth_uses_each_rows_overrides():
+    chain = FeeChain([{'name': "National", 'pct': 0.25, 'by_national': {"HUD / FHA": {'pct': 0.10}}}])
+    deep = chain.layers_deep([100.0, 100.0], [88.0, 88.0], nationals=pd.Series(["HUD / FHA", "VA"]))
+    # $88 is nearest HUD's $90 step but VA's full $100 (its step is $75)
+    assert deep['layers_deep'].tolist() == [1, 0]
+    assert deep['expected'].tolist() == [90.0, 100.0]
+
+
+def test_rates_that_arent_positive_cant_be_placed():
+    deep = FeeChain().layers_deep([0.0, -5.0, np.nan, 100.0], [0.0, 0.0, 10.0, 45.0])
+    assert deep['layers_deep'].isna().tolist() == [True, True, True, False]
+    assert deep['layer'].isna().tolist() == [True, True, True, False]
+    assert deep['expected'].isna().tolist() == [True, True, True, False]
+    assert not deep['beyond_chain'].any()
+
+
+def test_no_layer_past_one_that_leaves_nothing_or_takes_nothing():
+    emptied = FeeChain([{'name': "A", 'pct': 0.5}, {'name': "B", 'flat': 100.0}])
+    assert emptied.layers_deep(100.0, 0.0)['beyond_chain'].tolist() == [False]
+    idle = FeeChain([{'name': "A", 'pct': 0.5}, {'name': "B", 'pct': 0.0}])
+    assert idle.layers_deep(100.0, 1.0)['beyond_chain'].tolist() == [False]
+
+
+def test_botg_pay_lines_up_with_the_rows():
+    df = pd.DataFrame({'price': [100.0, np.nan], 'national': ["VA", "VA"], 'category': [SNOW, SNOW]},
+                      index=[7, 3])
+    out = botg_pay(df)
+    assert list(out.columns) == ["after National", "after Regional", 'botg_gets']
+    assert out.index.tolist() == [7, 3]
+    assert out.loc[7, 'botg_gets'] == 45.0 and np.isnan(out.loc[3, 'botg_gets'])
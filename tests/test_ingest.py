@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import ingest
+from bench import assert_same_rows, legacy_process
+from synthetic import synthetic_rate_sheet
+
+
+def sheet(**overrides):
+    raw = pd.DataFrame({
+        'national': ["HUD", "Assurant"], 'work_type': ["Grass Cut - Initial", "Re-Key"],
+        'state': ["Ohio", "All States"], 'lot_size': ["1-10000 sf", ""], 'price': ["85", 40.5],
+        'unit': ["per cut", "per occurrence"], 'notes': ["", "Two locks"], 'source': ["ML 2016-01", "Survey"],
+        'last_updated': ["2016-02-01", "2018-08-19"], 'tier': [1, 2], 'tier_label': ["Verified", "Reported"],
+        'tier_note': ["Official", "Industry"], 'region_override': ["", ""],
+    })
+    return raw.assign(**overrides)
+
+
+@pytest.mark.parametrize('column', ingest.REQUIRED_COLUMNS)
+def test_missing_required_column_is_rejected(column):
+    with pytest.raises(ValueError, match=column):
+        ingest.validate_rate_sheet(sheet().drop(columns=column))
+
+
+def test_non_numeric_price_is_rejected():
+    with pytest.raises(ValueError, match="non-numeric prices"):
+        ingest.validate_rate_sheet(sheet(price=["85", "call us"]))
+
+
+def test_optional_columns_are_filled_and_prices_parsed():
+    checked = ingest.validate_rate_sheet(sheet().drop(columns=['notes', 'region_override']))
+    assert set(ingest.RATE_SHEET_COLUMNS) <= set(checked.columns)
+    assert checked['notes'].isna().all()
+    assert checked['price'].tolist() == [85.0, 40.5]
+
+
+def test_processed_table_schema():
+    df = ingest.process_rate_sheet(ingest.validate_rate_sheet(sheet()))
+    assert set(df.columns) == set(ingest.RATE_SHEET_COLUMNS) | set(ingest.LOT_BOUND_COLUMNS) | {'display_work', 'category'}
+    for col in ingest.CATEGORICAL_COLUMNS:
+        assert isinstance(df[col].dtype, pd.CategoricalDtype), col
+    assert df['tier'].dtype == 'Int8'
+    assert pd.api.types.is_datetime64_any_dtype(df['last_updated'])
+    assert pd.api.types.is_float_dtype(df['price'])
+
+    hud = df[df['national'] == "HUD / FHA"].iloc[0]
+    assert hud['display_work'] == "Grass Cut - Initial (Standard Lot (<10,000 sf))"
+    assert (hud['lot_min_sf'], hud['lot_max_sf']) == (1, 10000)
+    rekey = df[df['national'] == "Assurant"].iloc[0]
+    assert pd.isna(rekey['lot_size']) and np.isnan(rekey['lot_min_sf'])
+    assert rekey['display_work'] == "Re-Key"
+
+
+def test_matches_the_row_wise_pipeline(sheet_path):
+    raw = synthetic_rate_sheet(20_000, seed=7, path=sheet_path)
+    old = legacy_process(raw)
+    assert_same_rows(old, ingest.process_rate_sheet(raw, compact=False)[old.columns])
+
+
+def test_memory_report_shows_the_compact_table_is_smaller(sheet_path):
+    raw = synthetic_rate_sheet(20_000, seed=1, path=sheet_path)
+    plain = ingest.process_rate_sheet(raw, compact=False)
+    compact = ingest.process_rate_sheet(raw)
+    report = ingest.memory_report(plain, compact)
+
+    assert list(report.columns) == ['before_bytes', 'after_bytes', 'ratio']
+    assert report.index[-1] == 'total'
+    assert set(report.index[:-1]) == set(compact.columns)
+    body = report.drop(index='total')
+    assert (report.loc['total', ['before_bytes', 'after_bytes']] == body[['before_bytes', 'after_bytes']].sum()).all()
+    assert report.loc['total', 'after_bytes'] == compact.memory_usage(index=False, deep=True).sum()
+    # Labels repeat across rows, so categoricals must pay off
+    assert report.loc['total', 'ratio'] < 0.5
+    for col in ['national', 'work_type', 'display_work', 'category']:
+        assert report.loc[col, 'after_bytes'] < report.loc[col, 'before_bytes'] / 4, col
@@ -0,0 +1,25 @@
+import numpy as np
+import pandas as pd
+
+from ingest import lot_rate_rows, read_rate_sheet
+from lots import LotSizeIndex, bucket_lot_sizes, parse_lot_sizes
+
+
+def test_parse_and_bucket():
+    sizes = pd.Series(["1-10000 sf", "10,001-15,000 sf", "40001+ sf", "8500", "", "big"])
+    bounds = parse_lot_sizes(sizes)
+    assert bounds['lot_min_sf'].tolist()[:4] == [1, 10001, 40001, 8500]
+    assert bounds['lot_max_sf'].tolist()[:4] == [10000, 15000, np.inf, 8500]
+    assert bucket_lot_sizes(sizes, bounds).tolist() == [
+        "Standard Lot (<10,000 sf)", "Medium Lot (10k-25k sf)", "Oversized Lot (25k+ sf)",
+        "Standard Lot (<10,000 sf)", "", "Unrecognized (big)",
+    ]
+
+
+def test_exact_size_uses_the_published_range(sheet_path):
+    index = LotSizeIndex(lot_rate_rows(read_rate_sheet(sheet_path)))
+    # The bucketed table folds these into $95 (Standard) and $120 (Medium)
+    for sqft, lot_size, price in [(3000, "1-5000 sf", 80.0), (12000, "10001-15000 sf", 110.0)]:
+        hits = index.lookup("Grass Cut - Initial", "Alaska", sqft, national="ServiceLink")
+        assert hits[['lot_size', 'price']].values.tolist() == [[lot_size, price]]
+    assert index.lookup("Grass Cut - Initial", "Alaska", 3000, national="Nobody").empty
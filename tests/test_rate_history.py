@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from rate_history import RateHistory
+
+GRASS, SNOW = "Grass Cut - Initial", "Snow Removal"
+
+
+@pytest.fixture
+def history():
+    df = pd.DataFrame({
+        'national': ["HUD / FHA"] * 5 + ["VA"] * 2,
+        'display_work': [GRASS] * 4 + [SNOW] + [GRASS] * 2,
+        'state': ["Ohio"] * 7,
+        'last_updated': pd.to_datetime(["2019-01-01", "2019-01-01", "2020-06-01", "2021-03-15",
+                                         None, None, "2020-01-01"]),
+        'price': [80.0, 95.0, 100.0, 110.0, 40.0, 60.0, 70.0],
+    })
+    return RateHistory(df.sample(frac=1, random_state=3))  # row order mustn't matter
+
+
+def test_same_date_rows_collapse_to_the_highest_price(history):
+    events = history.history("HUD / FHA", GRASS, "Ohio")
+    assert events['price'].tolist() == [95.0, 100.0, 110.0]
+    assert events['last_updated'].dt.strftime('%Y-%m-%d').tolist() == ["2019-01-01", "2020-06-01", "2021-03-15"]
+    assert len(history) == 6 and history.n_keys == 3
+
+
+def test_as_of_picks_the_rate_in_effect(history):
+    assert history.as_of("HUD / FHA", GRASS, "Ohio", "2018-12-31") is None
+    assert history.as_of("HUD / FHA", GRASS, "Ohio", "2019-01-01")['price'] == 95.0
+    hit = history.as_of("HUD / FHA", GRASS, "Ohio", "2021-01-01")
+    assert hit == {'price': 100.0, 'last_updated': pd.Timestamp("2020-06-01")}
+    assert history.as_of("HUD / FHA", GRASS, "Texas", "2021-01-01") is None
+    with pytest.raises(ValueError, match="Not a date"):
+        history.as_of("HUD / FHA", GRASS, "Ohio", None)
+
+
+def test_undated_rows_are_in_effect_from_the_start(history):
+    assert history.as_of("HUD / FHA", SNOW, "Ohio", "1900-01-01")['price'] == 40.0
+    # VA's undated $60 holds until its dated $70
+    assert history.as_of("VA", GRASS, "Ohio", "2019-12-31")['price'] == 60.0
+    assert history.as_of("VA", GRASS, "Ohio", "2020-01-01")['price'] == 70.0
+
+
+def test_latest_as_of_counts_changes(history):
+    def table(date):
+        out = history.latest_as_of(date)
+        return {(n, w): (p, c) for n, w, p, c in out[['national', 'display_work', 'price', 'changes']]
+                .astype({'national': str, 'display_work': str}).itertuples(index=False)}
+
+    assert table("2018-01-01") == {("HUD / FHA", SNOW): (40.0, 1), ("VA", GRASS): (60.0, 1)}
+    assert table("2020-12-31") == {("HUD / FHA", GRASS): (100.0, 2), ("HUD / FHA", SNOW): (40.0, 1),
+                                   ("VA", GRASS): (70.0, 2)}
+    assert table(None)[("HUD / FHA", GRASS)] == (110.0, 3)
+    assert np.isnat(history.latest_as_of("2018-01-01")['last_updated'].to_numpy()).all()
@@ -0,0 +1,40 @@
+import pandas as pd
+import pytest
+
+from rate_sql import RateSQL
+
+
+@pytest.fixture(scope='module')
+def engine(rate_table):
+    return RateSQL(rate_table)
+
+
+@pytest.mark.parametrize('sql', [
+    "DELETE FROM rates",
+    "UPDATE rates SET price = 0",
+    "PRAGMA query_only = OFF",
+    "ATTACH DATABASE ':memory:' AS other",
+    "CREATE TABLE t (x)",
+])
+def test_only_reads_get_through(engine, sql):
+    with pytest.raises(ValueError):
+        engine.run(sql)
+    assert engine.run("SELECT COUNT(*) AS n FROM rates")['n'][0] > 0
+
+
+def test_runaway_query_times_out(engine):
+    with pytest.raises(TimeoutError):
+        engine.run("SELECT COUNT(*) FROM rates a, rates b, rates c", timeout=0.2)
+
+
+def test_pages_stop_at_the_row_limit(engine, rate_table):
+    assert len(rate_table) > 1500
+    pages = list(engine.query("SELECT national, price FROM rates", row_limit=1500, page_size=400))
+    assert [len(p) for p in pages] == [400, 400, 400, 300]
+
+
+def test_parameters_and_empty_results(engine, rate_table):
+    hud = engine.run("SELECT price FROM rates WHERE national = :national", {'national': "HUD / FHA"}, row_limit=10**6)
+    assert len(hud) == (rate_table['national'] == "HUD / FHA").sum()
+    empty = engine.run("SELECT national, price FROM rates WHERE national = ?", ["Nobody"])
+    assert empty.empty and list(empty.columns) == ['national', 'price']
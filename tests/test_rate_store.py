@@ -0,0 +1,48 @@
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from bench import assert_same_rows, synthetic_delta
+from ingest import load_rate_table
+from rate_index import RateIndex
+from rate_store import RateStore, _raw_rows
+
+def plain(df):
+    return df.astype({c: object for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)})
+
+
+@pytest.fixture
+def store(tmp_path, sheet_path):
+    path = tmp_path / 'rates.csv'
+    shutil.copy(sheet_path, path)
+    return RateStore(str(path))
+
+
+def test_delta_matches_a_fresh_load(store, tmp_path, sheet_path):
+    delta = synthetic_delta(pd.read_csv(sheet_path), 60)
+    store.apply_delta(delta)
+
+    path = tmp_path / 'updated.csv'
+    _raw_rows(store._sheet).to_csv(path, index=False)
+    fresh = load_rate_table(str(path))
+    assert_same_rows(plain(fresh), plain(store.table))
+
+    index = RateIndex(fresh)
+    for col, column in index.columns.items():
+        updated = store.index.columns[col]
+        assert column.values.tolist() == updated.values.tolist(), col
+        assert np.array_equal(column.codes[column.order], updated.codes[updated.order]), col
+
+
+def test_sync_records_a_changed_sheet(store, tmp_path, sheet_path):
+    updates = tmp_path / 'updates'
+    updates.mkdir()
+    pd.read_csv(sheet_path).head(1).to_csv(updates / '2026-01.csv', index=False)
+    with open(store.path, 'a') as f:
+        f.write("\n")
+
+    assert store.sync(str(updates)) == ['2026-01.csv']
+    assert "changed since it was loaded" in store.applied['2026-01.csv']['error']
+    assert store.version == 0
@@ -0,0 +1,37 @@
+import pandas as pd
+import pytest
+
+import rates
+
+WORK = "Grass Cut - Initial (Standard Lot (<10,000 sf))"
+
+
+@pytest.fixture(scope='module')
+def df(rate_table):
+    return rate_table
+
+
+def answers(result, row):
+    hits = result[(result['request_row'] == row) & result['matched']]
+    return sorted(zip(hits['national'].astype(str), hits['state'].astype(str), hits['price']))
+
+
+def test_blank_national_matches_compare(df):
+    # Ohio has state rates from some nationals and only nationwide ones from others
+    result = rates.lookup_batch(df, pd.DataFrame({'work': [WORK], 'state': ["Ohio"], 'national': [""]}))
+    expected = rates.compare(df, WORK, "Ohio")
+    assert answers(result, 0) == sorted(zip(expected['national'].astype(str), expected['state'].astype(str),
+                                            expected['price']))
+    assert ("Fannie Mae", rates.ALL_STATES, 100.0) in answers(result, 0)
+
+
+def test_named_nationals_aliases_and_misses(df):
+    requests = pd.DataFrame({
+        'work': [WORK, WORK, WORK, "No Such Work"],
+        'state': ["Ohio", "Ohio", "Ohio", "Ohio"],
+        'national': ["HUD", "Fannie Mae", "HUD / FHA", ""],
+    })
+    result = rates.lookup_batch(df, requests)
+    assert answers(result, 0) == answers(result, 2) == [("HUD / FHA", "Ohio", 85.0)]
+    assert answers(result, 1) == [("Fannie Mae", rates.ALL_STATES, 100.0)]
+    assert result.loc[result['request_row'] == 3, 'matched'].tolist() == [False]
@@ -0,0 +1,43 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from comparison import ComparisonCube
+from rate_index import RateIndex
+from shared_table import SharedRateTable, parts_path, publish_rate_table
+
+
+def test_workers_attach_the_published_index_and_cube(rate_table, tmp_path):
+    path = str(tmp_path / 'rates.arrow')
+    assert publish_rate_table(rate_table, path) == 1
+    version, df, index, cube = SharedRateTable(path).snapshot()
+    assert version == 1 and len(df) == len(rate_table)
+
+    fresh = RateIndex(df)
+    for col, column in fresh.columns.items():
+        mapped = index.columns[col]
+        assert mapped.values.tolist() == column.values.tolist(), col
+        for field in ('codes', 'order', 'offsets'):
+            assert np.array_equal(getattr(mapped, field), getattr(column, field)), (col, field)
+        assert not mapped.codes.flags.writeable  # a view of the file, not a copy
+    assert index.mask(state=["Ohio"]).sum() == (df['state'] == "Ohio").sum()
+
+    built = ComparisonCube(df)
+    pd.testing.assert_frame_equal(cube.stats, built.stats)
+    assert all(cube.states(w) == built.states(w) for w in df['display_work'].astype(str).unique())
+    work, state = built.stats.loc[built.stats['companies'].idxmax(), ['display_work', 'state']]
+    pd.testing.assert_frame_equal(cube.rows(work, state), built.rows(work, state))
+
+
+def test_republishing_swaps_versions_and_prunes_parts(rate_table, tmp_path):
+    path = str(tmp_path / 'rates.arrow')
+    shared = SharedRateTable(path)
+    publish_rate_table(rate_table, path)
+    assert shared.snapshot()[0] == 1
+    for _ in range(3):
+        publish_rate_table(rate_table.head(100), path)
+    version, df, index, cube = shared.snapshot()
+    assert (version, len(df), index.n_rows) == (4, 100, 100)
+    assert sorted(os.listdir(tmp_path)) == sorted(['rates.arrow', os.path.basename(parts_path(path, 3)),
+                                                   os.path.basename(parts_path(path, 4))])
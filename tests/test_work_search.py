@@ -0,0 +1,34 @@
+import pandas as pd
+import pytest
+
+from classify import categorize_works
+from work_search import WorkSearchIndex
+
+
+@pytest.fixture(scope='module')
+def index(rate_table):
+    labels = pd.Series(sorted(rate_table['display_work'].astype(str).unique()))
+    return WorkSearchIndex(labels, categorize_works(labels))
+
+
+def test_named_work_beats_its_category(index):
+    rekey = ['Re-Key', 'Lock Change - Rekey (1st lock)', 'Re-keying']
+    found = index.search("rekey", 20)
+    assert found[:3] == rekey
+    # "re" (from "re-key", "re-wint") is too short to stand for "rekey"
+    assert set(categorize_works(pd.Series(found))) == {"🔒 Securing & Boarding"}
+    assert index.search("re key", 1) == ['Re-Key']
+
+
+def test_synonyms_rank_below_direct_matches(index):
+    found = index.search("lawn", 20)
+    assert found[:2] == ['Initial Lawn', 'Exterior Maintenance - Lawn Cut']
+    assert 'Grass Cut - Recut' in found[2:]
+    assert set(categorize_works(pd.Series(found))) == {"🌿 Grass & Lawn"}
+    # No label says "trash"; its category does
+    assert "Debris Removal" in index.search("trash", 20)
+
+
+def test_typos_and_prefixes(index):
+    assert index.search("padlok", 1) == ['Padlock']
+    assert all("winteriz" in label.lower() for label in index.search("wint", 6))
@@ -0,0 +1,161 @@
+"""Server-side fuzzy search over work-type labels, for pickers that ship only the best matches.
+
+Labels are split into lower-case word tokens; adjacent tokens are also indexed
+joined ("Re-Key" -> "re", "key", "rekey"), so hyphenation and spacing don't
+matter. Each query token scores every label through precomputed postings:
+
+    exact token         3.0
+    joined query pair   6.0   ("re key" -> "rekey"; worth the two exact tokens it stands for)
+    token prefix        2.0   (the query is still being typed)
+    similar token       2.0 x trigram similarity, at 0.4 and up (typos)
+    category synonym    0.08  for labels the token doesn't match in any of the
+                              ways above: it is one of classify's keywords for
+                              the label's category, or a word of its name, so
+                              "lawn" finds "Grass Cut - Recut" after the labels
+                              that say "lawn"
+
+A label's score is the sum over query tokens of its best match for each.
+Synonym hits are a tenth of the weakest direct match (a 0.4 trigram
+similarity), so they rank after every label a token names directly and
+"rekey" lists the rekey labels before the rest of Securing & Boarding.
+Results come back best first; ties go to the shorter label. Lookups are array
+operations over token ids, so a query costs well under a millisecond for
+thousands of labels, and recent queries are memoized.
+"""
+import bisect
+import functools
+import re
+
+import numpy as np
+
+from classify import CATEGORY_RULES
+
+EXACT, JOINED, PREFIX, SIMILAR = 3.0, 6.0, 2.0, 2.0
+MIN_SIMILARITY = 0.4
+SYNONYM = SIMILAR * MIN_SIMILARITY / 10
+MIN_PREFIX = 2  # shorter fragments only match whole tokens
+
+_WORD = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text):
+    return _WORD.findall(str(text).lower())
+
+
+def _with_joined(tokens):
+    return tokens + [a + b for a, b in zip(tokens, tokens[1:])]
+
+
+def trigrams(token):
+    padded = f" {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _csr(pairs, n_rows):
+    # (row, value) pairs -> (offsets, values) with row r's values at values[offsets[r]:offsets[r + 1]]
+    pairs = np.asarray(sorted(set(pairs)), dtype=np.int64).reshape(-1, 2)
+    offsets = np.searchsorted(pairs[:, 0], np.arange(n_rows + 1))
+    return offsets, pairs[:, 1]
+
+
+class WorkSearchIndex:
+    """Ranked fuzzy matching over ``labels``, with each label's ``categories`` for synonym hits."""
+
+    def __init__(self, labels, categories, rules=CATEGORY_RULES, cache_size=1024):
+        self.labels = np.asarray(labels, dtype=object)
+        n_labels = len(self.labels)
+
+        label_tokens = [_with_joined(tokenize(label)) for label in self.labels]
+        self.vocab = sorted({t for tokens in label_tokens for t in tokens})
+        self._token_id = {t: i for i, t in enumerate(self.vocab)}
+        # token -> labels holding it
+        self._token_offsets, self._token_labels = _csr(
+            [(self._token_id[t], i) for i, tokens in enumerate(label_tokens) for t in tokens], len(self.vocab))
+        # trigram -> vocabulary tokens holding it
+        grams = sorted({g for t in self.vocab for g in trigrams(t)})
+        self._gram_id = {g: i for i, g in enumerate(grams)}
+        self._gram_offsets, self._gram_tokens = _csr(
+            [(self._gram_id[g], i) for i, t in enumerate(self.vocab) for g in trigrams(t)], len(grams))
+        self._gram_counts = np.array([len(trigrams(t)) for t in self.vocab])
+
+        # Synonym vocabulary: classify's keywords plus the words of each category name
+        category_names = [name for name, _ in rules]
+        category_id = {name: i for i, name in enumerate(category_names)}
+        self._synonyms = [(i, tokenize(" ".join(keywords)) + tokenize(name))
+                          for i, (name, keywords) in enumerate(rules)]
+        label_category = np.array([category_id.get(c, -1) for c in categories], dtype=np.int64)
+        self._category_labels = [np.flatnonzero(label_category == i) for i in range(len(category_names))]
+
+        # Ties go to the shorter label, then alphabetical
+        self._tiebreak = np.empty(n_labels, dtype=np.int64)
+        self._tiebreak[sorted(range(n_labels), key=lambda i: (len(self.labels[i]), self.labels[i]))] = np.arange(n_labels)
+        self._scores = functools.lru_cache(maxsize=cache_size)(self._score_query)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def _labels_of(self, token_ids):
+        if len(token_ids) == 0:
+            return np.empty(0, dtype=np.int64)
+        starts, ends = self._token_offsets[token_ids], self._token_offsets[np.asarray(token_ids) + 1]
+        return np.concatenate([self._token_labels[s:e] for s, e in zip(starts, ends)])
+
+    def _token_scores(self, token):
+        # Best score each label gets from one query token
+        scores = np.zeros(len(self.labels))
+        exact = self._token_id.get(token)
+        if len(token) >= MIN_PREFIX:
+            lo = bisect.bisect_left(self.vocab, token)
+            hi = bisect.bisect_left(self.vocab, token + '\uffff')
+            prefixed = np.arange(lo, hi)
+            scores[self._labels_of(prefixed[prefixed != exact])] = PREFIX
+        if len(token) >= 3:
+            gram_ids = [self._gram_id[g] for g in trigrams(token) if g in self._gram_id]
+            if gram_ids:
+                hits = np.bincount(np.concatenate(
+                    [self._gram_tokens[self._gram_offsets[g]:self._gram_offsets[g + 1]] for g in gram_ids]),
+                    minlength=len(self.vocab))
+                similarity = hits / (len(trigrams(token)) + self._gram_counts - hits)
+                similar = np.flatnonzero(similarity >= MIN_SIMILARITY)
+                for token_id in similar[np.argsort(similarity[similar])]:
+                    rows = self._labels_of([token_id])
+                    scores[rows] = np.maximum(scores[rows], SIMILAR * similarity[token_id])
+        if exact is not None:
+            scores[self._labels_of([exact])] = EXACT
+        for category, words in self._synonyms:
+            # Stems match either way ("winterize" / "winteriz"), but fragments such
+            # as "re" from "re-key" only as whole tokens, or "rekey" would hit "re-wint"
+            if any(w == token or (len(token) >= 3 and len(w) >= 3 and (w.startswith(token) or token.startswith(w)))
+                   for w in words):
+                rows = self._category_labels[category]
+                scores[rows] = np.maximum(scores[rows], SYNONYM)
+        return scores
+
+    def _score_query(self, query):
+        tokens = tokenize(query)
+        scores = np.zeros(len(self.labels))
+        for token in tokens:
+            scores += self._token_scores(token)
+        for a, b in zip(tokens, tokens[1:]):
+            # "re key" for "Rekey": the pair counts as one exact token in place of its halves
+            joined = self._token_id.get(a + b)
+            if joined is not None:
+                rows = self._labels_of([joined])
+                scores[rows] = np.maximum(scores[rows], JOINED)
+        scores.setflags(write=False)
+        return scores
+
+    def search(self, query, limit=20, allowed=None):
+        """Up to ``limit`` labels matching ``query``, best first.
+
+        ``allowed`` is an optional boolean mask over the labels (e.g. the work
+        types present under the other filters); labels outside it are skipped.
+        """
+        scores = self._scores(" ".join(tokenize(query)))
+        candidates = np.flatnonzero(scores > 0 if allowed is None else (scores > 0) & allowed)
+        if len(candidates) > limit:
+            # Keep everything tied with the limit-th score, then order exactly
+            cutoff = np.partition(scores[candidates], len(candidates) - limit)[len(candidates) - limit]
+            candidates = candidates[scores[candidates] >= cutoff]
+        order = np.lexsort((self._tiebreak[candidates], -scores[candidates]))
+        return self.labels[candidates[order[:limit]]].tolist()